@@ -0,0 +1,63 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Action plugin for step_ca_bootstrap. If controller_fetch is set, the root certificate is downloaded
+# on the controller and passed to the module, so that the hosts don't need to contact the CA themselves.
+
+import fcntl
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+from ansible import constants as C
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.maxhoesel.smallstep.plugins.module_utils.ca_api import (
+    CaApiError, fetch_root, normalize_fingerprint, verify_root)
+from ansible_collections.maxhoesel.smallstep.plugins.module_utils.x509 import UnsupportedError
+
+
+def controller_root(ca_url: str, fingerprint: str) -> str:
+    """Return the root certificate of a CA, downloading it at most once per playbook run
+
+    All forks share the local temporary directory of the run, so the root is stored there.
+    A lock ensures that only one fork contacts the CA, while the others wait for it and reuse the result.
+
+    Raises:
+        UnsupportedError: If the CA URL can't be used
+        CaApiError: If the root could not be retrieved or does not match the fingerprint
+    """
+    cache_file = Path(C.DEFAULT_LOCAL_TMP) / f"smallstep-root-{normalize_fingerprint(fingerprint)}.pem"
+    with open(cache_file.with_suffix(".lock"), "a", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return verify_root(cache_file.read_bytes(), fingerprint).decode("utf-8")
+        except (OSError, CaApiError):
+            pass
+        pem = fetch_root(ca_url, fingerprint)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_bytes(pem)
+        os.replace(tmp_file, cache_file)
+        return pem.decode("utf-8")
+
+
+class ActionModule(ActionBase):
+    def run(self, tmp=None, task_vars=None) -> Dict[str, Any]:
+        result = super().run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        module_args = self._task.args.copy()
+        if boolean(module_args.get("controller_fetch", False), strict=False) and not module_args.get("root_pem"):
+            try:
+                module_args["root_pem"] = controller_root(module_args["ca_url"], module_args["fingerprint"])
+            except KeyError as e:
+                result.update(failed=True, msg=f"missing required arguments: {e.args[0]}")
+                return result
+            except (UnsupportedError, CaApiError) as e:
+                result.update(failed=True, msg=f"Error downloading root certificate on the controller: {e}")
+                return result
+
+        result.update(self._execute_module(
+            module_name="maxhoesel.smallstep.step_ca_bootstrap", module_args=module_args, task_vars=task_vars))
+        return result
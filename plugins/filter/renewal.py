@@ -0,0 +1,32 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# The documentation of each filter is in the .yml file of the same name
+
+from typing import Any, Dict, List
+
+from ansible.errors import AnsibleFilterError
+
+from ansible_collections.maxhoesel.smallstep.plugins.module_utils import renewal_window
+
+
+def renewal_plan(host: str, path: str, expires_in: str = "8h", window: str = "1h") -> Dict[str, Any]:
+    try:
+        return renewal_window.plan_renewal(renewal_window.renewal_seed(host, path), expires_in, window)
+    except ValueError as e:
+        raise AnsibleFilterError(str(e)) from e
+
+
+def renewal_histogram(plans: List[Dict[str, Any]], bucket: str = "5m") -> List[Dict[str, Any]]:
+    try:
+        return renewal_window.renewal_histogram(plans, bucket)
+    except (ValueError, KeyError, TypeError) as e:
+        raise AnsibleFilterError(f"Invalid renewal plans: {e}") from e
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "renewal_plan": renewal_plan,
+            "renewal_histogram": renewal_histogram,
+        }
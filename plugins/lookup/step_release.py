@@ -0,0 +1,213 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+name: step_release
+author: Max Hösel (@maxhoesel)
+short_description: Download smallstep release archives into a cache on the controller
+version_added: '0.25.0'
+description:
+  - Resolves a C(step-cli) or C(step-ca) release and downloads its archive into a cache directory on the controller.
+  - Each archive is downloaded only once and verified against the C(checksums.txt) file of the release.
+    Afterwards, it can be copied to any number of hosts without contacting GitHub again.
+  - The version that C(latest) resolves to is cached as well, for I(latest_ttl) seconds.
+  - Returns a dictionary with the resolved C(version), the local path of the C(archive) and its C(checksum).
+options:
+  _terms:
+    description: The project to download, either C(cli) (C(step-cli)) or C(certificates) (C(step-ca))
+    required: true
+    type: list
+    elements: str
+  version:
+    description: The version to download, without a leading C(v), or C(latest) for the most recent release
+    type: str
+    default: latest
+  arch:
+    description: The architecture of the archive, as used in the release file names (e.g. C(amd64))
+    type: str
+    default: amd64
+  cache_dir:
+    description: The directory on the controller to store the archives in
+    type: path
+    default: ~/.cache/maxhoesel.smallstep/releases
+  offline:
+    description:
+      - Only use archives and versions that are already in the cache, and never contact GitHub.
+      - If the requested archive is not cached, the lookup fails.
+      - C(latest) resolves to the most recently cached C(latest) version, regardless of I(latest_ttl).
+    type: bool
+    default: false
+  latest_ttl:
+    description: How long the version that C(latest) resolved to is cached for, in seconds
+    type: int
+    default: 3600
+  download_url:
+    description: Base URL to download release files from. Can be set to use a mirror of the GitHub releases
+    type: str
+    default: https://github.com/smallstep
+  api_url:
+    description: Base URL of the GitHub API for the smallstep repositories, used to resolve C(latest)
+    type: str
+    default: https://api.github.com/repos/smallstep
+"""
+
+EXAMPLES = r"""
+- name: Download the latest step-cli release on the controller
+  ansible.builtin.set_fact:
+    step_cli_release: "{{ lookup('maxhoesel.smallstep.step_release', 'cli', arch='arm64') }}"
+
+- name: Copy the release archive to the host and extract it
+  ansible.builtin.unarchive:
+    src: "{{ step_cli_release.archive }}"
+    dest: /tmp/
+"""
+
+RETURN = r"""
+_raw:
+  description: The release details
+  type: list
+  elements: dict
+  contains:
+    version:
+      description: The resolved version
+      type: str
+    archive:
+      description: Path to the release archive on the controller
+      type: str
+    checksum:
+      description: The SHA256 checksum of the archive
+      type: str
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ansible.errors import AnsibleLookupError
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.urls import open_url
+from ansible.plugins.lookup import LookupBase
+
+# Release archive file names of each project, by version and architecture
+ARCHIVE_NAMES = {
+    "cli": "step_linux_{version}_{arch}.tar.gz",
+    "certificates": "step-ca_linux_{version}_{arch}.tar.gz",
+}
+CHECKSUMS_FILE = "checksums.txt"
+LATEST_FILE = "latest.json"
+DOWNLOAD_TIMEOUT = 60
+
+
+class ReleaseCache:
+    """Cache of the release files of a smallstep project on the controller
+
+    All forks of a playbook run share the cache, so access to it is serialized through a lock file.
+    """
+
+    def __init__(self, project: str, cache_dir: str, download_url: str, api_url: str, offline: bool) -> None:
+        self.project = project
+        self.path = Path(cache_dir).expanduser() / project
+        self.download_url = download_url.rstrip("/")
+        self.api_url = api_url.rstrip("/")
+        self.offline = offline
+
+    def _fetch(self, url: str) -> bytes:
+        try:
+            with open_url(url, timeout=DOWNLOAD_TIMEOUT, headers={"User-Agent": "maxhoesel.smallstep"}) as res:
+                return res.read()
+        except Exception as e:  # pylint: disable=broad-except
+            raise AnsibleLookupError(f"Could not download {url}: {to_native(e)}") from e
+
+    def _download(self, url: str, dest: Path) -> None:
+        data = self._fetch(url)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+
+    def resolve(self, version: str, ttl: int) -> str:
+        """Resolve "latest" to a version number, using the cached result if it is recent enough"""
+        if version != "latest":
+            return version
+        latest_file = self.path / LATEST_FILE
+        try:
+            cached = json.loads(latest_file.read_text(encoding="utf-8"))
+            if self.offline or time.time() - cached["checked"] < ttl:
+                return cached["version"]
+        except (OSError, ValueError, KeyError, TypeError):
+            if self.offline:
+                raise AnsibleLookupError(  # pylint: disable=raise-missing-from
+                    f"Offline mode is enabled, but the latest {self.project} version has not been cached yet")
+
+        release = json.loads(self._fetch(f"{self.api_url}/{self.project}/releases/latest"))
+        version = release["tag_name"].lstrip("v")
+        latest_file.write_text(json.dumps({"version": version, "checked": time.time()}), encoding="utf-8")
+        return version
+
+    def checksum(self, version: str, name: str) -> str:
+        """Return the expected checksum of a release file, from the checksums file of the release"""
+        checksums_file = self.path / version / CHECKSUMS_FILE
+        if not checksums_file.exists():
+            if self.offline:
+                raise AnsibleLookupError(f"Offline mode is enabled, but {self.project} {version} has not been cached")
+            self._download(f"{self.download_url}/{self.project}/releases/download/v{version}/{CHECKSUMS_FILE}",
+                           checksums_file)
+        for line in checksums_file.read_text(encoding="utf-8").splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1].lstrip("*") == name:
+                return parts[0].lower()
+        raise AnsibleLookupError(f"No checksum found for {name} in {self.project} {version}")
+
+    def archive(self, version: str, arch: str) -> Dict[str, Any]:
+        """Return the cached archive of a release, downloading and verifying it first if needed"""
+        name = ARCHIVE_NAMES[self.project].format(version=version, arch=arch)
+        archive = self.path / version / name
+        expected = self.checksum(version, name)
+        if archive.exists() and _sha256(archive) == expected:
+            return dict(version=version, archive=archive.as_posix(), checksum=expected)
+        if self.offline:
+            raise AnsibleLookupError(f"Offline mode is enabled, but {name} has not been cached")
+
+        self._download(f"{self.download_url}/{self.project}/releases/download/v{version}/{name}", archive)
+        actual = _sha256(archive)
+        if actual != expected:
+            archive.unlink()
+            raise AnsibleLookupError(f"Checksum mismatch for {name}: expected {expected}, got {actual}")
+        return dict(version=version, archive=archive.as_posix(), checksum=expected)
+
+    def get(self, version: str, arch: str, ttl: int) -> Dict[str, Any]:
+        if not self.offline:
+            self.path.mkdir(parents=True, exist_ok=True)
+        if not self.path.is_dir():
+            raise AnsibleLookupError(f"Offline mode is enabled, but the cache directory {self.path} does not exist")
+        with open(self.path / ".lock", "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            version = self.resolve(version, ttl)
+            (self.path / version).mkdir(exist_ok=True)
+            return self.archive(version, arch)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LookupModule(LookupBase):
+    def run(self, terms: List[str], variables: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        self.set_options(var_options=variables, direct=kwargs)
+        results = []
+        for project in terms:
+            if project not in ARCHIVE_NAMES:
+                raise AnsibleLookupError(f"Unknown project {project}, must be one of {', '.join(ARCHIVE_NAMES)}")
+            cache = ReleaseCache(project, self.get_option("cache_dir"), self.get_option("download_url"),
+                                 self.get_option("api_url"), self.get_option("offline"))
+            results.append(cache.get(self.get_option("version"), self.get_option("arch"),
+                                     self.get_option("latest_ttl")))
+        return results
@@ -0,0 +1,325 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Minimal client for the step-ca admin API, used for remote provisioner management instead of step-cli.
+# Extends the public API client with admin authentication. step-ca only accepts each admin token once,
+# so a new token is signed for every request, reusing the loaded key and certificate chain.
+# Requires the python cryptography library on the target host.
+# If a request cannot be handled by this client, UnsupportedError is raised and callers should fall back to step-cli.
+
+import base64
+import copy
+import hashlib
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple, cast
+from urllib.parse import quote, urlsplit
+
+try:
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+    from cryptography.x509.oid import NameOID
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+from ansible.module_utils.basic import AnsibleModule
+
+from .ca_api import CaClient, resolve_connection
+from .ca_config import UNSUPPORTED_PARAMS
+from .x509 import UnsupportedError, load_certificates, provisioner_name, split_pem
+
+# Same as the default token validity of step-cli
+TOKEN_VALIDITY = 300
+
+# Provisioner types and details keys in the linkedca format used by the admin API
+LINKEDCA_TYPES = {"Azure": "AZURE", "Nebula": "NEBULA"}
+LINKEDCA_DETAILS = {"K8SSA": "K8sSA"}
+# Maps module params to the provisioner details fields in the linkedca format, by provisioner type
+LINKEDCA_DETAIL_FIELDS: Dict[str, Dict[str, str]] = {
+    "JWK": {},
+    "OIDC": {
+        "oidc_admins": "admins",
+        "oidc_client_id": "clientId",
+        "oidc_client_secret": "clientSecret",
+        "oidc_configuration_endpoint": "configurationEndpoint",
+        "oidc_groups": "groups",
+        "oidc_listen_address": "listenAddress",
+        "oidc_tenant_id": "tenantId",
+    },
+    "AWS": {
+        "aws_accounts": "accounts",
+        "disable_custom_sans": "disableCustomSans",
+        "disable_trust_on_first_use": "disableTrustOnFirstUse",
+        "instance_age": "instanceAge",
+    },
+    "GCP": {
+        "disable_custom_sans": "disableCustomSans",
+        "disable_trust_on_first_use": "disableTrustOnFirstUse",
+        "gcp_projects": "projectIds",
+        "gcp_service_accounts": "serviceAccounts",
+        "instance_age": "instanceAge",
+    },
+    "Azure": {
+        "azure_audience": "audience",
+        "azure_object_ids": "objectIds",
+        "azure_resource_groups": "resourceGroups",
+        "azure_subscription_ids": "subscriptionIds",
+        "azure_tenant": "tenantId",
+        "disable_custom_sans": "disableCustomSans",
+        "disable_trust_on_first_use": "disableTrustOnFirstUse",
+    },
+    "ACME": {"force_cn": "forceCn", "require_eab": "requireEab"},
+    "X5C": {},
+    "K8SSA": {},
+    "SSHPOP": {},
+    "SCEP": {
+        "force_cn": "forceCn",
+        "scep_challenge": "challenge",
+        "scep_encryption_algorithm_identifier": "encryptionAlgorithmIdentifier",
+        "scep_include_root": "includeRoot",
+        "scep_min_public_key_length": "minimumPublicKeyLength",
+    },
+    "Nebula": {},
+}
+# Params that point to a file whose contents are sent as a list of bytes, by provisioner type
+LINKEDCA_FILE_FIELDS: Dict[str, Dict[str, str]] = {
+    "X5C": {"x5c_root": "roots"},
+    "K8SSA": {"public_key": "publicKeys"},
+    "Nebula": {"nebula_root": "roots"},
+}
+# Maps module params to their location in the linkedca claims object
+LINKEDCA_CLAIM_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "allow_renewal_after_expiry": ("allowRenewalAfterExpiry",),
+    "disable_renewal": ("disableRenewal",),
+    "ssh": ("ssh", "enabled"),
+    "ssh_host_min_dur": ("ssh", "hostDurations", "min"),
+    "ssh_host_max_dur": ("ssh", "hostDurations", "max"),
+    "ssh_host_default_dur": ("ssh", "hostDurations", "default"),
+    "ssh_user_min_dur": ("ssh", "userDurations", "min"),
+    "ssh_user_max_dur": ("ssh", "userDurations", "max"),
+    "ssh_user_default_dur": ("ssh", "userDurations", "default"),
+    "x509_min_dur": ("x509", "durations", "min"),
+    "x509_max_dur": ("x509", "durations", "max"),
+    "x509_default_dur": ("x509", "durations", "default"),
+}
+INT_FIELDS = ["scep_min_public_key_length"]
+# Params that only apply to some provisioner types
+TYPE_PARAMS = sorted({p for fields in LINKEDCA_DETAIL_FIELDS.values() for p in fields}
+                     | {"nebula_root", "public_key", "x5c_root"})
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _int_bytes(value: int, size: int) -> bytes:
+    return value.to_bytes(size, "big")
+
+
+def _read_file(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        raise UnsupportedError(f"Could not read {path}: {e}") from e
+
+
+class AdminClient(CaClient):
+    """Client for the admin API of a remote step-ca instance, authenticated with an admin certificate
+
+    Args:
+        ca_url (str): The URL of the CA
+        root (str): The root certificate used to verify the CA
+        admin_cert (str): The admin certificate (chain)
+        admin_key (str): The private key of the admin certificate
+        admin_password (Optional[bytes]): The password of admin_key, if it is encrypted
+        admin_provisioner (Optional[str]): The provisioner that issued admin_cert.
+            Read from the certificate if not set.
+        admin_subject (Optional[str]): The admin subject. Defaults to the common name of admin_cert.
+
+    Raises:
+        UnsupportedError: If the cryptography library is missing or the admin credentials can't be used
+    """
+
+    def __init__(
+        self, ca_url: str, root: str, admin_cert: str, admin_key: str, admin_password: Optional[bytes] = None,
+        admin_provisioner: Optional[str] = None, admin_subject: Optional[str] = None
+    ) -> None:
+        if not HAS_CRYPTOGRAPHY:
+            raise UnsupportedError("python cryptography library is not installed")
+        super().__init__(ca_url, root)
+
+        chain = load_certificates(admin_cert)
+        self._x5c = [base64.b64encode(der).decode("ascii") for der in split_pem(_read_file(admin_cert))]
+        if not self._x5c:
+            raise UnsupportedError(f"Admin certificate {admin_cert} is not in PEM format")
+        try:
+            self._key = serialization.load_pem_private_key(_read_file(admin_key), password=admin_password)
+        except (TypeError, ValueError) as e:
+            raise UnsupportedError(f"Could not load admin key {admin_key}: {e}") from e
+        self._alg, self._jwk = self._key_info()
+
+        issuer = provisioner_name(chain[0]) or admin_provisioner
+        if not issuer:
+            raise UnsupportedError("Could not determine the admin provisioner")
+        self._issuer = issuer
+        common_names = chain[0].subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+        self._subject = admin_subject or (str(common_names[0].value) if common_names else "")
+
+    @classmethod
+    def from_module(cls, module: AnsibleModule) -> "AdminClient":
+        """Create a client from the AdminParams and connection options of a module, see resolve_connection()
+
+        Raises:
+            UnsupportedError: If the options can't be handled by this client
+        """
+        params = cast(Dict, module.params)
+        if not params.get("admin_cert") or not params.get("admin_key"):
+            raise UnsupportedError("Admin certificate and key are required")
+        ca_url, root = resolve_connection(module)
+
+        password: Optional[bytes] = None
+        if params.get("admin_password"):
+            password = params["admin_password"].encode("utf-8")
+        elif params.get("admin_password_file"):
+            password = _read_file(params["admin_password_file"]).rstrip(b"\r\n")
+        return cls(ca_url, root, params["admin_cert"], params["admin_key"], password,
+                   params.get("admin_provisioner"), params.get("admin_subject"))
+
+    def _key_info(self) -> Tuple[str, Dict[str, str]]:
+        key = self._key
+        if isinstance(key, ec.EllipticCurvePrivateKey):
+            curves = {"secp256r1": ("ES256", "P-256"), "secp384r1": ("ES384", "P-384"), "secp521r1": ("ES512", "P-521")}
+            if key.curve.name not in curves:
+                raise UnsupportedError(f"Unsupported admin key curve: {key.curve.name}")
+            alg, crv = curves[key.curve.name]
+            numbers = key.public_key().public_numbers()
+            size = (key.curve.key_size + 7) // 8
+            return alg, {"crv": crv, "kty": "EC", "x": _b64url(_int_bytes(numbers.x, size)),
+                         "y": _b64url(_int_bytes(numbers.y, size))}
+        if isinstance(key, rsa.RSAPrivateKey):
+            numbers = key.public_key().public_numbers()
+            return "RS256", {"e": _b64url(_int_bytes(numbers.e, (numbers.e.bit_length() + 7) // 8)), "kty": "RSA",
+                             "n": _b64url(_int_bytes(numbers.n, (numbers.n.bit_length() + 7) // 8))}
+        if isinstance(key, ed25519.Ed25519PrivateKey):
+            raw = key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            return "EdDSA", {"crv": "Ed25519", "kty": "OKP", "x": _b64url(raw)}
+        raise UnsupportedError("Unsupported admin key type")
+
+    def _sign(self, data: bytes) -> bytes:
+        key = self._key
+        if isinstance(key, ec.EllipticCurvePrivateKey):
+            hash_alg = {"ES256": hashes.SHA256(), "ES384": hashes.SHA384(), "ES512": hashes.SHA512()}[self._alg]
+            r, s = decode_dss_signature(key.sign(data, ec.ECDSA(hash_alg)))
+            size = (key.curve.key_size + 7) // 8
+            return _int_bytes(r, size) + _int_bytes(s, size)
+        if isinstance(key, rsa.RSAPrivateKey):
+            return key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        return cast(Any, key).sign(data)
+
+    def _token(self, audience: str) -> str:
+        """Sign a new admin token for the given endpoint
+
+        step-ca checks that the audience of admin tokens matches the requested endpoint and rejects tokens
+        whose ID was already used, so every request needs its own token.
+        """
+        now = int(time.time())
+        thumbprint = hashlib.sha256(json.dumps(self._jwk, separators=(",", ":"), sort_keys=True).encode()).digest()
+        header = {"alg": self._alg, "kid": _b64url(thumbprint), "typ": "JWT", "x5c": self._x5c}
+        claims = {
+            "aud": audience, "exp": now + TOKEN_VALIDITY, "iat": now, "iss": self._issuer,
+            "jti": secrets.token_hex(32), "nbf": now, "sub": self._subject,
+        }
+        signing_input = f"{_b64url(json.dumps(header).encode())}.{_b64url(json.dumps(claims).encode())}"
+        return f"{signing_input}.{_b64url(self._sign(signing_input.encode('ascii')))}"
+
+    def _auth_headers(self, url: str) -> Dict[str, str]:
+        if urlsplit(url).path.startswith(f"{urlsplit(self.base_url).path}/admin/"):
+            return {"Authorization": self._token(url)}
+        return {}
+
+    def get_provisioner(self, name: str) -> Dict[str, Any]:
+        """Retrieve a single provisioner in the linkedca format"""
+        return cast(Dict[str, Any], self.request("GET", f"admin/provisioners/{quote(name, safe='')}"))
+
+    def create_provisioner(self, provisioner: Dict[str, Any]) -> None:
+        self.request("POST", "admin/provisioners", body=provisioner)
+
+    def update_provisioner(self, name: str, provisioner: Dict[str, Any]) -> None:
+        self.request("PUT", f"admin/provisioners/{quote(name, safe='')}", body=provisioner)
+
+    def remove_provisioner(self, name: str) -> None:
+        self.request("DELETE", f"admin/provisioners/{quote(name, safe='')}")
+
+
+def linkedca_provisioner(params: Dict[str, Any], current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the linkedca representation of a provisioner from the options of a step-cli provisioner add/update call
+
+    Args:
+        params (Dict[str, Any]): The provisioner options
+        current (Optional[Dict[str, Any]]): The existing provisioner in the linkedca format when updating.
+            Like in step-cli, unset options are left as-is and list values are added to the existing values.
+
+    Raises:
+        UnsupportedError: If the options can only be applied by step-cli
+    """
+    if any(params.get(p) for p in UNSUPPORTED_PARAMS):
+        raise UnsupportedError("Options require step-cli")
+    if current is None:
+        p_type = params["type"]
+        details_key = LINKEDCA_DETAILS.get(p_type, p_type)
+        provisioner: Dict[str, Any] = {
+            "type": LINKEDCA_TYPES.get(p_type, p_type.upper()), "name": params["name"],
+            "details": {details_key: {}}, "claims": {"x509": {"enabled": True}},
+        }
+    else:
+        provisioner = copy.deepcopy(current)
+        details_key = next(iter(provisioner.get("details") or {}), "")
+        p_type = {v: k for k, v in LINKEDCA_DETAILS.items()}.get(details_key, details_key)
+    if p_type not in LINKEDCA_DETAIL_FIELDS:
+        raise UnsupportedError(f"Unsupported provisioner type: {p_type}")
+    details = provisioner.setdefault("details", {}).setdefault(details_key, {})
+
+    detail_fields = LINKEDCA_DETAIL_FIELDS[p_type]
+    file_fields = LINKEDCA_FILE_FIELDS.get(p_type, {})
+    allowed = {*detail_fields, *file_fields, *(["public_key"] if p_type == "JWK" else [])}
+    for param in TYPE_PARAMS:
+        if params.get(param) and param not in allowed:
+            # step-cli decides what to do with options that don't apply to this type
+            raise UnsupportedError(f"Option {param} is not supported for {p_type} provisioners")
+
+    for param, field in detail_fields.items():
+        value = params.get(param)
+        if value is None or value is False or value == []:
+            continue
+        if isinstance(value, list):
+            value = list(dict.fromkeys((details.get(field) or []) + value))
+        details[field] = int(value) if param in INT_FIELDS else value
+    for param, field in file_fields.items():
+        if params.get(param):
+            details[field] = [base64.b64encode(_read_file(params[param])).decode("ascii")]
+    if p_type == "JWK":
+        if params.get("public_key"):
+            key = _read_file(params["public_key"])
+            try:
+                if "kty" not in json.loads(key):
+                    raise ValueError("not a JWK")
+            except (ValueError, TypeError) as e:
+                raise UnsupportedError("Public key is not in JWK format") from e
+            details["publicKey"] = base64.b64encode(key).decode("ascii")
+        elif current is None:
+            raise UnsupportedError("JWK provisioners require a key")
+
+    claims = provisioner.setdefault("claims", {})
+    for param, path in LINKEDCA_CLAIM_FIELDS.items():
+        value = params.get(param)
+        if value is None or value is False:
+            continue
+        obj = claims
+        for key in path[:-1]:
+            obj = obj.setdefault(key, {})
+        obj[path[-1]] = value
+    return provisioner
@@ -0,0 +1,88 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Helpers for modules that manage a list of items (e.g. step_ca_certificates) in a single run.
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, cast
+
+from ansible.module_utils.basic import AnsibleModule
+
+
+class ItemFailedError(Exception):
+    """Raised by ItemModule.fail_json() to abort processing of a single item"""
+
+    def __init__(self, msg: str, **kwargs: Any) -> None:
+        super().__init__(msg)
+        self.msg = msg
+        self.result = kwargs
+
+
+class ItemModule:
+    """Presents a single item of a bulk module as if it were its own module.
+
+    This allows bulk modules to reuse the logic written for their single-item counterparts, which only expects
+    an AnsibleModule-like object with params. The params of the item take precedence over the params of the
+    parent module, so shared options (such as the CA connection) can be set once for all items.
+    Item params that are not set (None) fall back to the parent module param of the same name, if there is one.
+
+    Unlike AnsibleModule.fail_json(), fail_json() raises an ItemFailedError instead of exiting,
+    so that a failing item does not abort the processing of the other items.
+    index is the position of the item in the list of items passed to run_items().
+    """
+
+    def __init__(
+        self, module: AnsibleModule, params: Dict[str, Any], argument_spec: Dict[str, Any], index: int = 0
+    ) -> None:
+        self._module = module
+        self.index = index
+        parent_params = cast(Dict[str, Any], module.params)
+        self.params = {
+            **parent_params,
+            **{k: v for k, v in params.items() if v is not None or k not in parent_params},
+        }
+        self.argument_spec = {**module.argument_spec, **argument_spec}
+
+    @property
+    def parent(self) -> AnsibleModule:
+        """The bulk module this item belongs to"""
+        return self._module
+
+    def fail_json(self, msg: str = "", **kwargs: Any) -> None:
+        raise ItemFailedError(kwargs.pop("msg", msg), **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything else (check_mode, run_command, warn, ...) is delegated to the real module
+        return getattr(self._module, name)
+
+
+def run_items(
+    module: AnsibleModule, items: List[Dict[str, Any]], argument_spec: Dict[str, Any],
+    func: Callable[[ItemModule], Dict[str, Any]], workers: int, result_keys: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Run func for every item on a bounded thread pool and collect the results
+
+    Args:
+        module (AnsibleModule): The bulk module
+        items (List[Dict[str, Any]]): The validated item parameters
+        argument_spec (Dict[str, Any]): The argument spec of a single item
+        func (Callable[[ItemModule], Dict[str, Any]]): Processes a single item and returns its result
+        workers (int): The maximum number of items to process concurrently
+        result_keys (Optional[List[str]]): Item parameters to include in each result to identify the item
+
+    Returns:
+        List[Dict[str, Any]]: The results, in the same order as items.
+            Failed items have failed=True and a msg describing the error.
+    """
+    def process(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        item_result: Dict[str, Any] = {key: item.get(key) for key in (result_keys or [])}
+        item_result["changed"] = False
+        try:
+            item_result.update(func(ItemModule(module, item, argument_spec, index)))
+        except ItemFailedError as e:
+            item_result.update(e.result)
+            item_result.update({"failed": True, "msg": e.msg})
+        return item_result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(process, range(len(items)), items))
@@ -0,0 +1,241 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Minimal HTTPS client for the public API of a step-ca instance, used instead of step-cli where possible.
+# All requests of a module run share a single keep-alive connection. Only uses the standard library.
+# If a request cannot be handled by this client, UnsupportedError is raised and callers should fall back to step-cli.
+
+import hashlib
+import http.client
+import json
+import ssl
+from typing import Any, Dict, Iterator, Optional, Tuple, cast
+from urllib.parse import urlencode, urlsplit
+
+from ansible.module_utils.basic import AnsibleModule
+
+from .steppath import get_steppath
+from .x509 import UnsupportedError, der_to_pem, split_pem
+
+# The maximum page size accepted by step-ca
+PAGE_LIMIT = 100
+REQUEST_TIMEOUT = 30
+
+
+class CaApiError(Exception):
+    def __init__(self, msg: str, status: Optional[int] = None) -> None:
+        super().__init__(msg)
+        self.status = status
+
+    @property
+    def auth_failed(self) -> bool:
+        """Whether the request failed before reaching the CA or was rejected due to authentication"""
+        return self.status is None or self.status in (401, 403)
+
+
+def resolve_connection(module: AnsibleModule) -> Tuple[str, str]:
+    """Return the CA URL and root certificate of a module
+
+    Falls back to the values in $STEPPATH/config/defaults.json if the module params are not set, just like step-cli.
+
+    Raises:
+        UnsupportedError: If the CA URL or root certificate are unknown
+    """
+    params = cast(Dict, module.params)
+    ca_url, root = params.get("ca_url"), params.get("root")
+    if not ca_url or not root:
+        try:
+            with open(get_steppath() / "config" / "defaults.json", "rb") as f:
+                defaults = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise UnsupportedError(f"Could not read step-cli defaults: {e}") from e
+        ca_url, root = ca_url or defaults.get("ca-url"), root or defaults.get("root")
+    if not ca_url or not root:
+        raise UnsupportedError("CA URL and root certificate are required")
+    return ca_url, root
+
+
+class CaClient:
+    """Client for the public API of a step-ca instance
+
+    Args:
+        ca_url (str): The URL of the CA
+        root (Optional[str]): The root certificate used to verify the CA. If None, the CA is not verified.
+            Only use this to retrieve data that is verified by other means, see fetch_root()
+
+    Raises:
+        UnsupportedError: If the CA URL or root certificate can't be used
+    """
+
+    def __init__(self, ca_url: str, root: Optional[str]) -> None:
+        url = urlsplit(ca_url)
+        if url.scheme != "https" or not url.hostname:
+            raise UnsupportedError(f"Unsupported CA URL: {ca_url}")
+        self._host = url.hostname
+        self._port = url.port or 443
+        self.base_url = f"https://{url.netloc}{url.path.rstrip('/')}"
+        if root is None:
+            self._ssl_context = ssl.create_default_context()
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        else:
+            try:
+                self._ssl_context = ssl.create_default_context(cafile=root)
+            except (OSError, ssl.SSLError) as e:
+                raise UnsupportedError(f"Could not load root certificate {root}: {e}") from e
+        self._conn: Optional[http.client.HTTPSConnection] = None
+        self._requests = 0
+
+    @classmethod
+    def from_module(cls, module: AnsibleModule) -> "CaClient":
+        """Create a client from the connection options of a module, see resolve_connection()"""
+        return cls(*resolve_connection(module))
+
+    def _connection(self) -> http.client.HTTPSConnection:
+        if self._conn is None:
+            self._conn = http.client.HTTPSConnection(
+                self._host, self._port, timeout=REQUEST_TIMEOUT, context=self._ssl_context)
+            self._requests = 0
+        return self._conn
+
+    def _auth_headers(self, url: str) -> Dict[str, str]:
+        """Headers used to authenticate a request to url. The public API needs no authentication"""
+        # pylint: disable=unused-argument
+        return {}
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "CaClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def request(self, method: str, path: str, body: Any = None, query: Optional[Dict[str, Any]] = None) -> Any:
+        """Send a request to the CA and return the decoded JSON response
+
+        Args:
+            method (str): The HTTP method
+            path (str): The endpoint, relative to the CA URL (e.g. "provisioners")
+            body (Any): Data to send as JSON
+            query (Optional[Dict[str, Any]]): Query parameters
+
+        Raises:
+            CaApiError: If the request failed
+        """
+        url = f"{self.base_url}/{path}"
+        target = urlsplit(url).path + (f"?{urlencode(query)}" if query else "")
+        headers = {"Accept": "application/json", **self._auth_headers(url)}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            conn = self._connection()
+            reused = self._requests > 0
+            try:
+                conn.request(method, target, body=data, headers=headers)
+                res = conn.getresponse()
+                content = res.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # The CA may close idle keep-alive connections. Retry once on a fresh connection in that case
+                self.close()
+                if reused and attempt == 0:
+                    continue
+                raise CaApiError(f"Could not contact CA: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                raise CaApiError(f"Could not contact CA: {e}") from e
+            self._requests += 1
+            if res.getheader("Connection", "").lower() == "close":
+                self.close()
+            break
+
+        try:
+            decoded = json.loads(content) if content else {}
+        except json.JSONDecodeError as e:
+            raise CaApiError(f"Invalid response from CA: {e}", res.status) from e
+        if res.status >= 400:
+            msg = decoded.get("message") if isinstance(decoded, dict) else None
+            raise CaApiError(f"CA returned {res.status}: {msg or res.reason}", res.status)
+        return decoded
+
+    def iter_provisioners(self, limit: int = PAGE_LIMIT) -> Iterator[Dict[str, Any]]:
+        """Iterate over all provisioners of the CA, in the same format as "step-cli ca provisioner list"
+
+        Provisioners are retrieved one page at a time, and the next page is only requested once the previous
+        one has been consumed. This keeps memory usage flat regardless of the number of provisioners,
+        and stopping the iteration early avoids requesting the remaining pages.
+
+        Raises:
+            CaApiError: If a page could not be retrieved
+        """
+        cursor = ""
+        while True:
+            page = self.request("GET", "provisioners", query={"cursor": cursor, "limit": limit})
+            yield from page.get("provisioners") or []
+            cursor = page.get("nextCursor") or ""
+            if not cursor:
+                return
+
+    def find_provisioner(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the provisioner with the given name, without retrieving any pages after it
+
+        Raises:
+            CaApiError: If a page could not be retrieved
+        """
+        return next((p for p in self.iter_provisioners() if p.get("name") == name), None)
+
+
+def normalize_fingerprint(fingerprint: str) -> str:
+    """Return a SHA256 fingerprint in the lowercase hex format used by step-cli"""
+    return fingerprint.replace(":", "").strip().lower()
+
+
+def fetch_root(ca_url: str, fingerprint: str) -> bytes:
+    """Download the root certificate of a CA and verify it against its fingerprint, like "step-cli ca root"
+
+    The CA is not trusted yet at this point, so the TLS connection is not verified.
+    Instead, the returned root must match the SHA256 fingerprint.
+
+    Args:
+        ca_url (str): The URL of the CA
+        fingerprint (str): The SHA256 fingerprint of the root certificate
+
+    Returns:
+        bytes: The root certificate in PEM format
+
+    Raises:
+        UnsupportedError: If the CA URL can't be used by this client
+        CaApiError: If the root could not be retrieved or does not match the fingerprint
+    """
+    with CaClient(ca_url, None) as client:
+        res = client.request("GET", f"root/{normalize_fingerprint(fingerprint)}")
+    pem = res.get("ca", "") if isinstance(res, dict) else ""
+    return verify_root(pem.encode("utf-8"), fingerprint)
+
+
+def verify_root(pem: bytes, fingerprint: str) -> bytes:
+    """Verify that a PEM root certificate matches the given SHA256 fingerprint and return it
+
+    Only the verified certificate is returned, re-encoded from its DER form,
+    so that nothing but the root itself ends up in the trusted root file.
+
+    Raises:
+        CaApiError: If the data doesn't contain exactly one certificate
+            or the certificate does not match the fingerprint
+    """
+    ders = split_pem(pem)
+    if not ders:
+        raise CaApiError("No root certificate found")
+    if len(ders) > 1 or pem.count(b"-----BEGIN") > 1:
+        raise CaApiError("Expected a single root certificate, but found multiple PEM blocks")
+    expected = normalize_fingerprint(fingerprint)
+    actual = hashlib.sha256(ders[0]).hexdigest()
+    if actual != expected:
+        raise CaApiError(f"Root certificate fingerprint {actual} does not match the expected fingerprint {expected}")
+    return der_to_pem(ders[0])
@@ -0,0 +1,368 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Direct editing of the provisioners in a step-ca configuration file (ca.json).
+# Used to apply many provisioner changes with a single write instead of one step-cli call per change.
+# Anything this engine can't represent is reported by CaConfig.supports(), so callers can fall back to step-cli.
+
+import base64
+import fcntl
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from .helpers import parse_duration
+
+# Maps module params to their location in a ca.json provisioner object
+PROVISIONER_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "allow_renewal_after_expiry": ("claims", "allowRenewalAfterExpiry"),
+    "aws_accounts": ("accounts",),
+    "azure_audience": ("audience",),
+    "azure_object_ids": ("objectIDs",),
+    "azure_resource_groups": ("resourceGroups",),
+    "azure_subscription_ids": ("subscriptionIDs",),
+    "azure_tenant": ("tenantID",),
+    "disable_custom_sans": ("disableCustomSANs",),
+    "disable_renewal": ("claims", "disableRenewal"),
+    "disable_trust_on_first_use": ("disableTrustOnFirstUse",),
+    "force_cn": ("forceCN",),
+    "gcp_projects": ("projectIDs",),
+    "gcp_service_accounts": ("serviceAccounts",),
+    "instance_age": ("instanceAge",),
+    "oidc_admins": ("admins",),
+    "oidc_client_id": ("clientID",),
+    "oidc_client_secret": ("clientSecret",),
+    "oidc_configuration_endpoint": ("configurationEndpoint",),
+    "oidc_groups": ("groups",),
+    "oidc_listen_address": ("listenAddress",),
+    "oidc_tenant_id": ("tenantID",),
+    "require_eab": ("requireEAB",),
+    "scep_challenge": ("challenge",),
+    "scep_encryption_algorithm_identifier": ("encryptionAlgorithmIdentifier",),
+    "scep_include_root": ("includeRoot",),
+    "scep_min_public_key_length": ("minimumPublicKeyLength",),
+    "ssh": ("claims", "enableSSHCA"),
+    "ssh_host_min_dur": ("claims", "minHostSSHCertDuration"),
+    "ssh_host_max_dur": ("claims", "maxHostSSHCertDuration"),
+    "ssh_host_default_dur": ("claims", "defaultHostSSHCertDuration"),
+    "ssh_user_min_dur": ("claims", "minUserSSHCertDuration"),
+    "ssh_user_max_dur": ("claims", "maxUserSSHCertDuration"),
+    "ssh_user_default_dur": ("claims", "defaultUserSSHCertDuration"),
+    "x509_min_dur": ("claims", "minTLSCertDuration"),
+    "x509_max_dur": ("claims", "maxTLSCertDuration"),
+    "x509_default_dur": ("claims", "defaultTLSCertDuration"),
+}
+# Params that point to a file whose contents are stored base64-encoded, by provisioner type
+PROVISIONER_FILE_FIELDS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "X5C": {"x5c_root": ("roots",)},
+    "K8SSA": {"public_key": ("publicKeys",)},
+    "Nebula": {"nebula_root": ("roots",)},
+}
+# Params that point to a template file (stored as text) or template data file (stored as JSON)
+PROVISIONER_TEMPLATE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "ssh_template": ("options", "ssh", "template"),
+    "ssh_template_data": ("options", "ssh", "templateData"),
+    "x509_template": ("options", "x509", "template"),
+    "x509_template_data": ("options", "x509", "templateData"),
+}
+FILE_PARAMS = ["nebula_root", "public_key", "x5c_root"]
+# Params that are stored as integers in ca.json, but passed as strings to step-cli
+INT_FIELDS = ["scep_min_public_key_length"]
+# Params that only step-cli can apply, as they require key generation/encryption or template processing
+UNSUPPORTED_PARAMS = [
+    "jwk_create", "jwk_private_key", "password", "password_file", "scep_capabilities",
+    "ssh_template", "ssh_template_data", "x509_template", "x509_template_data",
+]
+# Params whose effect can't be compared with an existing provisioner, as the key material is encrypted
+UNVERIFIABLE_PARAMS = ["jwk_create", "jwk_private_key", "password", "password_file"]
+
+
+class CaConfigError(Exception):
+    pass
+
+
+def _set_path(obj: Dict[str, Any], path: Tuple[str, ...], value: Any) -> None:
+    for key in path[:-1]:
+        obj = obj.setdefault(key, {})
+    obj[path[-1]] = value
+
+
+def _get_path(obj: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(obj, dict) or key not in obj:
+            return None
+        obj = obj[key]
+    return obj
+
+
+def _read_file(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        raise CaConfigError(f"Could not read {path}: {e}") from e
+
+
+def _read_jwk(path: str) -> Dict[str, Any]:
+    try:
+        key = json.loads(_read_file(path))
+    except json.JSONDecodeError:
+        key = None
+    if not isinstance(key, dict) or "kty" not in key:
+        raise CaConfigError(f"{path} does not contain a public key in JWK format")
+    return key
+
+
+def provisioner_fields(p_type: str, params: Dict[str, Any]) -> Dict[Tuple[str, ...], Any]:
+    """Map the options of a step-cli provisioner add/update call to the fields of a ca.json provisioner object
+
+    Options that are unset are not included. Bools are only ever passed as flags to step-cli,
+    so False is treated the same as unset.
+
+    Raises:
+        CaConfigError: If a referenced file can't be read
+    """
+    fields: Dict[Tuple[str, ...], Any] = {}
+    for param, path in PROVISIONER_FIELDS.items():
+        value = params.get(param)
+        if value is None or value is False or value == []:
+            continue
+        fields[path] = int(value) if param in INT_FIELDS else value
+    for param, path in PROVISIONER_FILE_FIELDS.get(p_type, {}).items():
+        if params.get(param):
+            fields[path] = base64.b64encode(_read_file(params[param])).decode("ascii")
+    for param, path in PROVISIONER_TEMPLATE_FIELDS.items():
+        if params.get(param):
+            content = _read_file(params[param])
+            try:
+                fields[path] = json.loads(content) if param.endswith("_data") else content.decode("utf-8")
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise CaConfigError(f"Could not parse {params[param]}: {e}") from e
+    if params.get("scep_capabilities"):
+        fields[("capabilities",)] = [params["scep_capabilities"]]
+    if p_type == "JWK" and params.get("public_key"):
+        fields[("key",)] = _read_jwk(params["public_key"])
+    return fields
+
+
+def _field_matches(path: Tuple[str, ...], current: Any, value: Any) -> bool:
+    if isinstance(value, list):
+        # list values are added to the existing values on update, so they only need to be present
+        return isinstance(current, list) and all(v in current for v in value)
+    if path[-1].endswith("Duration") and isinstance(current, str) and isinstance(value, str):
+        # durations are normalized by step-ca, e.g. "24h" is stored as "24h0m0s"
+        try:
+            return parse_duration(current) == parse_duration(value)
+        except ValueError:
+            pass
+    return bool(current == value)
+
+
+def provisioner_changes(current: Dict[str, Any], params: Dict[str, Any]) -> Optional[Dict[str, Tuple[Any, Any]]]:
+    """Compare an existing provisioner with the options of a step-cli provisioner update call
+
+    Follows the semantics of step-cli: unset options are left as-is and list values are added to the existing values.
+
+    Args:
+        current (Dict[str, Any]): The provisioner, as returned by "step-cli ca provisioner list" or stored in ca.json
+        params (Dict[str, Any]): The update options
+
+    Returns:
+        Optional[Dict[str, Tuple[Any, Any]]]: The current and the updated value of each field that would change,
+            by the dotted path of the field. None if the changes can't be determined (e.g. when setting a password),
+            in which case the update should always be performed.
+
+    Raises:
+        CaConfigError: If a referenced file can't be read
+    """
+    if any(params.get(p) for p in UNVERIFIABLE_PARAMS):
+        return None
+    fields = provisioner_fields(current.get("type", ""), params)
+    changes: Dict[str, Tuple[Any, Any]] = {}
+    for path, value in fields.items():
+        before = _get_path(current, path)
+        if _field_matches(path, before, value):
+            continue
+        if isinstance(value, list) and isinstance(before, list):
+            value = before + [v for v in value if v not in before]
+        changes[".".join(path)] = (before, value)
+    return changes
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace the file at path with data in a single rename, keeping its permissions and ownership
+
+    The data is flushed to disk before the rename, and the rename itself is flushed afterwards,
+    so that the file contains either the old or the new data even if the system crashes.
+    """
+    try:
+        st: Optional[os.stat_result] = os.stat(path)
+    except FileNotFoundError:
+        st = None
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if st is not None:
+                os.fchmod(f.fileno(), st.st_mode & 0o7777)
+                try:
+                    os.fchown(f.fileno(), st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def lock_file(path: Path) -> int:
+    """Open and exclusively lock the lock file next to path, waiting for any other holder of the lock
+
+    The lock is held until the returned file descriptor is closed.
+    """
+    fd = os.open(path.with_name(f".{path.name}.lock"), os.O_RDONLY | os.O_CREAT, 0o644)
+    try:
+        # The lock file may be created by a different user than the CA user, both need to be able to open it
+        try:
+            os.fchmod(fd, 0o644)
+        except PermissionError:
+            pass
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+class CaConfig:
+    """A step-ca configuration file, loaded once to apply a batch of provisioner changes in memory
+
+    Changes are only written to disk when calling save(). Every change is recorded in changes,
+    in a structured format suitable for module results.
+    The file is locked from loading it until close() is called, so that concurrent module runs can't
+    overwrite each other's changes. Can be used as a context manager to close it afterwards.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise CaConfigError(f"Error reading CA config: {path} does not exist")
+        try:
+            self._lock_fd: Optional[int] = lock_file(self.path)
+        except OSError as e:
+            raise CaConfigError(f"Error locking CA config: {e}") from e
+        try:
+            with open(self.path, "rb") as f:
+                self._config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.close()
+            raise CaConfigError(f"Error reading CA config: {e}") from e
+        if not isinstance(self._config, dict):
+            self.close()
+            raise CaConfigError(f"Error reading CA config: {path} does not contain a JSON object")
+        self.changes: List[Dict[str, Any]] = []
+
+    def close(self) -> None:
+        """Release the lock on the config file. Changes can't be saved afterwards"""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def __enter__(self) -> "CaConfig":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    @property
+    def admin_enabled(self) -> bool:
+        """Whether provisioners are stored in the CA database (remote management) instead of the config file"""
+        return bool(self._config.get("authority", {}).get("enableAdmin"))
+
+    @property
+    def provisioners(self) -> List[Dict[str, Any]]:
+        return cast(List[Dict[str, Any]], self._config.get("authority", {}).get("provisioners", []))
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.changes)
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        return next((p for p in self.provisioners if p.get("name") == name), None)
+
+    def supports(self, action: str, params: Dict[str, Any]) -> bool:
+        """Check whether a plan_provisioner() action can be applied by this engine"""
+        if self.admin_enabled:
+            return False
+        if action == "remove":
+            return True
+        if any(params.get(p) for p in UNSUPPORTED_PARAMS):
+            return False
+        p_type = params["type"] if action == "add" else (self.find(params["name"]) or {}).get("type")
+        if p_type == "JWK" and (action == "add" or params.get("public_key")):
+            # JWK provisioners need a key. We can only use an existing public key in JWK (JSON) format
+            try:
+                _read_jwk(params.get("public_key") or "")
+            except CaConfigError:
+                return False
+        # Files that don't apply to this provisioner type are left for step-cli to reject
+        file_fields = PROVISIONER_FILE_FIELDS.get(cast(str, p_type), {})
+        return not any(params.get(p) and p not in file_fields for p in FILE_PARAMS)
+
+    def apply(self, action: str, params: Dict[str, Any]) -> None:
+        """Apply a plan_provisioner() action to the in-memory config. Call supports() first
+
+        Raises:
+            CaConfigError: If a referenced file can't be read or the provisioner doesn't exist
+        """
+        name = params["name"]
+        if action == "remove":
+            if self.find(name) is None:
+                raise CaConfigError(f"Provisioner {name} not found in CA config")
+            provisioners = [p for p in self.provisioners if p.get("name") != name]
+            authority = self._config.setdefault("authority", {})
+            if provisioners:
+                authority["provisioners"] = provisioners
+            else:
+                # step-cli removes the key entirely once the last provisioner is gone
+                authority.pop("provisioners", None)
+            self.changes.append({"action": "remove", "name": name})
+            return
+
+        if action == "add":
+            provisioner: Dict[str, Any] = {"type": params["type"], "name": name}
+            self._config.setdefault("authority", {}).setdefault("provisioners", []).append(provisioner)
+            fields = provisioner_fields(params["type"], params)
+            changes = {".".join(path): (None, value) for path, value in fields.items()}
+        else:
+            found = self.find(name)
+            if found is None:
+                raise CaConfigError(f"Provisioner {name} not found in CA config")
+            provisioner = found
+            changes = provisioner_changes(provisioner, params) or {}
+
+        for path, (_, value) in changes.items():
+            _set_path(provisioner, tuple(path.split(".")), value)
+        self.changes.append({"action": action, "name": name, "fields": {k: v for k, (_, v) in changes.items()}})
+
+    def save(self) -> None:
+        """Write the config file if anything changed. Uses the same format as step-ca (tab-indented JSON)"""
+        if not self.changed:
+            return
+        if self._lock_fd is None:
+            raise CaConfigError("CA config was closed before saving")
+        data = json.dumps(self._config, indent="\t", ensure_ascii=False) + "\n"
+        try:
+            write_atomic(self.path, data.encode("utf-8"))
+        except OSError as e:
+            raise CaConfigError(f"Error writing CA config: {e}") from e
@@ -0,0 +1,141 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .steppath import get_steppath
+
+# Set this environment variable to override the cache location. An empty value disables caching entirely
+CACHE_DIR_ENV = "SMALLSTEP_ANSIBLE_CACHE_DIR"
+DEFAULT_CACHE_SUBDIR = "ansible-cache"
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Return the directory used by this collection to cache data between module runs
+
+    Defaults to $STEPPATH/ansible-cache, can be overridden with the SMALLSTEP_ANSIBLE_CACHE_DIR environment variable.
+
+    Returns:
+        Optional[Path]: The cache directory, or None if caching has been disabled
+    """
+    override = os.environ.get(CACHE_DIR_ENV)
+    if override is not None:
+        return Path(override) if override else None
+    return get_steppath() / DEFAULT_CACHE_SUBDIR
+
+
+def read_json(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a JSON object from a cache file
+
+    Args:
+        path (Path): The cache file to read
+
+    Returns:
+        Optional[Dict[str, Any]]: The cached data, or None if the file doesn't exist or can't be parsed.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def write_json(path: Path, data: Dict[str, Any]) -> bool:
+    """Atomically write a JSON object to a cache file
+
+    The data is written to a temporary file in the same directory, which is then moved into place.
+    Concurrent readers will therefore only ever see the old or the new file, never a partial write.
+    Failures are not fatal, as the cache is merely an optimization.
+
+    Args:
+        path (Path): The cache file to write
+        data (Dict[str, Any]): The data to store
+
+    Returns:
+        bool: Whether the data was written successfully
+    """
+    tmp_name = ""
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_name, path)
+    except OSError:
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+        return False
+    return True
+
+
+def get_entry(namespace: str, key: str) -> Optional[Dict[str, Any]]:
+    """Retrieve an entry from a bounded, file-backed LRU cache
+
+    Each entry is stored in its own file, named after its key. Reading an entry updates its modification time,
+    which is used to determine the least recently used entries when the cache grows too large.
+
+    Args:
+        namespace (str): Name of the cache, entries are stored in a subdirectory of the same name
+        key (str): Key of the entry, must be safe to use as a filename (e.g. a hex digest)
+
+    Returns:
+        Optional[Dict[str, Any]]: The cached data, or None if the entry doesn't exist or has expired
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    entry_file = cache_dir / namespace / f"{key}.json"
+    entry = read_json(entry_file)
+    if entry is None or not isinstance(entry.get("data"), dict):
+        return None
+    if entry.get("expires", 0) <= time.time():
+        try:
+            entry_file.unlink()
+        except OSError:
+            pass
+        return None
+    try:
+        os.utime(entry_file)
+    except OSError:
+        pass
+    return entry["data"]
+
+
+def put_entry(namespace: str, key: str, data: Dict[str, Any], expires: float, max_entries: int) -> None:
+    """Store an entry in a bounded, file-backed LRU cache. See get_entry() for details.
+
+    If the cache contains more than max_entries entries afterwards, the least recently used ones are removed.
+
+    Args:
+        namespace (str): Name of the cache
+        key (str): Key of the entry, must be safe to use as a filename
+        data (Dict[str, Any]): The data to store
+        expires (float): Unix timestamp after which the entry is no longer valid
+        max_entries (int): Maximum number of entries to keep in this cache
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None or expires <= time.time():
+        return
+    entry_dir = cache_dir / namespace
+    if not write_json(entry_dir / f"{key}.json", {"expires": expires, "data": data}):
+        return
+
+    try:
+        entries = [e for e in os.scandir(entry_dir) if e.name.endswith(".json")]
+        if len(entries) <= max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for e in entries[:len(entries) - max_entries]:
+            os.unlink(e.path)
+    except OSError:
+        # another module run may have removed the entries already
+        pass
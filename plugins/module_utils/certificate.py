@@ -0,0 +1,449 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Certificate management logic shared between step_ca_certificate and step_ca_certificates
+
+from collections import Counter
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import cast, Dict, Any, List, Optional, Tuple
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.validation import check_required_if, check_mutually_exclusive
+
+from .params.ca_connection import CaConnectionParams
+from .cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from . import helpers, x509
+from .keypool import KeyGenerator, KeyPool, KeySpec, default_pool_dir, generate_key, write_private
+
+# Parameters describing a single certificate. Connection parameters are handled by CaConnectionParams
+CERTIFICATE_ARGUMENT_SPEC: Dict[str, Dict[str, Any]] = dict(
+    acme=dict(type="str"),
+    attestation_ca_url=dict(type="str"),
+    attestation_ca_root=dict(type="path"),
+    attestation_uri=dict(type="str"),
+    console=dict(type="bool"),
+    contact=dict(type="list", elements="str"),
+    crt_file=dict(type="path", required=True),
+    curve=dict(type="str", choices=[
+               "P-256", "P-384", "P-521", "Ed25519"], aliases=["crv"]),
+    force=dict(type="bool"),
+    http_listen=dict(type="str"),
+    k8ssa_token_path=dict(type="path"),
+    key_file=dict(type="path", required=True),
+    keypool=dict(type="bool", default=False),
+    keypool_dir=dict(type="path"),
+    kms=dict(type="str"),
+    kty=dict(type="str", choices=["EC", "OKP", "RSA"]),
+    local_key=dict(type="bool", default=False),
+    name=dict(type="str", aliases=["subject"]),
+    nebula_cert=dict(type="path"),
+    nebula_key=dict(type="path"),
+    not_after=dict(type="str"),
+    not_before=dict(type="str"),
+    provisioner=dict(type="str", aliases=["issuer"]),
+    provisioner_password=dict(type="str", no_log=True),
+    provisioner_password_file=dict(type="path", no_log=False),
+    revoke_on_delete=dict(type="bool", default=True),
+    revoke_reason=dict(type="str"),
+    revoke_reason_code=dict(type="str"),
+    san=dict(type="list", elements="str"),
+    set=dict(type="list", elements="str"),
+    set_file=dict(type="path"),
+    size=dict(type="int"),
+    standalone=dict(type="bool"),
+    state=dict(type="str", choices=["present", "revoked", "absent"], default="present"),
+    token=dict(type="str", no_log=True),
+    tpm_storage_directory=dict(type="path"),
+    verify_roots=dict(type="str"),
+    webroot=dict(type="path"),
+    x5c_cert=dict(type="str"),
+    x5c_key=dict(type="path"),
+)
+
+# maps the kty cli parameter to inspect outputs subject_key_info.key_algorithm.name
+CERTINFO_KEY_TYPES = {
+    "RSA": "RSA",
+    "EC": "ECDSA",
+    "OKP": "Ed25519"
+}
+CERTINFO_KEYINFO_KEY = {
+    "RSA": "rsa_public_key",
+    "ECDSA": "ecdsa_public_key"
+}
+
+# Parameters that determine the contents of an issued certificate. A certificate that was issued with the same values
+# does not need to be checked for drift again, see stamp_matches()
+STAMP_PARAMS = ["name", "san", "kty", "curve", "size", "provisioner", "verify_roots"]
+STAMP_VERSION = 1
+# Stamped certificates are fully inspected again once less than this fraction of their lifetime remains
+STAMP_MIN_REMAINING = 1 / 3
+
+
+def stamp_path(crt_file: str) -> Path:
+    """Return the path of the stamp file of a certificate, a hidden file next to it"""
+    path = Path(crt_file)
+    return path.with_name(f".{path.name}.stamp")
+
+
+def _params_digest(module_params: Dict[str, Any]) -> str:
+    params = {param: module_params[param] for param in STAMP_PARAMS}
+    if params["san"]:
+        params["san"] = sorted(set(params["san"]))
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _certificate_stamp(module_params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the stamp of the current certificate file, or None if the certificate could not be read"""
+    try:
+        with open(module_params["crt_file"], "rb") as f:
+            data = f.read()
+        not_before, not_after = x509.certificate_validity(module_params["crt_file"])
+    except (OSError, x509.UnsupportedError):
+        return None
+    ders = x509.split_pem(data) if b"-----BEGIN" in data else [data]
+    return dict(
+        version=STAMP_VERSION,
+        params=_params_digest(module_params),
+        digest=hashlib.sha256(data).hexdigest(),
+        fingerprint=hashlib.sha256(ders[0]).hexdigest(),
+        not_before=not_before.timestamp(),
+        not_after=not_after.timestamp(),
+    )
+
+
+def stamp_matches(module_params: Dict[str, Any]) -> bool:
+    """Check whether the certificate is unchanged since it was stamped with the current parameters
+
+    Only the stamp and certificate file are read, the certificate is not parsed.
+
+    Returns:
+        bool: True if the certificate does not need to be inspected for drift, False if the stamp is missing
+            or outdated, or if the certificate is near its expiry
+    """
+    try:
+        stamp = json.loads(stamp_path(module_params["crt_file"]).read_text(encoding="utf-8"))
+        with open(module_params["crt_file"], "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except (OSError, ValueError):
+        return False
+    if not isinstance(stamp, dict) or stamp.get("version") != STAMP_VERSION:
+        return False
+    if stamp.get("params") != _params_digest(module_params) or stamp.get("digest") != digest:
+        return False
+    try:
+        lifetime = stamp["not_after"] - stamp["not_before"]
+        remaining = stamp["not_after"] - datetime.now(timezone.utc).timestamp()
+    except (KeyError, TypeError):
+        return False
+    return remaining > lifetime * STAMP_MIN_REMAINING
+
+
+def write_stamp(module: AnsibleModule) -> None:
+    """Stamp the certificate with the current parameters. Failures are ignored, as the stamp is only an optimization"""
+    if module.check_mode:
+        return
+    module_params = cast(Dict, module.params)
+    stamp = _certificate_stamp(module_params)
+    if stamp is None:
+        return
+    path = stamp_path(module_params["crt_file"])
+    content = json.dumps(stamp, sort_keys=True)
+    try:
+        if path.exists() and path.read_text(encoding="utf-8") == content:
+            return
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(content, encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def remove_stamp(module: AnsibleModule) -> None:
+    if module.check_mode:
+        return
+    try:
+        stamp_path(cast(Dict, module.params)["crt_file"]).unlink()
+    except OSError:
+        pass
+
+
+# Parameters passed on to "step-cli ca sign" when issuing a certificate for a locally generated or pool key
+SIGN_CLIARGS = ["acme", "console", "contact", "http_listen", "k8ssa_token_path", "nebula_cert", "nebula_key",
+                "not_after", "not_before", "provisioner", "provisioner_password_file", "set", "set_file",
+                "standalone", "token", "webroot", "x5c_cert", "x5c_key"]
+# Parameters that require step-cli to generate or handle the key itself, so no local or pool key can be used
+LOCAL_KEY_INCOMPATIBLE_PARAMS = ["attestation_ca_root", "attestation_ca_url", "attestation_uri", "kms",
+                                 "tpm_storage_directory"]
+
+
+def local_key_spec(module_params: Dict[str, Any]) -> Optional[KeySpec]:
+    """Get the type of key to generate for a certificate, if the key can be handled outside of step-cli
+
+    Returns:
+        Optional[KeySpec]: The key type, or None if step-cli has to generate the key itself
+    """
+    if any(module_params[param] for param in LOCAL_KEY_INCOMPATIBLE_PARAMS) or not x509.HAS_CRYPTOGRAPHY:
+        return None
+    try:
+        return KeySpec.from_params(module_params["kty"], module_params["size"], module_params["curve"])
+    except ValueError:
+        # let step-cli report the invalid parameters
+        return None
+
+
+def take_pool_key(module: AnsibleModule, spec: KeySpec) -> Optional[bytes]:
+    """Take a key from the key pool, or return None if the pool has no key of this type
+
+    The key is not replaced here, call refill_keypools() once all certificates have been processed.
+    """
+    module_params = cast(Dict, module.params)
+    pool = KeyPool(module_params["keypool_dir"] or default_pool_dir())
+    error = pool.refill_error(spec)
+    if error:
+        module.warn(f"Refilling the key pool {pool.directory(spec)} failed: {error}")
+    return pool.take(spec)
+
+
+def refill_keypools(certificates: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+    """Replace the pool keys used by certificates, without making the caller wait for the new keys
+
+    Args:
+        certificates (List[Tuple[Dict[str, Any], Dict[str, Any]]]): The parameters and result of each certificate
+
+    The new keys are generated by a forked process, so this must be called from the main thread
+    after all other threads (such as those of run_items()) have finished.
+    """
+    used: Counter = Counter()
+    for params, result in certificates:
+        if result.get("key_source") == "keypool":
+            used[(Path(params["keypool_dir"] or default_pool_dir()), local_key_spec(params))] += 1
+    for (path, spec), count in used.items():
+        KeyPool(path).refill_in_background(spec, count)
+
+
+def sign_certificate(executable: StepCliExecutable, module: AnsibleModule, key: bytes) -> Dict[str, Any]:
+    """Issue a certificate for an existing key through a CSR, then replace the certificate and key files
+
+    Both files are completely written to temporary files first, so a failed signing request leaves the existing
+    certificate and key untouched. They are then moved into place one after the other, key first.
+    If replacing the certificate fails, the previous key is restored so that the two still match.
+    """
+    module_params = cast(Dict, module.params)
+    crt_file = Path(module_params["crt_file"])
+    key_file = Path(module_params["key_file"])
+    try:
+        csr = x509.build_csr(key, module_params["name"], module_params["san"] or [module_params["name"]])
+    except x509.UnsupportedError as e:
+        module.fail_json(f"Could not create certificate signing request: {e}")
+
+    tmp_suffix = f"{os.getpid()}.tmp"
+    csr_tmp = crt_file.with_name(f".{crt_file.name}.csr.{tmp_suffix}")
+    crt_tmp = crt_file.with_name(f".{crt_file.name}.{tmp_suffix}")
+    key_tmp = key_file.with_name(f".{key_file.name}.{tmp_suffix}")
+    key_old = key_file.with_name(f".{key_file.name}.old.{tmp_suffix}")
+    try:
+        csr_tmp.write_bytes(csr)
+        sign_args = CaConnectionParams.cli_args().join(CliCommandArgs(
+            ["ca", "sign", csr_tmp.as_posix(), crt_tmp.as_posix(), "--force"],
+            {arg: f"--{arg.replace('_', '-')}" for arg in SIGN_CLIARGS},
+            {"provisioner_password": "--provisioner-password-file"}))
+        CliCommand(executable, sign_args).run(module)
+        write_private(key_tmp, key)
+        if key_file.exists():
+            os.link(key_file, key_old)
+        os.replace(key_tmp, key_file)
+        try:
+            os.replace(crt_tmp, crt_file)
+        except OSError:
+            if key_old.exists():
+                os.replace(key_old, key_file)
+            raise
+    except OSError as e:
+        module.fail_json(f"Could not write certificate: {e}")
+    finally:
+        for tmp in (csr_tmp, crt_tmp, key_tmp, key_old):
+            tmp.unlink(missing_ok=True)
+    return {"changed": True}
+
+
+def create_certificate(
+    executable: StepCliExecutable, module: AnsibleModule, force: bool = False,
+    key_generator: Optional[KeyGenerator] = None
+) -> Dict[str, Any]:
+    module_params = cast(Dict, module.params)
+    spec = local_key_spec(module_params) if module_params["keypool"] or module_params["local_key"] else None
+    if spec is not None and not module.check_mode:
+        key_source = "keypool"
+        key = take_pool_key(module, spec) if module_params["keypool"] else None
+        if key is None and module_params["local_key"]:
+            key_source = "local"
+            key = key_generator.generate(spec) if key_generator else generate_key(spec)
+        if key is not None:
+            return {**sign_certificate(executable, module, key), "key_source": key_source}
+
+    # step ca certificate arguments
+    cert_cliargs = ["acme", "attestation_ca_url", "attestation_ca_root", "console", "contact", "curve",
+                    "http_listen", "k8ssa_token_path", "kms", "kty", "nebula_cert", "nebula_key", "not_after",
+                    "not_before", "provisioner", "provisioner_password_file", "san", "set", "set_file", "size",
+                    "standalone", "token", "tpm_storage_directory", "webroot", "x5c_cert", "x5c_key"]
+    # All parameters can be converted to a mapping by just appending -- and replacing the underscores
+    cert_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in cert_cliargs}
+
+    args = ["ca", "certificate", module_params["name"], module_params["crt_file"], module_params["key_file"]]
+    if force:
+        args.append("--force")
+
+    create_args = CaConnectionParams.cli_args().join(CliCommandArgs(
+        args, cert_cliarg_map, {"provisioner_password": "--provisioner-password-file"}))
+    create_cmd = CliCommand(executable, create_args)
+    create_cmd.run(module)
+    return {"changed": True}
+
+
+def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule) -> str:
+    """Check whether a certificate needs to be recreated based on its validity and module parameters
+
+    Returns:
+        str: Reason for certificate recreation, or empty string if no recreation is needed
+    """
+    module_params = cast(Dict, module.params)
+
+    cert_info = helpers.get_certificate_info(
+        executable, module, module_params["crt_file"], roots=module_params["verify_roots"])
+
+    # certificate is invalid
+    if not cert_info.valid:
+        return cert_info.invalid_reason
+
+    key_info = cert_info.data["subject_key_info"]
+    current_kty = key_info["key_algorithm"]["name"]
+
+    # ensure SANs match
+    if module_params["san"]:
+        desired_sans = sorted(list(set([module_params["name"]] + module_params["san"])))
+        current_sans = sorted(cert_info.data["names"])
+        if current_sans != desired_sans:
+            return f"Certificate names have changed from {cert_info.data['names']} to {desired_sans}"
+
+    # Ensure key type matches
+    if module_params["kty"]:
+        if current_kty != CERTINFO_KEY_TYPES[module_params["kty"]]:
+            return f"Key type has changed from {current_kty} to {CERTINFO_KEY_TYPES[module_params['kty']]}"
+        if module_params["curve"] and current_kty == "ECDSA":
+            current_curve = key_info["ecdsa_public_key"]["curve"]
+            if current_curve != module_params["curve"]:
+                return f"ECDSA key curve has changed from {current_curve} to {module_params['curve']}"
+
+    # key type matches or is not specified, we can assume the current type is correct
+    if module_params["size"] and current_kty in ["RSA", "ECDSA"]:
+        current_length = key_info[CERTINFO_KEYINFO_KEY[current_kty]]["length"]
+        if current_length != module_params["size"]:
+            return f"Key size has changed from {current_length} to {module_params['size']}"
+    return ""
+
+
+def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule) -> Dict[str, Any]:  # pylint: disable=unused-argument
+    revoke_cliarg_map = {
+        "crt_file": "--cert",
+        "key_file": "--key",
+        "revoke_reason": "--reason",
+        "revoke_reason_code": "--reasonCode",
+        "token": "--token"
+    }
+    revoke_args = CaConnectionParams.cli_args().join(CliCommandArgs(["ca", "revoke"], revoke_cliarg_map))
+    revoke_cmd = CliCommand(executable, revoke_args, fail_on_error=False)
+    res = revoke_cmd.run(module)
+
+    if res.rc != 0 and "is already revoked" in res.stderr:
+        return {}
+    elif res.rc != 0:
+        module.fail_json(f"Error revoking certificate: {res.stderr}")
+        return {"changed": True}  # only here to satisfy the type checker, fail_json never returns
+    else:
+        # ran successfully => revoked
+        return {"changed": True}
+
+
+def delete_certificate(executable: StepCliExecutable, module: AnsibleModule, revoke: bool) -> Dict[str, Any]:
+    module_params = cast(Dict, module.params)
+    result = {}
+    if revoke:
+        result = revoke_certificate(executable, module)
+
+    for file in [Path(module_params["crt_file"]), Path(module_params["key_file"])]:
+        if file.exists():
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                module.fail_json(f"Could not delete file: {e}")
+            result["changed"] = True
+    return result
+
+
+def check_certificate_params(params: Dict[str, Any]) -> None:
+    """Validate the certificate parameters that can't be expressed in the argument spec
+
+    Raises:
+        TypeError: If validation fails
+    """
+    check_required_if([
+        ["state", "present", ["name", "provisioner"], True],
+    ], params)
+    check_mutually_exclusive(["provisioner_password", "provisioner_password_file"], params)
+
+
+def needs_local_key(module_params: Dict[str, Any]) -> bool:
+    """Check whether a certificate will likely be issued with a locally generated key in this run
+
+    This is a cheap estimate that doesn't inspect the certificate, so that callers can decide
+    whether it's worth starting a KeyGenerator.
+    """
+    if module_params["state"] != "present" or not module_params["local_key"] or not local_key_spec(module_params):
+        return False
+    return bool(module_params["force"]) or not stamp_matches(module_params)
+
+
+def manage_certificate(
+    executable: StepCliExecutable, module: AnsibleModule, key_generator: Optional[KeyGenerator] = None
+) -> Dict[str, Any]:
+    """Bring the certificate described by the module parameters into the desired state
+
+    Keys for certificates with local_key are generated with key_generator if set, or inline otherwise.
+
+    Returns:
+        Dict[str, Any]: Result values to be returned by the module
+    """
+    module_params = cast(Dict, module.params)
+    result: Dict[str, Any] = dict(changed=False)
+
+    crt_exists = Path(module_params["crt_file"]).exists()
+    if module_params["state"] == "present":
+        if not crt_exists:
+            result.update(create_certificate(executable, module, key_generator=key_generator))
+            write_stamp(module)
+        elif module_params["force"] or not stamp_matches(module_params):
+            if module_params["force"]:
+                recreate_reason = "force parameter enabled"
+            else:
+                recreate_reason = cert_needs_recreation(executable, module)
+            if recreate_reason:
+                result["recreate_reason"] = recreate_reason
+                result.update(create_certificate(executable, module, force=True, key_generator=key_generator))
+            # Also stamp certificates that passed the full check, so that the next run can skip it
+            write_stamp(module)
+    elif module_params["state"] == "revoked":
+        if crt_exists:
+            result.update(revoke_certificate(executable, module))
+            remove_stamp(module)
+        else:
+            module.fail_json("Cannot revoke certificate as it does not exist")
+    elif module_params["state"] == "absent" and crt_exists:
+        result.update(delete_certificate(executable, module, module_params["revoke_on_delete"]))
+        remove_stamp(module)
+    return result
@@ -1,34 +1,116 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from dataclasses import dataclass, field
-from pathlib import Path
-import tempfile
-from typing import List, Dict, cast
+import os
+import time
+from typing import Any, List, Dict, Optional, Tuple, cast
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.compat.version import LooseVersion
 
 from .constants import COLLECTION_VERSION, COLLECTION_MIN_STEP_CLI_VERSION, COLLECTION_REPO
+from . import cache
+from .secret_files import SecretFiles
+from .timings import get_timings
+
+VERSION_CACHE_FILE = "step-cli-versions.json"
 
 
 class CliError(Exception):
     pass
 
 
+def _cache_key(module: AnsibleModule, executable: str) -> Optional[Dict[str, Any]]:
+    """Identify an executable on disk. Returns None if it cannot be found, in which case no caching occurs"""
+    bin_path = module.get_bin_path(executable)
+    if not bin_path:
+        return None
+    real_path = os.path.realpath(bin_path)
+    try:
+        st = os.stat(real_path)
+    except OSError:
+        return None
+    return {
+        "path": real_path,
+        "dev": st.st_dev,
+        "ino": st.st_ino,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def _read_cached_version(cache_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    cache_dir = cache.get_cache_dir()
+    if cache_key is None or cache_dir is None:
+        return None
+    entry = (cache.read_json(cache_dir / VERSION_CACHE_FILE) or {}).get(cast(str, cache_key["path"]))
+    if not isinstance(entry, dict) or {k: entry.get(k) for k in cache_key} != cache_key:
+        return None
+    version = entry.get("version")
+    return version if isinstance(version, str) and version else None
+
+
+def _write_cached_version(cache_key: Optional[Dict[str, Any]], version: str) -> None:
+    cache_dir = cache.get_cache_dir()
+    if cache_key is None or cache_dir is None:
+        return
+    cache_file = cache_dir / VERSION_CACHE_FILE
+    entries = cache.read_json(cache_file) or {}
+    entries[cast(str, cache_key["path"])] = {**cache_key, "version": version}
+    cache.write_json(cache_file, entries)
+
+
+def probe_version(module: AnsibleModule, executable: str) -> Tuple[str, bool]:
+    """Return the version of a smallstep executable (step-cli or step-ca) and whether it was read from the cache
+
+    The detected version is cached on disk, keyed by the resolved path of the executable
+    and its inode, size and modification time.
+
+    Raises:
+        CliError: If the executable could not be run
+    """
+    cache_key = _cache_key(module, executable)
+    version = _read_cached_version(cache_key)
+    if version is not None:
+        return version, True
+    rc, stdout, stderr = module.run_command([executable, "version"])
+    if rc != 0:
+        raise CliError(stderr)
+    try:
+        # e.g. "Smallstep CLI/0.28.2 (linux/amd64)" or "Smallstep CA/0.28.1 (linux/amd64)"
+        version = stdout.split(" ")[1].split("/")[1]
+    except IndexError as e:
+        raise CliError(f"Unexpected version output: {stdout}") from e
+    _write_cached_version(cache_key, version)
+    return version, False
+
+
 class StepCliExecutable:
     """Represents the presence of a step-cli executable with a given version on the system
+
+    The detected version is cached on disk (see cache.get_cache_dir()), keyed by the resolved path of the executable
+    and its inode, size and modification time. As long as the binary doesn't change, the version is read from
+    the cache and no "step-cli version" process needs to be spawned.
     """
 
     def __init__(self, module: AnsibleModule, executable: str = "step-cli") -> None:
         self._exec = executable
+        timings = get_timings(module)
+        start = time.monotonic()
 
-        rc, stdout, stderr = module.run_command([executable, "version"])
-        if rc != 0:
-            module.fail_json(msg=f"Could not launch step-cli executable. Error: {stderr}")
+        try:
+            version, cached = probe_version(module, executable)
+        except CliError as e:
+            module.fail_json(msg=f"Could not launch step-cli executable. Error: {e}")
+        if timings is not None:
+            timings.record_probe(time.monotonic() - start, cached)
+        self._version = version
 
         # Check whether the CLI version is supported by this collection version.
         # Performs a basic version check, as packaging may not be available on target systems.
-        cli_version = LooseVersion(stdout.split(" ")[1].split("/")[1])
+        cli_version = LooseVersion(version)
         collection_min_version = LooseVersion(COLLECTION_MIN_STEP_CLI_VERSION)
         if cli_version < collection_min_version:
             module.warn(
@@ -40,6 +122,20 @@ class StepCliExecutable:
     def path(self) -> str:
         return self._exec
 
+    @staticmethod
+    def run_command(module: AnsibleModule, cmd: List[str], **kwargs: Any) -> Tuple[int, str, str]:
+        """Run a step-cli command line, recording its timing if instrumentation is enabled"""
+        timings = get_timings(module)
+        start = time.monotonic()
+        rc, stdout, stderr = module.run_command(cmd, **kwargs)
+        if timings is not None:
+            timings.record_command(cmd, time.monotonic() - start, rc, stdout, stderr)
+        return rc, stdout, stderr
+
+    @property
+    def version(self) -> str:
+        return self._version
+
 
 @dataclass
 class CliCommandResult:
@@ -63,6 +159,7 @@ class CliCommandArgs:
             - all other types are formatted and passed as-is
     module_tmpfile_args is the same as module_param_args, except that the value is written to a temporary file
         at runtime and the path to that file is passed instead. This is primarily intended for password files.
+        The files are kept in memory where possible, see SecretFiles.
     """
     args: List[str]
     module_param_args: Dict[str, str] = field(default_factory=dict)
@@ -83,19 +180,14 @@ class CliCommandArgs:
                               {**self.module_tmpfile_args, **other.module_tmpfile_args}
                               )
 
-    def build(self, module: AnsibleModule, tmpdir: Path) -> List[str]:
-        args = self.args
+    def build(self, module: AnsibleModule, secrets: SecretFiles) -> List[str]:
+        args = list(self.args)
         module_params = cast(Dict, module.params)
 
-        # Create temporary files for any parameters that need to point to files, such as password-file
-        # Since these files may contain sensitive data, we first create the fd with locked-down permissions,
-        # then write the actual content
+        # Pass any parameters that need to point to files, such as password-file, through secret files
         for module_arg in [arg for arg in self.module_tmpfile_args if module_params[arg]]:
-            path = tmpdir / module_arg
-            path.touch(0o700, exist_ok=False)
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(module_params[module_arg])
-            args.extend([self.module_tmpfile_args[module_arg], path.as_posix()])
+            path = secrets.add(module_arg, module_params[module_arg])
+            args.extend([self.module_tmpfile_args[module_arg], path])
 
         # transform the values in module_params into valid step-coi arguments using module_args_params mapping
         for param_name in [arg for arg in self.module_param_args if module_params[arg]]:
@@ -145,23 +237,74 @@ class CliCommand:
             CliError if the module args don't match with the provided params
         """
         # use a context manager to ensure that our sensitive temporary files are *always* deleted
-        with tempfile.TemporaryDirectory("-ansible-smallstep") as tmpdir:
-            cmd = [self.executable.path] + self.args.build(module, Path(tmpdir))
-
-            if module.check_mode and not self.run_in_check_mode:
-                return CliCommandResult(0, "", "")
-
-            rc, stdout, stderr = module.run_command(cmd)
-            if rc != 0 and self.fail_on_error:
-                if ("error allocating terminal" in stderr or "open /dev/tty: no such device or address" in stderr):
-                    module.fail_json(
-                        "Failed to run command: step-cli tried to open a terminal for interactive input. "
-                        "This happens when step-cli prompts for additional parameters or asks for confirmation. "
-                        "You may be missing a required parameter (such as 'force'). Check the module documentation. "
-                        "If you are sure that you provided all required parameters, you may have encountered a bug. "
-                        f"Please file an issue at {COLLECTION_REPO} if you think this is the case. "
-                        f"Failed command: \'{' '.join(cmd)}\'"
-                    )
-                else:
-                    module.fail_json(f"Error running command \'{' '.join(cmd)}\'. Error: {stderr}")
-            return CliCommandResult(rc, stdout, stderr)
+        with SecretFiles() as secrets:
+            cmd = self.build(module, secrets)
+            res = self.execute(module, cmd, secrets)
+            self.check_result(module, cmd, res)
+            return res
+
+    def build(self, module: AnsibleModule, secrets: SecretFiles) -> List[str]:
+        """Build the full command line, storing any secret values in secrets"""
+        return [self.executable.path] + self.args.build(module, secrets)
+
+    def execute(self, module: AnsibleModule, cmd: List[str], secrets: SecretFiles) -> CliCommandResult:
+        """Run a command line previously created with build(), respecting check mode"""
+        if module.check_mode and not self.run_in_check_mode:
+            return CliCommandResult(0, "", "")
+
+        rc, stdout, stderr = self.executable.run_command(module, cmd, pass_fds=secrets.pass_fds)
+        return CliCommandResult(rc, stdout, stderr)
+
+    def check_result(self, module: AnsibleModule, cmd: List[str], res: CliCommandResult) -> None:
+        """Fail the module if the command failed and fail_on_error is set"""
+        if res.rc != 0 and self.fail_on_error:
+            if ("error allocating terminal" in res.stderr or "open /dev/tty: no such device or address" in res.stderr):
+                module.fail_json(
+                    "Failed to run command: step-cli tried to open a terminal for interactive input. "
+                    "This happens when step-cli prompts for additional parameters or asks for confirmation. "
+                    "You may be missing a required parameter (such as 'force'). Check the module documentation. "
+                    "If you are sure that you provided all required parameters, you may have encountered a bug. "
+                    f"Please file an issue at {COLLECTION_REPO} if you think this is the case. "
+                    f"Failed command: \'{' '.join(cmd)}\'"
+                )
+            else:
+                module.fail_json(f"Error running command \'{' '.join(cmd)}\'. Error: {res.stderr}")
+
+
+@dataclass
+class CliCommandBatch:
+    """CliCommandBatch runs a set of independent CliCommands concurrently on a bounded thread pool
+
+    Results are returned in the same order as the commands. Each command keeps its own check mode and
+    fail_on_error semantics, failures are only raised once all commands have finished.
+
+    Args:
+        commands (List[CliCommand]): The commands to run. They must not depend on each other
+        max_workers (int): The maximum number of commands to run at the same time. Default is 4
+    """
+    commands: List[CliCommand]
+    max_workers: int = 4
+
+    def run(self, module: AnsibleModule) -> List[CliCommandResult]:
+        """Execute all commands
+
+        Args:
+            module (AnsibleModule): The Ansible module
+
+        Returns:
+            List[CliCommandResult]: Results of the commands, in order.
+
+        Raises:
+            CliError if the module args don't match with the provided params
+        """
+        with ExitStack() as stack:
+            secrets = [stack.enter_context(SecretFiles()) for _ in self.commands]
+            cmds = [command.build(module, cmd_secrets) for command, cmd_secrets in zip(self.commands, secrets)]
+
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(cmds) or 1))) as executor:
+                results = list(executor.map(
+                    lambda c: c[0].execute(module, c[1], c[2]), zip(self.commands, cmds, secrets)))
+
+            for command, cmd, res in zip(self.commands, cmds, results):
+                command.check_result(module, cmd, res)
+            return results
@@ -1,10 +1,28 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import hashlib
 import json
+import os
 from pathlib import Path
-from typing import Dict, Any
+import random
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
 from ansible.module_utils.basic import AnsibleModule
-from ..module_utils.cli_wrapper import CliCommand, StepCliExecutable, CliCommandArgs
+from ..module_utils.cli_wrapper import CliCommand, CliCommandBatch, CliCommandResult, StepCliExecutable, CliCommandArgs
+from ..module_utils import cache, x509
+from ..module_utils.steppath import get_steppath
+
+CERT_INFO_CACHE = "certinfo"
+CERT_INFO_CACHE_MAX_ENTRIES = 256
+# Verification results can change without the certificate changing (e.g. revoked intermediates or an updated
+# system trust store), so they are only cached for a limited time
+CERT_INFO_VERIFY_TTL = 3600
+
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "μs": 1e-6, "ms": 1e-3, "s": 1.0, "m": 60.0, "h": 3600.0}
+DURATION_PART_RE = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|μs|ms|s|m|h)")
+DURATION_RE = re.compile(f"(?:{DURATION_PART_RE.pattern})+")
 
 
 @dataclass
@@ -16,10 +34,14 @@ class CertificateInfo:
 
 def get_certificate_info(
     executable: StepCliExecutable, module: AnsibleModule, path: Path,
-    bundle: bool = False, insecure: bool = False, server_name: str = "", roots: str = ""
+    bundle: bool = False, insecure: bool = False, server_name: str = "", roots: str = "",
+    native_inspect: bool = True
 ) -> CertificateInfo:
     """Retrieve information about a certificate and return step-cli json-formatted information
 
+    If the python cryptography library is available, the certificate is inspected and verified in-process
+    without spawning step-cli. step-cli is used as a fallback for anything the in-process engine can't handle.
+
     Args:
         executable (StepCliExecutable): The executable to run this command with
         module (AnsibleModule): The Ansible module
@@ -28,10 +50,72 @@ def get_certificate_info(
         insecure (bool, optional): See step-cli docs. Defaults to False.
         server_name (str, optional): See step-cli docs. Defaults to "".
         roots (str, optional): See step-cli docs. Defaults to "".
+        native_inspect (bool, optional): Whether the certificate data may be generated in-process.
+            The in-process engine only returns a subset of the step-cli output (names, key info, validity, etc.),
+            so disable this if the full step-cli output is required. Defaults to True.
 
     Returns:
         CertificateInfo: The JSON information as output by step-cli as well as validity information
     """
+    cache_key = _cert_info_cache_key(path, bundle, insecure, server_name, roots, native_inspect)
+    if cache_key:
+        cached = cache.get_entry(CERT_INFO_CACHE, cache_key)
+        if cached is not None:
+            return CertificateInfo(**cached)
+
+    info = _get_certificate_info(executable, module, path, bundle, insecure, server_name, roots, native_inspect)
+
+    if cache_key:
+        not_after = parse_time(_leaf_data(info.data).get("validity", {}).get("end", ""))
+        if not_after is not None:
+            expires = min(not_after.timestamp(), time.time() + CERT_INFO_VERIFY_TTL)
+            cache.put_entry(CERT_INFO_CACHE, cache_key, asdict(info), expires, CERT_INFO_CACHE_MAX_ENTRIES)
+    return info
+
+
+def _get_certificate_info(
+    executable: StepCliExecutable, module: AnsibleModule, path: Path,
+    bundle: bool, insecure: bool, server_name: str, roots: str, native_inspect: bool
+) -> CertificateInfo:
+    data = None
+    if native_inspect and not insecure and not server_name:
+        try:
+            data = x509.inspect(path, bundle=bundle)
+        except x509.UnsupportedError:
+            pass
+
+    verify_result: Optional[Tuple[bool, str]] = None
+    if not server_name:
+        try:
+            valid, invalid_reason = x509.verify(path, roots)
+            # step-cli verifies against the system trust store if no roots are given, which might trust
+            # the certificate even though the STEPPATH root doesn't. Let step-cli have the final say.
+            if valid or roots:
+                verify_result = (valid, invalid_reason)
+        except x509.UnsupportedError:
+            pass
+
+    # Anything the in-process engine couldn't handle is passed to step-cli.
+    # inspect and verify are independent, so run them concurrently if both are needed
+    commands = []
+    if data is None:
+        commands.append(_inspect_cli_command(executable, path, bundle, insecure, server_name, roots))
+    if verify_result is None:
+        commands.append(_verify_cli_command(executable, path, server_name, roots))
+    results = CliCommandBatch(commands).run(module) if commands else []
+
+    if data is None:
+        data = _parse_inspect_result(module, results.pop(0))
+    if verify_result is None:
+        verify_res = results.pop(0)
+        verify_result = (verify_res.rc == 0, "" if verify_res.rc == 0 else verify_res.stderr)
+
+    return CertificateInfo(data, *verify_result)
+
+
+def _inspect_cli_command(
+    executable: StepCliExecutable, path: Path, bundle: bool, insecure: bool, server_name: str, roots: str
+) -> CliCommand:
     inspect_args = ["certificate", "inspect", path, "--format", "json"]
     if bundle:
         inspect_args.append("--bundle")
@@ -41,24 +125,139 @@ def get_certificate_info(
         inspect_args.extend(["--server-name", server_name])
     if roots:
         inspect_args.extend(["--roots", roots])
+    return CliCommand(executable, CliCommandArgs(inspect_args), run_in_check_mode=True)
+
 
-    inspect_cmd = CliCommand(executable, CliCommandArgs(inspect_args), run_in_check_mode=True)
-    inspect_res = inspect_cmd.run(module)
+def _parse_inspect_result(module: AnsibleModule, inspect_res: CliCommandResult) -> Any:
     # The docs say inspect outputs to stderr, but my shell says otherwise:
     # https://github.com/smallstep/cli/issues/1032
     try:
-        data = json.loads(inspect_res.stdout)
+        return json.loads(inspect_res.stdout)
     except json.JSONDecodeError as e:
         module.fail_json(f"Unable to decode returned certificate information. Error: {e}")
+        return None  # only here to satisfy the type checker, fail_json never returns
 
+
+def _verify_cli_command(executable: StepCliExecutable, path: Path, server_name: str, roots: str) -> CliCommand:
     verify_args = ["certificate", "verify", path]
     if server_name:
         verify_args.extend(["--server-name", server_name])
     if roots:
         verify_args.extend(["--roots", roots])
-    verify_cmd = CliCommand(executable, CliCommandArgs(verify_args), run_in_check_mode=True, fail_on_error=False)
-    verify_res = verify_cmd.run(module)
-    valid = verify_res.rc == 0
-    invalid_reason = "" if valid else verify_res.stderr
+    return CliCommand(executable, CliCommandArgs(verify_args), run_in_check_mode=True, fail_on_error=False)
+
+
+def parse_time(value: str) -> Optional[datetime]:
+    """Parse a RFC 3339 timestamp as output by step-cli. Sub-second precision is discarded.
+
+    Returns:
+        Optional[datetime]: The parsed timestamp (timezone-aware), or None if it could not be parsed
+    """
+    value = re.sub(r"\.\d+", "", value.strip())
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_duration(value: str) -> float:
+    """Parse a Go duration string (such as "2h45m" or "-1.5h") as accepted by step-cli
+
+    Returns:
+        float: The duration in seconds
+
+    Raises:
+        ValueError: If the value is not a valid duration
+    """
+    value = value.strip()
+    sign = -1.0 if value.startswith("-") else 1.0
+    body = value.lstrip("+-")
+    if body == "0":
+        return 0.0
+    if not body or not DURATION_RE.fullmatch(body):
+        raise ValueError(f"Invalid duration: '{value}'")
+    return sign * sum(float(num) * DURATION_UNITS[unit] for num, unit in DURATION_PART_RE.findall(body))
+
+
+def format_duration(seconds: float) -> str:
+    """Format a number of seconds as a Go duration string (such as "2h45m0s") that step-cli accepts
+
+    Sub-second precision is discarded.
+    """
+    sign = "-" if seconds < 0 else ""
+    total = int(abs(seconds))
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{sign}{hours}h{minutes}m{secs}s"
+    if minutes:
+        return f"{sign}{minutes}m{secs}s"
+    return f"{sign}{secs}s"
+
+
+def renewal_due(
+    crt_file: Path, expires_in: str, now: Optional[datetime] = None, jitter: Optional[float] = None
+) -> bool:
+    """Check whether a certificate is due for renewal, using the same logic as "step-cli ca renew --expires-in"
+
+    step-cli adds a random jitter of up to expires_in/20 to the renewal window, which is replicated here
+    unless a fixed jitter (in seconds) is given.
+    Only the certificate file is read, no external commands are run.
+
+    Raises:
+        ValueError: If expires_in is not a valid duration
+        x509.UnsupportedError: If the certificate could not be read
+    """
+    window = parse_duration(expires_in)
+    _, not_after = x509.certificate_validity(crt_file)
+    remaining = (not_after - (now or datetime.now(timezone.utc))).total_seconds()
+    if jitter is None:
+        jitter = random.uniform(0, window / 20) if window > 0 else 0.0
+    return remaining <= window + jitter
+
+
+def _leaf_data(data: Any) -> Dict[str, Any]:
+    if isinstance(data, list):
+        return data[0] if data and isinstance(data[0], dict) else {}
+    return data if isinstance(data, dict) else {}
+
+
+def _file_identity(path: Path) -> Optional[List[Any]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [str(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _cert_info_cache_key(
+    path: Path, bundle: bool, insecure: bool, server_name: str, roots: str, native_inspect: bool
+) -> str:
+    """Compute the cache key for a certificate info lookup.
+
+    The key covers the certificate contents and everything else that influences the result.
+    Root certificates are identified by their file metadata rather than their contents to keep lookups cheap.
+    Returns an empty string if the result should not be cached.
+    """
+    try:
+        with open(path, "rb") as f:
+            cert_digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+    if roots:
+        root_paths: List[Path] = []
+        for entry in roots.split(","):
+            root_path = Path(entry.strip())
+            root_paths.extend(sorted(root_path.iterdir()) if root_path.is_dir() else [root_path])
+    else:
+        root_paths = [get_steppath() / "certs" / "root_ca.crt"]
+    root_ids = [_file_identity(p) for p in root_paths]
+    if roots and None in root_ids:
+        return ""
 
-    return CertificateInfo(data, valid, invalid_reason)
+    key = json.dumps([cert_digest, root_ids, server_name, bundle, insecure, native_inspect])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
@@ -0,0 +1,249 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Pool of pre-generated private keys, so that certificates can be issued without waiting for key generation.
+# Generating large RSA keys takes several seconds on small hosts, which would otherwise dominate issuance.
+#
+# The pool is a directory with one subdirectory per key type (e.g. "RSA-4096"), containing unencrypted PEM keys
+# that only the owner can access. Keys are claimed with an atomic rename, so concurrent consumers never get the
+# same key. Requires the python cryptography library on the target host.
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import multiprocessing
+import os
+from pathlib import Path
+import secrets
+from typing import List, Optional
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+from .steppath import get_steppath
+from .x509 import UnsupportedError
+
+KEY_TYPES = ["EC", "OKP", "RSA"]
+# The defaults that step-cli uses for each key type
+DEFAULT_CURVES = {"EC": "P-256", "OKP": "Ed25519"}
+DEFAULT_RSA_SIZE = 2048
+EC_CURVES = ["P-256", "P-384", "P-521"]
+KEY_SUFFIX = ".key"
+# Written into the directory of a key type if refilling it in the background failed
+REFILL_ERROR_FILE = ".refill-error"
+
+
+def default_pool_dir() -> Path:
+    return get_steppath() / "keypool"
+
+
+@dataclass(frozen=True)
+class KeySpec:
+    """The type of a key. Only keys of the exact same type are interchangeable"""
+    kty: str
+    size: Optional[int] = None
+    curve: Optional[str] = None
+
+    @classmethod
+    def from_params(cls, kty: Optional[str], size: Optional[int], curve: Optional[str]) -> "KeySpec":
+        """Create a key spec from step-cli style kty/size/curve parameters, filling in the step-cli defaults
+
+        Raises:
+            ValueError: If the parameters don't describe a valid key type
+        """
+        kty = kty or "EC"
+        if kty not in KEY_TYPES:
+            raise ValueError(f"Unsupported key type: {kty}")
+        if kty == "RSA":
+            size = size or DEFAULT_RSA_SIZE
+            if size < 2048:
+                raise ValueError(f"RSA keys require a size of at least 2048 bits, got {size}")
+            return cls(kty, size=size)
+        curve = curve or DEFAULT_CURVES[kty]
+        if (kty == "EC" and curve not in EC_CURVES) or (kty == "OKP" and curve != "Ed25519"):
+            raise ValueError(f"Curve {curve} is not supported for key type {kty}")
+        return cls(kty, curve=curve)
+
+    @property
+    def name(self) -> str:
+        return f"{self.kty}-{self.size if self.kty == 'RSA' else self.curve}"
+
+
+def generate_key(spec: KeySpec) -> bytes:
+    """Generate a private key in the same unencrypted PEM format that step-cli writes
+
+    Raises:
+        UnsupportedError: If the cryptography library is not installed
+    """
+    if not HAS_CRYPTOGRAPHY:
+        raise UnsupportedError("python cryptography library is not installed")
+    if spec.kty == "RSA":
+        key = rsa.generate_private_key(public_exponent=65537, key_size=spec.size or DEFAULT_RSA_SIZE)
+    elif spec.kty == "EC":
+        curves = {"P-256": ec.SECP256R1(), "P-384": ec.SECP384R1(), "P-521": ec.SECP521R1()}
+        key = ec.generate_private_key(curves[spec.curve or "P-256"])
+    else:
+        return ed25519.Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption())
+
+
+def generate_keys(specs: List[KeySpec], workers: int) -> List[bytes]:
+    """Generate multiple keys, using up to workers processes in parallel
+
+    Key generation is CPU-bound, so separate processes are used to spread it across cores.
+
+    Raises:
+        UnsupportedError: If the cryptography library is not installed
+    """
+    if not HAS_CRYPTOGRAPHY:
+        raise UnsupportedError("python cryptography library is not installed")
+    workers = min(workers, len(specs))
+    if workers <= 1:
+        return [generate_key(spec) for spec in specs]
+    # fork, as the module code is only importable from the AnsiballZ payload of this process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        return list(executor.map(generate_key, specs))
+
+
+class KeyGenerator:
+    """Generates keys on a pool of worker processes that can be shared by multiple threads
+
+    All worker processes are forked when the generator is created, so it should be created before any other
+    threads are started. Call shutdown() or use it as a context manager to stop the workers afterwards.
+
+    Raises:
+        UnsupportedError: If the cryptography library is not installed
+    """
+
+    def __init__(self, workers: int) -> None:
+        if not HAS_CRYPTOGRAPHY:
+            raise UnsupportedError("python cryptography library is not installed")
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+        # Depending on the python version, workers are only started on demand. Keep them all busy once
+        # so that every fork happens now
+        for future in [self._executor.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+    def generate(self, spec: KeySpec) -> bytes:
+        return self._executor.submit(generate_key, spec).result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "KeyGenerator":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.shutdown()
+
+
+def write_private(path: Path, data: bytes) -> None:
+    """Atomically write a file that only the owner can read"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class KeyPool:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def directory(self, spec: KeySpec) -> Path:
+        return self.path / spec.name
+
+    def keys(self, spec: KeySpec) -> List[Path]:
+        directory = self.directory(spec)
+        if not directory.is_dir():
+            return []
+        return sorted(p for p in directory.iterdir() if p.suffix == KEY_SUFFIX and not p.name.startswith("."))
+
+    def available(self, spec: KeySpec) -> int:
+        return len(self.keys(spec))
+
+    def take(self, spec: KeySpec) -> Optional[bytes]:
+        """Remove a key from the pool and return it, or None if the pool is empty"""
+        for key in self.keys(spec):
+            claimed = key.with_name(f".{key.stem}.{os.getpid()}.claimed")
+            try:
+                os.rename(key, claimed)
+            except FileNotFoundError:
+                # claimed by someone else in the meantime
+                continue
+            try:
+                return claimed.read_bytes()
+            finally:
+                claimed.unlink(missing_ok=True)
+        return None
+
+    def add(self, spec: KeySpec, keys: List[bytes]) -> None:
+        directory = self.directory(spec)
+        # Only directories created here are made private, the pool may live in an existing shared directory
+        for path in (self.path, directory):
+            try:
+                path.mkdir(mode=0o700, parents=True)
+            except FileExistsError:
+                pass
+        for key in keys:
+            write_private(directory / f"{secrets.token_hex(8)}{KEY_SUFFIX}", key)
+        (directory / REFILL_ERROR_FILE).unlink(missing_ok=True)
+
+    def clear(self, spec: KeySpec) -> int:
+        """Remove all keys of a type from the pool and return how many were removed"""
+        removed = 0
+        for key in self.keys(spec):
+            try:
+                key.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def refill_error(self, spec: KeySpec) -> Optional[str]:
+        """Return why the last background refill of a key type failed, or None if it didn't"""
+        try:
+            return (self.directory(spec) / REFILL_ERROR_FILE).read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def refill_in_background(self, spec: KeySpec, count: int) -> None:
+        """Add count new keys to the pool from a detached process, so that the caller doesn't have to wait for them
+
+        The process is fully detached (double fork, new session, no inherited file descriptors),
+        so that Ansible doesn't wait for it when reading the module output.
+        As the process is forked, this must only be called while the caller has no other threads running.
+        If the refill fails, the error is recorded for refill_error().
+        """
+        try:
+            pid = os.fork()
+        except OSError:
+            return
+        if pid:
+            os.waitpid(pid, 0)
+            return
+        try:
+            os.setsid()
+            if os.fork():
+                return
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            os.closerange(3, os.sysconf("SC_OPEN_MAX") if hasattr(os, "sysconf") else 1024)
+            self.add(spec, [generate_key(spec) for _ in range(count)])
+        except BaseException as e:  # pylint: disable=broad-except
+            try:
+                write_private(self.directory(spec) / REFILL_ERROR_FILE, f"{e}\n".encode("utf-8"))
+            except BaseException:  # pylint: disable=broad-except
+                pass
+        finally:
+            os._exit(0)  # pylint: disable=protected-access
@@ -0,0 +1,480 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Shared provisioner management logic for the step_ca_provisioner and step_ca_provisioners modules.
+
+import json
+from typing import cast, Any, Collection, Dict, Iterable, List, Optional, Tuple
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.validation import check_mutually_exclusive
+
+from .params.ca_admin import AdminParams
+from .admin_api import AdminClient, linkedca_provisioner
+from .bulk import ItemModule
+from .ca_api import CaApiError, CaClient
+from .ca_config import UNVERIFIABLE_PARAMS, CaConfig, CaConfigError, provisioner_changes, provisioner_fields
+from .cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from .x509 import UnsupportedError
+
+PROVISIONER_TYPES = ["JWK", "OIDC", "AWS", "GCP", "Azure", "ACME", "X5C", "K8SSA", "SSHPOP", "SCEP", "Nebula"]
+
+# Options of a single provisioner, without the connection options
+PROVISIONER_ARGUMENT_SPEC: Dict[str, Dict[str, Any]] = dict(
+    allow_renewal_after_expiry=dict(type="bool"),
+    aws_accounts=dict(type="list", elements="str", aliases=["aws_account"]),
+    azure_audience=dict(type="str"),
+    azure_object_ids=dict(type="list", elements="str", aliases=["azure_object_id"]),
+    azure_resource_groups=dict(type="list", elements="str", aliases=["azure_resource_group"]),
+    azure_subscription_ids=dict(type="list", elements="str", aliases=["azure_subscription_id"]),
+    azure_tenant=dict(type="str"),
+    disable_custom_sans=dict(type="bool"),
+    disable_renewal=dict(type="bool"),
+    disable_trust_on_first_use=dict(type="bool"),
+    force_cn=dict(type="bool"),
+    gcp_projects=dict(type="list", elements="str", aliases=["gcp_project"]),
+    gcp_service_accounts=dict(type="list", elements="str", aliases=["gcp_service_account"]),
+    instance_age=dict(type="str"),
+    jwk_create=dict(type="bool", aliases=["create"]),
+    jwk_private_key=dict(type="path", aliases=["private_key"]),
+    name=dict(type="str", required=True),
+    nebula_root=dict(type="path"),
+    oidc_admins=dict(type="list", elements="str", aliases=["oidc_admin", "admin", "oidc_admin_email"]),
+    oidc_client_id=dict(type="str", aliases=["client_id"]),
+    oidc_client_secret=dict(type="str", no_log=True, aliases=["client_secret"]),
+    oidc_configuration_endpoint=dict(type="str", aliases=["configuration_endpoint"]),
+    oidc_groups=dict(type="list", elements="str", aliases=["group", "oidc_group"]),
+    oidc_listen_address=dict(type="str", aliases=["listen_address", "oidc_client_address"]),
+    oidc_tenant_id=dict(type="str", aliases=["tenant_id"]),
+    password=dict(type="str", no_log=True),
+    password_file=dict(type="path", no_log=False),
+    public_key=dict(type="path", aliases=["jwk_public_key", "k8ssa_public_key", "k8s_pem_keys_file"]),
+    require_eab=dict(type="bool"),
+    scep_capabilities=dict(type="str", aliases=["capabilities"]),
+    scep_challenge=dict(type="str", no_log=True, aliases=["challenge"]),
+    scep_encryption_algorithm_identifier=dict(type="int", aliases=["encryption_algorithm_identifier"]),
+    scep_include_root=dict(type="bool", aliases=["include_root"]),
+    scep_min_public_key_length=dict(type="str", aliases=["min_public_key_length"]),
+    ssh=dict(type="bool", default=True),
+    ssh_host_min_dur=dict(type="str"),
+    ssh_host_max_dur=dict(type="str"),
+    ssh_host_default_dur=dict(type="str"),
+    ssh_user_min_dur=dict(type="str"),
+    ssh_user_max_dur=dict(type="str"),
+    ssh_user_default_dur=dict(type="str"),
+    ssh_template=dict(type="path"),
+    ssh_template_data=dict(type="path"),
+    state=dict(type="str", default="present", choices=["present", "updated", "absent"]),
+    type=dict(type="str", choices=PROVISIONER_TYPES),
+    x509_template=dict(type="path"),
+    x509_template_data=dict(type="path"),
+    x509_min_dur=dict(type="str"),
+    x509_max_dur=dict(type="str"),
+    x509_default_dur=dict(type="str"),
+    x5c_root=dict(type="path", aliases=["x5c_root_file"]),
+)
+
+# We cannot use the default connection module util, as that one includes the --offline flag,
+# which is not valid for the provisioner API call
+CONNECTION_CLIARG_MAP = {
+    "ca_config": "--ca-config",
+    "ca_url": "--ca-url",
+    "root": "--root"
+}
+
+CREATE_UPDATE_CLIARGS = {
+    "allow_renewal_after_expiry": "--allow-renewal-after-expiry",
+    "aws_accounts": "--aws-account",
+    "azure_audience": "--azure-audience",
+    "azure_object_ids": "--azure-object-id",
+    "azure_resource_groups": "--azure-resource-group",
+    "azure_subscription_ids": "--azure-subscription-id",
+    "azure_tenant": "--azure-tenant",
+    "disable_custom_sans": "--disable-custom-sans",
+    "disable_renewal": "--disable-renewal",
+    "disable_trust_on_first_use": "--disable-trust-on-first-use",
+    "force_cn": "--force-cn",
+    "gcp_projects": "--gcp-project",
+    "gcp_service_accounts": "--gcp-service-account",
+    "instance_age": "--instance-age",
+    "jwk_create": "--create",
+    "jwk_private_key": "--private-key",
+    "nebula_root": "--nebula-root",
+    "oidc_admins": "--admin",
+    "oidc_client_id": "--client-id",
+    "oidc_client_secret": "--client-secret",
+    "oidc_configuration_endpoint": "--configuration-endpoint",
+    "oidc_groups": "--group",
+    "oidc_listen_address": "--listen-address",
+    "oidc_tenant_id": "--tenant-id",
+    "password_file": "--password-file",
+    "public_key": "--public-key",
+    "require_eab": "--require-eab",
+    "scep_capabilities": "--capabilities",
+    "scep_challenge": "--challenge",
+    "scep_encryption_algorithm_identifier": "--encryption-algorithm-identifier",
+    "scep_include_root": "--include-root",
+    "scep_min_public_key_length": "--min-public-key-length",
+    "ssh": "--ssh",
+    "ssh_host_min_dur": "--ssh-host-min-dur",
+    "ssh_host_max_dur": "--ssh-host-max-dur",
+    "ssh_host_default_dur": "--ssh-host-default-dur",
+    "ssh_user_min_dur": "--ssh-user-min-dur",
+    "ssh_user_max_dur": "--ssh-user-max-dur",
+    "ssh_user_default_dur": "--ssh-user-default-dur",
+    "ssh_template": "--ssh-template",
+    "ssh_template_data": "--ssh-template-data",
+    "x509_template": "--x509-template",
+    "x509_template_data": "--x509-template-data",
+    "x509_min_dur": "--x509-min-dur",
+    "x509_max_dur": "--x509-max-dur",
+    "x509_default_dur": "--x509-default-dur",
+    "x5c_root": "--x5c-root",
+}
+CREATE_UPDATE_TMPFILE_ARGS = {
+    "password": "--password-file"
+}
+
+
+def add_provisioner(name: str, provisioner_type: str, executable: StepCliExecutable, module: AnsibleModule):
+    args = AdminParams.cli_args().join(CliCommandArgs(
+        ["ca", "provisioner", "add", name, "--type", provisioner_type],
+        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
+        CREATE_UPDATE_TMPFILE_ARGS
+    ))
+    cmd = CliCommand(executable, args)
+    cmd.run(module)
+    return
+
+
+def update_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule):
+    args = AdminParams.cli_args().join(CliCommandArgs(
+        ["ca", "provisioner", "update", name],
+        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
+        CREATE_UPDATE_TMPFILE_ARGS
+    ))
+    cmd = CliCommand(executable, args)
+    cmd.run(module)
+    return
+
+
+def remove_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule):
+    args = AdminParams.cli_args().join(CliCommandArgs(
+        ["ca", "provisioner", "remove", name],
+        CONNECTION_CLIARG_MAP
+    ))
+    cmd = CliCommand(executable, args)
+    cmd.run(module)
+    return
+
+
+def list_provisioners(executable: StepCliExecutable, module: AnsibleModule) -> List[Dict[str, Any]]:
+    """Retrieve all provisioners from the CA, falling back to reading ca_config if the CA is offline
+
+    Args:
+        executable (StepCliExecutable): The executable to run the command with
+        module (AnsibleModule): The Ansible module. Must include the connection and AdminParams options
+
+    Returns:
+        List[Dict[str, Any]]: The provisioners, as returned by step-cli or stored in ca.json
+    """
+    module_params = cast(Dict, module.params)
+    ca_online_check_args = CliCommandArgs(["ca", "provisioner", "list"], CONNECTION_CLIARG_MAP)
+    ca_online_check = CliCommand(executable, ca_online_check_args, run_in_check_mode=True, fail_on_error=False)
+    ca_online_res = ca_online_check.run(module)
+    # Offline provisioner management is possible even if the CA is down.
+    # ca provisioner list does depend on the CA being available however, so we need some backup strategies.
+    if ca_online_res.rc == 0:
+        try:
+            return json.loads(ca_online_res.stdout)
+        except (json.JSONDecodeError, OSError) as e:
+            module.fail_json(f"Error reading provisioner config: {e}")
+    elif AdminParams(module).is_defined():
+        # Admin credentials means that the provisioners are managed remotely and are stored in the DB.
+        # Combined with a connection failure, this means that we are unable to continue
+        module.fail_json(
+            "Could not contact CA to retrieve provisioners and cannot fallback to direct manipulation "
+            "as remote admin parameters are set. Aborting"
+        )
+    else:
+        # Without admin, provisioners are always managed locally, so we can just read them as a fallback
+        try:
+            with open(module_params["ca_config"], "rb") as f:
+                return json.load(f).get("authority", {}).get("provisioners", [])
+        except (json.JSONDecodeError, OSError) as e:
+            module.fail_json(f"Error reading provisioner config: {e}")
+    return []  # only here to satisfy the type checker, fail_json never returns
+
+
+def load_local_config(module: AnsibleModule) -> Optional[CaConfig]:
+    """Load ca_config for direct editing, if the provisioners are managed locally
+
+    Returns:
+        Optional[CaConfig]: The loaded config, locked until it is closed. None if admin parameters are set,
+            the CA stores its provisioners in the database, or the config could not be read.
+            Use step-cli to manage the provisioners in that case.
+    """
+    if AdminParams(module).is_defined():
+        return None
+    try:
+        config = CaConfig(cast(Dict, module.params)["ca_config"])
+    except CaConfigError:
+        return None
+    if config.admin_enabled:
+        config.close()
+        return None
+    return config
+
+
+def admin_client(module: AnsibleModule) -> Optional[AdminClient]:
+    """Create a client for the admin API of the CA, if the provisioners are managed remotely
+
+    Returns:
+        Optional[AdminClient]: The client. None if admin parameters are not set or can't be used without step-cli
+            (e.g. if no admin certificate is given). Use step-cli to manage the provisioners in that case.
+    """
+    if not AdminParams(module).is_defined():
+        return None
+    try:
+        return AdminClient.from_module(module)
+    except UnsupportedError:
+        return None
+
+
+def ca_client(module: AnsibleModule) -> Optional[CaClient]:
+    """Create a client for the public API of the CA. None if the CA URL or root certificate are unknown"""
+    try:
+        return CaClient.from_module(module)
+    except UnsupportedError:
+        return None
+
+
+def index_provisioners(
+    provisioners: Iterable[Dict[str, Any]], names: Collection[str], complete: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    """Index provisioners by name, keeping only the ones that are needed
+
+    Args:
+        provisioners (Iterable[Dict[str, Any]]): The provisioners. May be a lazy iterator, such as
+            CaClient.iter_provisioners(), in which case only as much of it is consumed as needed.
+        names (Collection[str]): The names of the provisioners to index in full
+        complete (bool): Also index all other provisioners, but only with their name and type.
+            Otherwise, stop consuming provisioners once all provisioners in names have been found.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The provisioners by name
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    missing = set(names)
+    for p in provisioners:
+        name = p.get("name")
+        if name in missing:
+            index[name] = p
+            missing.discard(name)
+        elif complete and name not in index:
+            index[name] = {"name": name, "type": p.get("type")}
+        if not missing and not complete:
+            break
+    return index
+
+
+def fetch_provisioners(
+    module: AnsibleModule, config: Optional[CaConfig], client: Optional[CaClient], names: Collection[str],
+    complete: bool = False
+) -> Tuple[Dict[str, Dict[str, Any]], Optional[StepCliExecutable]]:
+    """Retrieve the current provisioners and index them by name, see index_provisioners()
+
+    Provisioners are read from config if set. Otherwise, they are retrieved one page at a time through client,
+    or the public CA API if client is None. step-cli is only used if the CA API is not available.
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], Optional[StepCliExecutable]]: The provisioners by name, as well as the
+            step-cli executable if it had to be used
+    """
+    if config is not None:
+        return index_provisioners(config.provisioners, names, complete), None
+    reader = client or ca_client(module)
+    if reader is not None:
+        try:
+            return index_provisioners(reader.iter_provisioners(), names, complete), None
+        except CaApiError:
+            pass
+    executable = StepCliExecutable(module, cast(Dict, module.params)["step_cli_executable"])
+    return index_provisioners(list_provisioners(executable, module), names, complete), executable
+
+
+def apply_admin_action(client: AdminClient, action: str, module: AnsibleModule) -> bool:
+    """Run a plan_provisioner() action for the provisioner described by module.params through the admin API
+
+    Returns:
+        bool: Whether the action was performed. False if step-cli has to be used instead, either because the
+            options are not supported by the client or because the CA could not be contacted or rejected the token.
+    """
+    module_params = cast(Dict, module.params)
+    name = module_params["name"]
+    if module.check_mode:
+        return True
+    try:
+        if action == "add":
+            client.create_provisioner(linkedca_provisioner(module_params))
+        elif action == "update":
+            client.update_provisioner(name, linkedca_provisioner(module_params, client.get_provisioner(name)))
+        elif action == "remove":
+            client.remove_provisioner(name)
+    except UnsupportedError:
+        return False
+    except CaApiError as e:
+        if e.auth_failed:
+            return False
+        module.fail_json(f"Error managing provisioner {name}: {e}")
+    return True
+
+
+def plan_provisioner(current: Optional[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+    """Determine the action needed to bring a provisioner into the desired state
+
+    Args:
+        current (Optional[Dict[str, Any]]): The provisioner as currently present on the CA, None if it doesn't exist
+        params (Dict[str, Any]): The desired provisioner options, including name and state
+
+    Returns:
+        Optional[str]: "add", "update" or "remove", None if no changes are needed
+
+    Raises:
+        ValueError: If the provisioner doesn't exist but state is "updated"
+    """
+    state = params["state"]
+    if current is None:
+        if state == "present":
+            return "add"
+        if state == "updated":
+            raise ValueError(f"Provisioner {params['name']} not found but state is 'updated'")
+        return None
+    if state == "updated":
+        try:
+            changes = provisioner_changes(current, params)
+        except CaConfigError:
+            # Let step-cli report the unreadable file
+            return "update"
+        return "update" if changes is None or changes else None
+    if state == "absent":
+        return "remove"
+    return None
+
+
+def provisioner_diff(action: str, current: Optional[Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe a plan_provisioner() action in the Ansible --diff format
+
+    Provisioner fields are given as dotted paths in the provisioner object, e.g. "claims.maxTLSCertDuration".
+    Changes that can't be compared, such as a new password, are listed by their option name.
+    """
+    name = params["name"]
+    diff: Dict[str, Any] = {"before_header": f"provisioner {name}", "after_header": f"provisioner {name}"}
+    if action == "remove":
+        return {**diff, "before": current or {}, "after": {}}
+
+    try:
+        if action == "add":
+            fields = provisioner_fields(params["type"], params)
+            changes: Optional[Dict[str, Any]] = {".".join(path): (None, value) for path, value in fields.items()}
+        else:
+            changes = provisioner_changes(cast(Dict[str, Any], current), params)
+    except CaConfigError:
+        changes = None
+    before = {k: b for k, (b, _) in (changes or {}).items() if b is not None}
+    after = {k: a for k, (_, a) in (changes or {}).items()}
+    after.update({p: "(changed)" for p in UNVERIFIABLE_PARAMS if params.get(p)})
+    if action == "add":
+        after = {"name": name, "type": params["type"], **after}
+    return {**diff, "before": before, "after": after}
+
+
+def apply_provisioner_action(action: str, executable: StepCliExecutable, module: AnsibleModule) -> None:
+    """Run a plan_provisioner() action for the provisioner described by module.params"""
+    module_params = cast(Dict, module.params)
+    if action == "add":
+        add_provisioner(module_params["name"], module_params["type"], executable, module)
+    elif action == "update":
+        update_provisioner(module_params["name"], executable, module)
+    elif action == "remove":
+        remove_provisioner(module_params["name"], executable, module)
+
+
+def check_provisioners_params(desired: List[Dict[str, Any]]) -> None:
+    """Validate the provisioner list of step_ca_provisioners beyond what the argument spec can express
+
+    Raises:
+        TypeError: If validation fails
+    """
+    for p in desired:
+        check_mutually_exclusive(["password", "password_file"], p)
+        if p["state"] == "present" and not p["type"]:
+            raise TypeError(f"Provisioner type is required when state == present (provisioner {p['name']})")
+    names = [p["name"] for p in desired]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise TypeError(f"Duplicate provisioner names: {', '.join(duplicates)}")
+
+
+def provisioner_items(
+    desired: List[Dict[str, Any]], current: Dict[str, Dict[str, Any]], exclusive: bool
+) -> List[Dict[str, Any]]:
+    """Return the provisioners to process: the desired ones, plus removals for undeclared ones if exclusive is set"""
+    items = list(desired)
+    if exclusive:
+        declared = {p["name"] for p in desired}
+        items.extend({"name": name, "state": "absent"} for name in current if name not in declared)
+    return items
+
+
+class ProvisionerChanges:
+    """Applies the planned provisioner changes of step_ca_provisioners in two passes
+
+    process_config() applies everything that the local ca.json editor supports and defers the rest.
+    process_cli() then applies the deferred items through the admin API or step-cli, once the config was saved.
+    Both are meant to be passed to run_items().
+    """
+
+    def __init__(
+        self, module: AnsibleModule, current: Dict[str, Dict[str, Any]], config: Optional[CaConfig],
+        client: Optional[AdminClient], executable: Optional[StepCliExecutable]
+    ) -> None:
+        self.module = module
+        self.current = current
+        self.config = config
+        self.client = client
+        self.executable = executable
+        # Indices of the items that process_config() left to process_cli()
+        self.deferred: List[int] = []
+        self.diffs: List[Dict[str, Any]] = []
+
+    def plan(self, item: ItemModule) -> Optional[str]:
+        try:
+            return plan_provisioner(self.current.get(item.params["name"]), item.params)
+        except ValueError as e:
+            item.fail_json(str(e))
+            return None  # makes pylint happy
+
+    def process_config(self, item: ItemModule) -> Dict[str, Any]:
+        action = self.plan(item)
+        if not action:
+            return {}
+        if self.module._diff:  # pylint: disable=protected-access
+            self.diffs.append(provisioner_diff(action, self.current.get(item.params["name"]), item.params))
+        if self.config is None or not self.config.supports(action, item.params):
+            self.deferred.append(item.index)
+            return {}
+        try:
+            self.config.apply(action, item.params)
+        except CaConfigError as e:
+            item.fail_json(str(e))
+        return {"changed": True, "action": action}
+
+    def process_cli(self, item: ItemModule) -> Dict[str, Any]:
+        action = cast(str, self.plan(item))
+        if self.client is None or not apply_admin_action(self.client, action, item):  # type: ignore
+            if self.executable is None:
+                self.executable = StepCliExecutable(
+                    item, cast(Dict, self.module.params)["step_cli_executable"])  # type: ignore
+            apply_provisioner_action(action, self.executable, item)  # type: ignore
+        return {"changed": True, "action": action}
@@ -0,0 +1,68 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Shared certificate renewal logic for the step_ca_renew and step_ca_renew_many modules.
+
+from typing import Dict, List, Optional, cast
+
+from ansible.module_utils.basic import AnsibleModule
+
+from .cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from .helpers import renewal_due
+from .params.ca_connection import CaConnectionParams
+from . import x509
+
+RENEW_SAVED_MSG = "Your certificate has been saved in"
+
+
+def check_renewal_due(module: AnsibleModule, jitter: Optional[float] = None) -> Optional[bool]:
+    """Check whether the certificate in module.params["crt_file"] is due for renewal, based on "expires_in"
+
+    Args:
+        module (AnsibleModule): The Ansible module
+        jitter (Optional[float]): A fixed jitter in seconds to add to expires_in, instead of the random
+            jitter that step-cli uses
+
+    Returns:
+        Optional[bool]: Whether the certificate should be renewed. Always True if expires_in is not set.
+            None if the certificate could not be read, in which case step-cli should evaluate expires_in itself.
+
+    Raises:
+        ValueError: If expires_in is not a valid duration
+    """
+    module_params = cast(Dict, module.params)
+    if not module_params["expires_in"]:
+        return True
+    try:
+        return renewal_due(module_params["crt_file"], module_params["expires_in"], jitter=jitter)
+    except x509.UnsupportedError:
+        return None
+
+
+def renew_certificate(
+    executable: StepCliExecutable, module: AnsibleModule, cliargs: List[str], due: Optional[bool] = True
+) -> bool:
+    """Renew the certificate in module.params["crt_file"] using step-cli
+
+    Args:
+        executable (StepCliExecutable): The executable to run the command with
+        module (AnsibleModule): The Ansible module
+        cliargs (List[str]): Module params to pass on to "step-cli ca renew". Each param is mapped to a flag
+            by prepending -- and replacing underscores with dashes.
+        due (Optional[bool]): The result of check_renewal_due(). If None, expires_in is passed to step-cli.
+
+    Returns:
+        bool: Whether the certificate was renewed
+    """
+    module_params = cast(Dict, module.params)
+    if due is None:
+        cliargs = cliargs + ["expires_in"]
+    cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in cliargs}
+
+    renew_args = CaConnectionParams.cli_args().join(CliCommandArgs(
+        ["ca", "renew", module_params["crt_file"], module_params["key_file"]],
+        cliarg_map,
+        {"password": "--password-file"}
+    ))
+    renew_res = CliCommand(executable, renew_args).run(module)
+    return RENEW_SAVED_MSG in renew_res.stderr
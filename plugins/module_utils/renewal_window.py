@@ -0,0 +1,86 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Deterministic renewal windows, used to spread the renewals of a fleet of certificates.
+#
+# Certificates that are issued at the same time with the same expires_in threshold would all be renewed at the same
+# moment. Instead, each certificate gets a fixed offset within a window that is added to its threshold.
+# The offset is derived from a hash of a seed (usually the inventory hostname and certificate path),
+# so it stays the same across runs and hosts, and the renewals are spread evenly across the window.
+
+import hashlib
+from typing import Any, Dict, Iterable, List
+
+from .helpers import format_duration, parse_duration
+
+
+def renewal_seed(host: str, path: str) -> str:
+    """Return the seed of a certificate, based on the host and path that uniquely identify it"""
+    return f"{host}:{path}"
+
+
+def renewal_offset(seed: str, window: float) -> int:
+    """Return the offset of a seed within a window, in whole seconds
+
+    Args:
+        seed (str): The seed of the certificate, see renewal_seed()
+        window (float): The window length in seconds
+
+    Returns:
+        int: An offset between 0 (inclusive) and the window length (exclusive, unless the window is shorter than 1s)
+    """
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    return int(int.from_bytes(digest[:8], "big") / 2 ** 64 * window)
+
+
+def plan_renewal(seed: str, expires_in: str, window: str) -> Dict[str, Any]:
+    """Compute the renewal threshold of a certificate
+
+    Args:
+        seed (str): The seed of the certificate, see renewal_seed()
+        expires_in (str): The base renewal threshold, as a duration string
+        window (str): The length of the window that renewals are spread across, as a duration string.
+            A certificate is renewed between expires_in and expires_in + window before it expires.
+
+    Raises:
+        ValueError: If either duration is invalid or the window is negative
+
+    Returns:
+        Dict[str, Any]: The seed, the offset in seconds, and the resulting threshold
+            as a duration string (expires_in) and in seconds (expires_in_seconds)
+    """
+    base = parse_duration(expires_in)
+    length = parse_duration(window)
+    if length < 0:
+        raise ValueError(f"Renewal window must not be negative: '{window}'")
+    offset = renewal_offset(seed, length)
+    threshold = int(base) + offset
+    return dict(seed=seed, offset=offset, expires_in=format_duration(threshold), expires_in_seconds=threshold)
+
+
+def renewal_histogram(plans: Iterable[Dict[str, Any]], bucket: str) -> List[Dict[str, Any]]:
+    """Count how many certificates are renewed in each bucket, given the plans of certificates issued together
+
+    Args:
+        plans (Iterable[Dict[str, Any]]): Results of plan_renewal()
+        bucket (str): The bucket size, as a duration string
+
+    Raises:
+        ValueError: If the bucket size is invalid or not positive
+
+    Returns:
+        List[Dict[str, Any]]: One entry per non-empty bucket, ordered by renewal time (largest threshold first).
+            Each entry contains the start of the bucket as a threshold (expires_in, in seconds: expires_in_seconds)
+            and the number of certificates renewed in it (count).
+    """
+    size = parse_duration(bucket)
+    if size <= 0:
+        raise ValueError(f"Bucket size must be positive: '{bucket}'")
+    counts: Dict[int, int] = {}
+    for plan in plans:
+        start = int(plan["expires_in_seconds"] // size * size)
+        counts[start] = counts.get(start, 0) + 1
+    return [
+        dict(expires_in=format_duration(start), expires_in_seconds=start, count=counts[start])
+        for start in sorted(counts, reverse=True)
+    ]
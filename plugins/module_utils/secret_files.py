@@ -0,0 +1,95 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Transport for secret values (e.g. provisioner passwords) that step-cli only accepts as a file path.
+
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+# Memory-backed directory used if anonymous memory files are not available
+SHM_DIR = "/dev/shm"
+TMPDIR_SUFFIX = "-ansible-smallstep"
+
+
+def _memfd_supported() -> bool:
+    return hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd")
+
+
+class SecretFiles:
+    """A set of files containing secret values that are passed to step-cli by path
+
+    The storage backend is chosen per file in order of preference:
+
+    1. An anonymous memory file (memfd), passed to step-cli as /proc/self/fd/N. The file never appears in any
+       filesystem and disappears once the last file descriptor is closed.
+       The descriptors must be passed to the child process with pass_fds.
+    2. A private directory on tmpfs (/dev/shm), so that the secret at least doesn't end up on disk.
+    3. A private temporary directory in the default location (usually /tmp), same as before.
+
+    Use this class as a context manager to ensure that all files are removed afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._fds: List[int] = []
+        self._tmpdir: Optional[Path] = None
+
+    def __enter__(self) -> "SecretFiles":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def pass_fds(self) -> Tuple[int, ...]:
+        """File descriptors that need to be inherited by the child process"""
+        return tuple(self._fds)
+
+    def add(self, name: str, content: str) -> str:
+        """Store a secret value and return a path that step-cli can read it from
+
+        Args:
+            name (str): Name of the secret, must be unique within this set. Used for the filename
+            content (str): The secret value
+
+        Returns:
+            str: The path to pass to step-cli
+        """
+        data = content.encode("utf-8")
+        if _memfd_supported():
+            try:
+                fd = os.memfd_create(f"ansible-smallstep-{name}")
+            except OSError:
+                pass
+            else:
+                self._fds.append(fd)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                return f"/proc/self/fd/{fd}"
+
+        path = self._get_tmpdir() / name
+        # create the file with locked-down permissions before writing any sensitive data
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path.as_posix()
+
+    def close(self) -> None:
+        """Close and remove all secret files"""
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def _get_tmpdir(self) -> Path:
+        if self._tmpdir is None:
+            try:
+                self._tmpdir = Path(tempfile.mkdtemp(TMPDIR_SUFFIX, dir=SHM_DIR))
+            except OSError:
+                self._tmpdir = Path(tempfile.mkdtemp(TMPDIR_SUFFIX))
+        return self._tmpdir
@@ -0,0 +1,19 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import os
+from pathlib import Path
+
+
+def get_steppath() -> Path:
+    """Return the step-cli configuration directory of the current user
+
+    Respects the $STEPPATH environment variable and falls back to $HOME/.step, just like step-cli does.
+
+    Returns:
+        Path: The STEPPATH directory. Note that this directory may not exist yet
+    """
+    steppath = os.environ.get("STEPPATH")
+    if steppath:
+        return Path(steppath)
+    return Path(os.path.expanduser("~")) / ".step"
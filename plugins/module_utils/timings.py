@@ -0,0 +1,96 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Opt-in instrumentation of step-cli invocations, returned as step_cli_timings by modules that call add_timings().
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from ansible.module_utils.basic import AnsibleModule, remove_values
+
+from .bulk import ItemModule
+
+# Set this environment variable to a truthy value to enable instrumentation
+TIMINGS_ENV = "SMALLSTEP_ANSIBLE_TIMINGS"
+RESULT_KEY = "step_cli_timings"
+# Guards the creation of the collector, as items of bulk modules may run in multiple threads
+_CREATE_LOCK = threading.Lock()
+
+
+def timings_enabled() -> bool:
+    return os.environ.get(TIMINGS_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _subcommand(argv: List[str]) -> str:
+    # e.g. "ca certificate" or "version". Positional arguments after the subcommand are not included
+    return " ".join(arg for arg in argv[1:3] if not arg.startswith("-"))
+
+
+def _byte_len(value: str) -> int:
+    return len(value.encode("utf-8", errors="surrogateescape"))
+
+
+class CommandTimings:
+    """Collects timing information about step-cli invocations during a single module run
+
+    Command lines are redacted using the no_log values of the module, so that secrets don't end up in the result.
+    Calls to record_*() may come from multiple threads (see CliCommandBatch).
+    """
+
+    def __init__(self, module: AnsibleModule) -> None:
+        self._module = module
+        self._lock = threading.Lock()
+        self.entries: List[Dict[str, Any]] = []
+
+    def record_probe(self, wall_time: float, cached: bool) -> None:
+        """Record the detection of the step-cli executable and its version"""
+        self._append({"phase": "probe", "cached": cached, "wall_time": round(wall_time, 6)})
+
+    def record_command(self, argv: List[str], wall_time: float, rc: int, stdout: str, stderr: str) -> None:
+        """Record a single step-cli invocation"""
+        self._append({
+            "phase": "command",
+            "subcommand": _subcommand(argv),
+            "argv": remove_values(list(argv), self._module.no_log_values),
+            "rc": rc,
+            "wall_time": round(wall_time, 6),
+            "stdout_bytes": _byte_len(stdout),
+            "stderr_bytes": _byte_len(stderr),
+        })
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return a copy of the entries recorded so far"""
+        with self._lock:
+            return list(self.entries)
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries.append(entry)
+
+
+def get_timings(module: AnsibleModule) -> Optional[CommandTimings]:
+    """Return the timings collector for this module run, creating it if instrumentation is enabled
+
+    Items of bulk modules share the collector of their parent module.
+    """
+    if isinstance(module, ItemModule):
+        module = module.parent
+    timings = getattr(module, "_smallstep_timings", None)
+    if timings is None and timings_enabled():
+        with _CREATE_LOCK:
+            timings = getattr(module, "_smallstep_timings", None)
+            if timings is None:
+                timings = CommandTimings(module)
+                setattr(module, "_smallstep_timings", timings)
+    return timings
+
+
+def add_timings(module: AnsibleModule, result: Dict[str, Any]) -> None:
+    """Add the collected timings to the result of the module, if instrumentation is enabled
+
+    Modules that support instrumentation call this right before exiting with module.exit_json(**result).
+    """
+    timings = get_timings(module)
+    if timings is not None:
+        result[RESULT_KEY] = timings.snapshot()
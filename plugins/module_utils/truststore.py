@@ -0,0 +1,167 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# In-process check whether a root certificate is trusted by the stores that "step-cli certificate install" manages.
+# Only uses the standard library. Certificates are compared by their DER encoding, so a store is only reported
+# as trusting a root if it contains exactly that certificate.
+
+import glob
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .x509 import split_pem
+
+# The stores that step-cli can install roots into, with the matching "step-cli certificate install" flags.
+# The system store is always installed to unless --no-system is passed
+STORES = ["system", "nss", "java"]
+STORE_INSTALL_FLAGS = {
+    "nss": "--firefox",
+    "java": "--java",
+}
+
+# The system bundles generated by update-ca-certificates (Debian) and update-ca-trust (RedHat), plus other layouts
+SYSTEM_BUNDLES = [
+    "/etc/ssl/certs/ca-certificates.crt",
+    "/etc/pki/ca-trust/extracted/pem/tls-ca-bundle.pem",
+    "/etc/pki/tls/certs/ca-bundle.crt",
+    "/etc/ssl/ca-bundle.pem",
+    "/etc/ssl/cert.pem",
+]
+# NSS databases that step-cli installs into with --firefox, relative to the home directory if not absolute
+NSS_DB_GLOBS = [
+    ".pki/nssdb",
+    "snap/chromium/current/.pki/nssdb",
+    ".mozilla/firefox/*",
+    "snap/firefox/common/.mozilla/firefox/*",
+    "/etc/pki/nssdb",
+]
+NSS_DB_FILES = ["cert9.db", "cert8.db"]
+JAVA_CACERTS = ["lib/security/cacerts", "jre/lib/security/cacerts"]
+
+
+def _read(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def system_bundle() -> Optional[Path]:
+    """Return the system CA bundle, or None if none of the known layouts are present"""
+    for bundle in SYSTEM_BUNDLES:
+        if os.path.isfile(bundle):
+            return Path(bundle)
+    return None
+
+
+def nss_databases() -> List[Path]:
+    """Return all NSS database files that step-cli would install into"""
+    home = os.path.expanduser("~")
+    found = []
+    for pattern in NSS_DB_GLOBS:
+        for directory in sorted(glob.glob(os.path.join(home, pattern))):
+            for name in NSS_DB_FILES:
+                db = Path(directory) / name
+                if db.is_file():
+                    found.append(db)
+                    break
+    return found
+
+
+def java_cacerts() -> Optional[Path]:
+    """Return the Java cacerts keystore that step-cli would install into, which is located through $JAVA_HOME"""
+    java_home = os.environ.get("JAVA_HOME")
+    if not java_home:
+        return None
+    for cacerts in JAVA_CACERTS:
+        path = Path(java_home) / cacerts
+        if path.is_file():
+            return path
+    return None
+
+
+def store_files(store: str) -> Optional[List[Path]]:
+    """Return the files that make up a trust store, or None if the store is not available on this system
+
+    The NSS and Java stores are only considered available if the tools that step-cli uses
+    to manage them (certutil and keytool) are installed as well.
+    """
+    if store == "system":
+        bundle = system_bundle()
+        return [bundle] if bundle else None
+    if store == "nss":
+        dbs = nss_databases()
+        return dbs if dbs and shutil.which("certutil") else None
+    if store == "java":
+        cacerts = java_cacerts()
+        keytool = Path(os.environ.get("JAVA_HOME", "")) / "bin" / "keytool"
+        return [cacerts] if cacerts and keytool.is_file() else None
+    raise ValueError(f"Unknown trust store: {store}")
+
+
+def contains(path: Path, der: bytes) -> bool:
+    """Whether a trust store file contains the DER-encoded certificate
+
+    PEM bundles are parsed. NSS databases and Java keystores store trusted certificates in their DER encoding,
+    so they are searched for it directly. Stores that keep certificates encrypted will never match,
+    in which case the certificate is simply installed again.
+    """
+    data = _read(path)
+    if data is None:
+        return False
+    if b"-----BEGIN CERTIFICATE-----" in data:
+        return der in split_pem(data)
+    return der in data
+
+
+def root_der(data: bytes) -> bytes:
+    """Return the DER encoding of the first certificate in a PEM or DER file
+
+    Raises:
+        ValueError: If the data contains no certificate
+    """
+    if b"-----BEGIN" in data:
+        ders = split_pem(data)
+        if not ders:
+            raise ValueError("No PEM certificate found")
+        return ders[0]
+    if not data.startswith(b"\x30"):
+        raise ValueError("Data is neither a PEM nor a DER certificate")
+    return data
+
+
+def check_stores(root: bytes, stores: List[str]) -> Dict[str, Dict[str, bool]]:
+    """Check which trust stores contain a root certificate
+
+    Args:
+        root (bytes): The root certificate, in PEM or DER format
+        stores (List[str]): The stores to check, see STORES
+
+    Raises:
+        ValueError: If root contains no certificate
+
+    Returns:
+        Dict[str, Dict[str, bool]]: For each store, whether it is available on this system and whether it
+            trusts the root. A store that consists of multiple files (such as NSS) only trusts the root if all
+            of its files contain it.
+    """
+    der = root_der(root)
+    result = {}
+    for store in stores:
+        files = store_files(store)
+        result[store] = dict(
+            available=files is not None,
+            trusted=files is not None and all(contains(f, der) for f in files),
+        )
+    return result
+
+
+def install_flags(missing: List[str]) -> List[str]:
+    """Return the "step-cli certificate install" flags to install a root into exactly the given stores"""
+    flags = [STORE_INSTALL_FLAGS[store] for store in missing if store in STORE_INSTALL_FLAGS]
+    if "system" not in missing:
+        flags.append("--no-system")
+    return flags
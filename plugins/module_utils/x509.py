@@ -0,0 +1,456 @@
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# In-process replacement for "step-cli certificate inspect/verify" and "step-cli certificate create --csr",
+# used to avoid spawning step-cli for simple certificate operations.
+# Requires the python cryptography library on the target host.
+# If the library is missing or a request cannot be handled in-process, UnsupportedError is raised
+# and callers should fall back to step-cli.
+
+import base64
+import binascii
+import ipaddress
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import dsa, ec, ed448, ed25519, rsa
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+from .steppath import get_steppath
+
+# Go/step-cli compatible time format
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+PEM_CERT_RE = re.compile(rb"-----BEGIN CERTIFICATE-----\s+(.+?)\s+-----END CERTIFICATE-----", re.DOTALL)
+MAX_CHAIN_DEPTH = 10
+# Extension that step-ca adds to every certificate to identify the provisioner that issued it
+STEP_PROVISIONER_OID = "1.3.6.1.4.1.37476.9000.64.1"
+
+# Maps the cryptography curve names to the JWA/step-cli curve names
+CURVE_NAMES = {
+    "secp256r1": "P-256",
+    "secp384r1": "P-384",
+    "secp521r1": "P-521",
+}
+
+
+class UnsupportedError(Exception):
+    """The in-process engine cannot handle this request, use step-cli instead"""
+
+
+def _require_cryptography() -> None:
+    if not HAS_CRYPTOGRAPHY:
+        raise UnsupportedError("python cryptography library is not installed")
+
+
+def split_pem(data: bytes) -> List[bytes]:
+    """Return the DER contents of all PEM certificate blocks in data"""
+    certs = []
+    for match in PEM_CERT_RE.finditer(data):
+        try:
+            certs.append(base64.b64decode(b"".join(match.group(1).split()), validate=True))
+        except (binascii.Error, ValueError):
+            continue
+    return certs
+
+
+def der_to_pem(der: bytes) -> bytes:
+    """Encode a DER certificate as a single PEM certificate block"""
+    b64 = base64.b64encode(der)
+    lines = [b64[i:i + 64] for i in range(0, len(b64), 64)]
+    return b"\n".join([b"-----BEGIN CERTIFICATE-----", *lines, b"-----END CERTIFICATE-----"]) + b"\n"
+
+
+def load_certificates(path: Union[str, Path]) -> List["x509.Certificate"]:
+    """Load all certificates from a PEM or DER file
+
+    Raises:
+        UnsupportedError: If the file cannot be read or parsed in-process
+    """
+    _require_cryptography()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise UnsupportedError(f"Could not read {path}: {e}") from e
+
+    try:
+        if b"-----BEGIN" in data:
+            certs = [x509.load_der_x509_certificate(der) for der in split_pem(data)]
+        else:
+            certs = [x509.load_der_x509_certificate(data)]
+    except ValueError as e:
+        raise UnsupportedError(f"Could not parse {path}: {e}") from e
+    if not certs:
+        raise UnsupportedError(f"No certificates found in {path}")
+    return certs
+
+
+def _der_element(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """Parse the DER TLV at offset and return the tag as well as the start and end offsets of its contents"""
+    if offset + 2 > len(data):
+        raise ValueError("Truncated DER element")
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        num_bytes = length & 0x7F
+        if num_bytes == 0 or num_bytes > 4:
+            raise ValueError("Unsupported DER length encoding")
+        length = int.from_bytes(data[offset:offset + num_bytes], "big")
+        offset += num_bytes
+    if offset + length > len(data):
+        raise ValueError("Truncated DER element")
+    return tag, offset, offset + length
+
+
+def _der_time(data: bytes, offset: int) -> Tuple[datetime, int]:
+    tag, start, end = _der_element(data, offset)
+    value = data[start:end].decode("ascii")
+    if tag == 0x17:  # UTCTime, years 1950-2049
+        parsed = datetime.strptime(value, "%y%m%d%H%M%SZ")
+        if parsed.year >= 2050:
+            parsed = parsed.replace(year=parsed.year - 100)
+    elif tag == 0x18:  # GeneralizedTime
+        parsed = datetime.strptime(value, "%Y%m%d%H%M%SZ")
+    else:
+        raise ValueError(f"Unexpected DER tag for time value: {tag:#x}")
+    return parsed.replace(tzinfo=timezone.utc), end
+
+
+def certificate_validity(path: Union[str, Path]) -> Tuple[datetime, datetime]:
+    """Return the notBefore and notAfter timestamps of the first certificate in a PEM or DER file
+
+    Unlike the other functions in this module, this only uses the standard library
+    and thus also works if the cryptography library is not installed.
+
+    Raises:
+        UnsupportedError: If the file cannot be read or parsed
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise UnsupportedError(f"Could not read {path}: {e}") from e
+    if b"-----BEGIN" in data:
+        certs = split_pem(data)
+        if not certs:
+            raise UnsupportedError(f"No certificates found in {path}")
+        data = certs[0]
+
+    try:
+        # Certificate ::= SEQUENCE { tbsCertificate SEQUENCE { [0] version OPTIONAL, serialNumber,
+        #                            signature, issuer, validity SEQUENCE { notBefore, notAfter }, ... }, ... }
+        _, cert_start, _ = _der_element(data, 0)
+        _, tbs_start, _ = _der_element(data, cert_start)
+        tag, _, offset = _der_element(data, tbs_start)
+        if tag == 0xA0:  # explicit version, skip to the serial number
+            _, _, offset = _der_element(data, offset)
+        for _ in range(2):  # signature algorithm, issuer
+            _, _, offset = _der_element(data, offset)
+        tag, validity_start, _ = _der_element(data, offset)
+        if tag != 0x30:
+            raise ValueError("Validity is not a sequence")
+        not_before, offset = _der_time(data, validity_start)
+        not_after, _ = _der_time(data, offset)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise UnsupportedError(f"Could not parse {path}: {e}") from e
+    return not_before, not_after
+
+
+def _not_before(cert: "x509.Certificate") -> datetime:
+    if hasattr(cert, "not_valid_before_utc"):
+        return cert.not_valid_before_utc
+    return cert.not_valid_before.replace(tzinfo=timezone.utc)
+
+
+def _not_after(cert: "x509.Certificate") -> datetime:
+    if hasattr(cert, "not_valid_after_utc"):
+        return cert.not_valid_after_utc
+    return cert.not_valid_after.replace(tzinfo=timezone.utc)
+
+
+def _name_info(name: "x509.Name") -> Dict[str, List[str]]:
+    info: Dict[str, List[str]] = {}
+    for attr in name:
+        key = getattr(attr.oid, "_name", attr.oid.dotted_string)
+        key = re.sub(r"(?<!^)(?=[A-Z])", "_", key).lower()
+        info.setdefault(key, []).append(str(attr.value))
+    return info
+
+
+def _key_info(cert: "x509.Certificate") -> Dict[str, Any]:
+    key = cert.public_key()
+    if isinstance(key, rsa.RSAPublicKey):
+        numbers = key.public_numbers()
+        return {
+            "key_algorithm": {"name": "RSA"},
+            "rsa_public_key": {"exponent": numbers.e, "length": key.key_size, "modulus": format(numbers.n, "x")},
+        }
+    if isinstance(key, ec.EllipticCurvePublicKey):
+        numbers = key.public_numbers()
+        return {
+            "key_algorithm": {"name": "ECDSA"},
+            "ecdsa_public_key": {
+                "curve": CURVE_NAMES.get(key.curve.name, key.curve.name),
+                "length": key.curve.key_size,
+                "x": format(numbers.x, "x"),
+                "y": format(numbers.y, "x"),
+            },
+        }
+    if isinstance(key, ed25519.Ed25519PublicKey):
+        raw = key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return {"key_algorithm": {"name": "Ed25519"}, "ed25519_public_key": {"pub": raw.hex()}}
+    if isinstance(key, ed448.Ed448PublicKey):
+        raw = key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return {"key_algorithm": {"name": "Ed448"}, "ed448_public_key": {"pub": raw.hex()}}
+    if isinstance(key, dsa.DSAPublicKey):
+        return {"key_algorithm": {"name": "DSA"}, "dsa_public_key": {"length": key.key_size}}
+    raise UnsupportedError(f"Unsupported public key type: {type(key).__name__}")
+
+
+def _names(cert: "x509.Certificate") -> List[str]:
+    names = [str(attr.value) for attr in cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)]
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        san = None
+    if san is not None:
+        names.extend(san.get_values_for_type(x509.DNSName))
+        names.extend(str(ip) for ip in san.get_values_for_type(x509.IPAddress))
+        names.extend(san.get_values_for_type(x509.RFC822Name))
+        names.extend(san.get_values_for_type(x509.UniformResourceIdentifier))
+    # deduplicate while keeping the order intact
+    return list(dict.fromkeys(names))
+
+
+def provisioner_name(cert: "x509.Certificate") -> Optional[str]:
+    """Return the name of the step-ca provisioner that issued a certificate, if it contains that information"""
+    try:
+        ext = cert.extensions.get_extension_for_oid(x509.ObjectIdentifier(STEP_PROVISIONER_OID)).value
+    except x509.ExtensionNotFound:
+        return None
+    data = getattr(ext, "value", b"")
+    try:
+        # SEQUENCE { type INTEGER, name OCTET STRING, credentialID OCTET STRING, ... }
+        _, seq_start, _ = _der_element(data, 0)
+        _, _, offset = _der_element(data, seq_start)
+        _, name_start, name_end = _der_element(data, offset)
+        return data[name_start:name_end].decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def certificate_data(cert: "x509.Certificate") -> Dict[str, Any]:
+    """Build a subset of the "step-cli certificate inspect --format json" output for a certificate"""
+    sig_oid = cert.signature_algorithm_oid
+    return {
+        "version": cert.version.value + 1,
+        "serial_number": str(cert.serial_number),
+        "signature_algorithm": {"name": getattr(sig_oid, "_name", ""), "oid": sig_oid.dotted_string},
+        "issuer": _name_info(cert.issuer),
+        "issuer_dn": cert.issuer.rfc4514_string(),
+        "validity": {
+            "start": _not_before(cert).strftime(TIME_FORMAT),
+            "end": _not_after(cert).strftime(TIME_FORMAT),
+        },
+        "subject": _name_info(cert.subject),
+        "subject_dn": cert.subject.rfc4514_string(),
+        "subject_key_info": _key_info(cert),
+        "names": _names(cert),
+    }
+
+
+def inspect(path: Union[str, Path], bundle: bool = False) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """In-process equivalent of "step-cli certificate inspect --format json [--bundle]"
+
+    Args:
+        path (Union[str, Path]): Path to a PEM or DER certificate file
+        bundle (bool, optional): Return information for all certificates in the file. Defaults to False.
+
+    Raises:
+        UnsupportedError: If the certificate cannot be handled in-process
+
+    Returns:
+        Union[Dict[str, Any], List[Dict[str, Any]]]: Certificate information, a list if bundle is set
+    """
+    certs = load_certificates(path)
+    if bundle:
+        return [certificate_data(c) for c in certs]
+    return certificate_data(certs[0])
+
+
+def _root_files(roots: str) -> List[Path]:
+    if not roots:
+        default_root = get_steppath() / "certs" / "root_ca.crt"
+        if not default_root.is_file():
+            # step-cli would use the system trust store here, which we can't do in-process
+            raise UnsupportedError("No roots given and no STEPPATH root certificate present")
+        return [default_root]
+
+    files: List[Path] = []
+    for entry in roots.split(","):
+        root_path = Path(entry.strip())
+        if root_path.is_dir():
+            files.extend(sorted(p for p in root_path.iterdir() if p.is_file()))
+        else:
+            files.append(root_path)
+    return files
+
+
+def load_roots(roots: str) -> List["x509.Certificate"]:
+    """Load the root certificates from a step-cli compatible --roots value (file, comma-separated files or directory)
+
+    Falls back to $STEPPATH/certs/root_ca.crt if roots is empty.
+    """
+    _require_cryptography()
+    certs = []
+    for root_file in _root_files(roots):
+        try:
+            with open(root_file, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            raise UnsupportedError(f"Could not read roots file {root_file}: {e}") from e
+        try:
+            certs.extend(x509.load_der_x509_certificate(der) for der in split_pem(data))
+        except ValueError as e:
+            raise UnsupportedError(f"Could not parse roots file {root_file}: {e}") from e
+    if not certs:
+        raise UnsupportedError(f"No certificates found in roots: {roots}")
+    return certs
+
+
+def _issued_by(cert: "x509.Certificate", issuer: "x509.Certificate") -> bool:
+    if cert.issuer != issuer.subject:
+        return False
+    if not hasattr(cert, "verify_directly_issued_by"):
+        raise UnsupportedError("Installed cryptography version does not support signature verification")
+    try:
+        cert.verify_directly_issued_by(issuer)
+    except (InvalidSignature, ValueError, TypeError):
+        return False
+    return True
+
+
+def _check_time(cert: "x509.Certificate", now: datetime) -> str:
+    not_before, not_after = _not_before(cert), _not_after(cert)
+    if now < not_before:
+        return (f"x509: certificate has expired or is not yet valid: current time {now.strftime(TIME_FORMAT)} "
+                f"is before {not_before.strftime(TIME_FORMAT)}")
+    if now > not_after:
+        return (f"x509: certificate has expired or is not yet valid: current time {now.strftime(TIME_FORMAT)} "
+                f"is after {not_after.strftime(TIME_FORMAT)}")
+    return ""
+
+
+def _check_issuer(issuer: "x509.Certificate", intermediates: int, root: bool) -> str:
+    """Check that issuer may sign a chain with the given number of intermediates below it, like Go/step-cli does
+
+    Raises:
+        UnsupportedError: For unusual issuers that we leave to step-cli, such as non-CA roots
+            or issuers with a key usage that doesn't include certificate signing
+    """
+    try:
+        constraints = issuer.extensions.get_extension_for_class(x509.BasicConstraints).value
+    except x509.ExtensionNotFound:
+        constraints = None
+    if constraints is None or not constraints.ca:
+        if root:
+            raise UnsupportedError("Root certificate is not a CA certificate")
+        return "x509: certificate is not authorized to sign other certificates"
+    if constraints.path_length is not None and intermediates > constraints.path_length:
+        return "x509: too many intermediates for path length constraint"
+    try:
+        key_usage = issuer.extensions.get_extension_for_class(x509.KeyUsage).value
+    except x509.ExtensionNotFound:
+        return ""
+    if not key_usage.key_cert_sign:
+        raise UnsupportedError("Issuer key usage does not include certificate signing")
+    return ""
+
+
+def verify(path: Union[str, Path], roots: str = "") -> Tuple[bool, str]:
+    """In-process equivalent of "step-cli certificate verify [--roots]"
+
+    Builds a chain from the leaf certificate through any intermediates in the same file up to one of the roots,
+    checking signatures, validity periods and that every issuer is a CA that may sign a chain of this length.
+
+    Args:
+        path (Union[str, Path]): Path to the certificate (bundle) to verify
+        roots (str, optional): step-cli compatible roots specification. Defaults to the STEPPATH root.
+
+    Raises:
+        UnsupportedError: If the verification cannot be performed in-process
+
+    Returns:
+        Tuple[bool, str]: Whether the certificate is valid, and the reason if it isn't
+    """
+    certs = load_certificates(path)
+    root_certs = load_roots(roots)
+    leaf, intermediates = certs[0], certs[1:]
+    now = datetime.now(timezone.utc)
+
+    # the number of intermediates between the current certificate and the leaf
+    current, depth = leaf, 0
+    for _ in range(MAX_CHAIN_DEPTH):
+        reason = _check_time(current, now)
+        if reason:
+            return False, reason
+        if any(current == root for root in root_certs):
+            return True, ""
+        for root in root_certs:
+            if _issued_by(current, root):
+                reason = _check_time(root, now) or _check_issuer(root, depth, root=True)
+                return (False, reason) if reason else (True, "")
+        parent = next((c for c in intermediates if c != current and _issued_by(current, c)), None)
+        if parent is None:
+            break
+        reason = _check_issuer(parent, depth, root=False)
+        if reason:
+            return False, reason
+        current, depth = parent, depth + 1
+    return False, "x509: certificate signed by unknown authority"
+
+
+def _general_name(name: str) -> "x509.GeneralName":
+    """Convert a step-cli style SAN into a GeneralName, detecting its type the same way step-cli does"""
+    try:
+        return x509.IPAddress(ipaddress.ip_address(name))
+    except ValueError:
+        pass
+    if "://" in name:
+        return x509.UniformResourceIdentifier(name)
+    if "@" in name:
+        return x509.RFC822Name(name)
+    return x509.DNSName(name)
+
+
+def build_csr(key_pem: bytes, name: str, sans: List[str]) -> bytes:
+    """Create a PEM certificate signing request for a key, as "step-cli certificate create --csr" would
+
+    Args:
+        key_pem (bytes): The unencrypted private key in PEM format
+        name (str): The subject common name
+        sans (List[str]): The subject alternative names (DNS names, IPs, emails or URIs)
+
+    Raises:
+        UnsupportedError: If the CSR cannot be created in-process
+    """
+    _require_cryptography()
+    try:
+        key = serialization.load_pem_private_key(key_pem, password=None)
+    except (ValueError, TypeError) as e:
+        raise UnsupportedError(f"Could not load private key: {e}") from e
+    builder = x509.CertificateSigningRequestBuilder().subject_name(
+        x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, name)]))
+    if sans:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName([_general_name(san) for san in sans]), critical=False)
+    algorithm = None if isinstance(key, (ed25519.Ed25519PrivateKey, ed448.Ed448PrivateKey)) else hashes.SHA256()
+    return builder.sign(key, algorithm).public_bytes(serialization.Encoding.PEM)
@@ -14,6 +14,13 @@ description: >
   This allows running other C(step-cli ca) commands without having to specify I(ca_url) or I(ca_config) every time.
 notes:
   - Check mode is supported.
+  - >
+    If I(users) is set, the root certificate is downloaded and verified against I(fingerprint) only once,
+    and the configuration is written into the C($STEPPATH) of each user directly.
+    Users that are already bootstrapped to the same I(fingerprint) are skipped without running C(step-cli).
+  - >
+    If I(controller_fetch=yes), the root certificate is downloaded once on the Ansible controller and
+    reused for all hosts, which then don't need to contact the CA at all.
 options:
   ca_url:
     description: URI of the targeted Step Certificate Authority
@@ -34,6 +41,42 @@ options:
   redirect_url:
     description: Terminal OAuth redirect url.
     type: str
+  controller_fetch:
+    description:
+      - Download the root certificate on the Ansible controller instead of on each host.
+      - The root certificate is verified against I(fingerprint) and downloaded only once per playbook run,
+        then passed to the module as I(root_pem).
+      - Requires the controller to be able to reach I(ca_url) directly.
+    type: bool
+    default: no
+    version_added: '0.25.0'
+  root_pem:
+    description:
+      - The root certificate in PEM format. If set, the CA is not contacted and this root is used instead.
+      - The root certificate must still match I(fingerprint).
+      - Set automatically if I(controller_fetch=yes).
+    type: str
+    version_added: '0.25.0'
+  users:
+    description:
+      - Bootstrap C(step-cli) for all of these users at once, instead of the user running the module.
+      - >
+        Writing the configuration of other users requires root privileges.
+        The files of each user are written by a child process running as that user.
+      - If I(install=yes), the root certificate is only installed once.
+    type: list
+    elements: dict
+    version_added: '0.25.0'
+    suboptions:
+      user:
+        description: Name of the user.
+        type: str
+        required: yes
+      steppath:
+        description: >
+          The C($STEPPATH) to write the configuration to.
+          Defaults to C(.step) in the home directory of the user.
+        type: path
 
 extends_documentation_fragment: maxhoesel.smallstep.cli_executable
 """
@@ -49,18 +92,210 @@ EXAMPLES = r"""
     ca_url: https://ca.example.org
     fingerprint: d9d0978692f1c7cc791f5c343ce98771900721405e834cd27b9502cc719f5097
     install: yes
+
+- name: Bootstrap a large number of hosts, downloading the root certificate only once on the controller
+  maxhoesel.smallstep.step_ca_bootstrap:
+    ca_url: https://ca.example.org
+    fingerprint: d9d0978692f1c7cc791f5c343ce98771900721405e834cd27b9502cc719f5097
+    controller_fetch: yes
+
+- name: Bootstrap multiple users at once, fetching the root certificate only once
+  maxhoesel.smallstep.step_ca_bootstrap:
+    ca_url: https://ca.example.org
+    fingerprint: d9d0978692f1c7cc791f5c343ce98771900721405e834cd27b9502cc719f5097
+    users:
+      - user: root
+      - user: alice
+        steppath: /srv/alice/step
+  become: yes
+"""
+
+RETURN = r"""
+users:
+  description: >
+    The bootstrap result for each user in I(users), or for the current user if only I(root_pem) is set.
+    Only returned if I(users) or I(root_pem) is set.
+  returned: success
+  type: list
+  elements: dict
+  contains:
+    user:
+      description: Name of the user
+      type: str
+      returned: success
+    steppath:
+      description: The C($STEPPATH) of the user
+      type: str
+      returned: success
+    changed:
+      description: Whether the user was bootstrapped
+      type: bool
+      returned: success
 """
 
 import json
 import os
-from typing import Dict, cast, Any
+import pwd
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, cast, Any
 
 from ansible.module_utils.basic import AnsibleModule
+from ..module_utils.ca_api import CaApiError, fetch_root, normalize_fingerprint, verify_root
 from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from ..module_utils.x509 import UnsupportedError
+from ..module_utils.timings import add_timings
 
 DEFAULTS_FILE = f"{os.getenv('STEPPATH') or os.environ['HOME'] + '/.step'}/config/defaults.json"
 
 
+def read_fingerprint(defaults_file: Path) -> str:
+    try:
+        with open(defaults_file, "rb") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        # The file probably doesn't exist yet, continue for now
+        config = {}
+    return config.get("fingerprint", "") if isinstance(config, dict) else ""
+
+
+def resolve_users(module: AnsibleModule, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Look up the account and STEPPATH of each user and determine whether it needs to be bootstrapped"""
+    params = cast(Dict, module.params)
+    resolved = []
+    for item in users:
+        try:
+            account = pwd.getpwnam(item["user"])
+        except KeyError:
+            module.fail_json(f"User {item['user']} does not exist")
+        steppath = Path(item.get("steppath") or Path(account.pw_dir) / ".step")
+        current = read_fingerprint(steppath / "config" / "defaults.json")
+        if current and not params["force"] and \
+                normalize_fingerprint(current) != normalize_fingerprint(params["fingerprint"]):
+            module.fail_json(f"User {item['user']} is already bootstrapped to a different CA, and force not set.")
+        resolved.append(dict(
+            user=item["user"], steppath=steppath.as_posix(), uid=account.pw_uid, gid=account.pw_gid,
+            changed=params["force"] or not current,
+        ))
+    return resolved
+
+
+def download_root(module: AnsibleModule) -> bytes:
+    """Download and verify the root certificate, using step-cli if the CA can't be reached directly"""
+    params = cast(Dict, module.params)
+    try:
+        if params["root_pem"]:
+            return verify_root(params["root_pem"].encode("utf-8"), params["fingerprint"])
+        return fetch_root(params["ca_url"], params["fingerprint"])
+    except UnsupportedError:
+        pass
+    except CaApiError as e:
+        module.fail_json(f"Error retrieving root certificate: {e}")
+
+    root_file = Path(module.tmpdir) / "root_ca.crt"
+    cli_exec = StepCliExecutable(module, params["step_cli_executable"])
+    root_args = CliCommandArgs(["ca", "root", root_file.as_posix()], {
+        "ca_url": "--ca-url",
+        "fingerprint": "--fingerprint",
+    })
+    CliCommand(cli_exec, root_args).run(module)
+    return root_file.read_bytes()
+
+
+def write_private(path: Path, data: bytes) -> None:
+    """Atomically write a file that only the owner can read, creating its directory if needed"""
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def run_as_user(uid: int, gid: int, func: Callable[..., None], *args: Any) -> None:
+    """Run func(*args) with the privileges of the given user
+
+    The STEPPATH of a user is controlled by that user, who could otherwise redirect the writes of a privileged
+    module to any file with symlinks. If the module runs as a different user (usually root),
+    func is therefore run in a forked child process that switches to the user first.
+
+    Raises:
+        OSError: If func or switching the user failed
+    """
+    if os.geteuid() == uid:
+        func(*args)
+        return
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        code = 0
+        try:
+            os.setgroups([gid])
+            os.setgid(gid)
+            os.setuid(uid)
+            func(*args)
+        except BaseException as e:  # pylint: disable=broad-except
+            os.write(write_fd, str(e).encode("utf-8"))
+            code = 1
+        finally:
+            os._exit(code)  # pylint: disable=protected-access
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        error = f.read().decode("utf-8", errors="replace")
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        raise OSError(error or f"process exited with status {status}")
+
+
+def write_config(steppath: Path, root: bytes, defaults: bytes) -> None:
+    write_private(steppath / "certs" / "root_ca.crt", root)
+    write_private(steppath / "config" / "defaults.json", defaults)
+
+
+def bootstrap_users(module: AnsibleModule, result: Dict[str, Any]) -> None:
+    params = cast(Dict, module.params)
+    users = resolve_users(module, params["users"] or [
+        dict(user=pwd.getpwuid(os.getuid()).pw_name, steppath=os.environ.get("STEPPATH"))])
+    pending = [u for u in users if u["changed"]]
+    result["users"] = [dict(user=u["user"], steppath=u["steppath"], changed=u["changed"]) for u in users]
+    result["changed"] = bool(pending)
+    if not pending or module.check_mode:
+        add_timings(module, result)
+        module.exit_json(**result)
+
+    root = download_root(module)
+    for u in pending:
+        steppath = Path(u["steppath"])
+        root_file = steppath / "certs" / "root_ca.crt"
+        defaults = {
+            "ca-url": params["ca_url"],
+            "fingerprint": normalize_fingerprint(params["fingerprint"]),
+            "root": root_file.as_posix(),
+        }
+        if params["redirect_url"]:
+            defaults["redirect-url"] = params["redirect_url"]
+        try:
+            run_as_user(u["uid"], u["gid"], write_config, steppath, root,
+                        json.dumps(defaults, indent=4).encode("utf-8") + b"\n")
+        except OSError as e:
+            module.fail_json(f"Could not bootstrap user {u['user']}: {e}", **result)
+
+    if params["install"]:
+        # The trust store is system-wide, so the root only needs to be installed once.
+        # Install it from a private copy, as the users could replace the files in their STEPPATH at any time
+        root_file = Path(module.tmpdir) / "root_ca.crt"
+        root_file.write_bytes(root)
+        cli_exec = StepCliExecutable(module, params["step_cli_executable"])
+        install_args = CliCommandArgs(["certificate", "install", root_file.as_posix(), "--all"], {})
+        CliCommand(cli_exec, install_args).run(module)
+    add_timings(module, result)
+    module.exit_json(**result)
+
+
 def run_module():
     argument_spec = dict(
         ca_url=dict(required=True),
@@ -68,28 +303,30 @@ def run_module():
         force=dict(type="bool", default=False),
         install=dict(type="bool", default=False),
         redirect_url=dict(),
+        controller_fetch=dict(type="bool", default=False),
+        root_pem=dict(),
+        users=dict(type="list", elements="dict", options=dict(
+            user=dict(required=True),
+            steppath=dict(type="path"),
+        )),
         step_cli_executable=dict(type="path", default="step-cli")
     )
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec, supports_check_mode=True)
     module_params = cast(Dict, module.params)
 
-    cli_exec = StepCliExecutable(module, module_params["step_cli_executable"])
+    if module_params["users"] or module_params["root_pem"]:
+        bootstrap_users(module, result)
 
     if not module_params["force"]:  # type: ignore
-        try:
-            with open(DEFAULTS_FILE, "rb") as f:
-                config = json.load(f)
-        except OSError:
-            # The file probably doesn't exist yet, continue for now
-            config = {}
-        current_fingerprint = config.get("fingerprint", "")
+        current_fingerprint = read_fingerprint(Path(DEFAULTS_FILE))
         if current_fingerprint != "":
             if current_fingerprint == module_params["fingerprint"]:
                 result["msg"] = "Already bootstrapped and force not set."
             else:
                 result["msg"] = "Already bootstrapped to a different CA, and force not set."
                 result["failed"] = True
+            add_timings(module, result)
             module.exit_json(**result)
 
     bootstrap_args = CliCommandArgs(["ca", "bootstrap"], {
@@ -99,9 +336,11 @@ def run_module():
         "install": "--install",
         "redirect_url": "--redirect-url",
     })
+    cli_exec = StepCliExecutable(module, module_params["step_cli_executable"])
     bootstrap_cmd = CliCommand(cli_exec, bootstrap_args)
     bootstrap_cmd.run(module)
     result["changed"] = True
+    add_timings(module, result)
     module.exit_json(**result)
 
 
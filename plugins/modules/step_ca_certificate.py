@@ -22,6 +22,15 @@ notes:
       This module attempts to detect when a certificates parameters have changed, but may not detect all changes.
       Currently, the following parameters are checked for changes: I(san, kty, curve, size).
       Note that the key parameters are only checked if I(kty) is set
+  - >
+      If the python C(cryptography) library is installed on the target host, existing certificates are inspected
+      and verified in-process instead of calling C(step certificate inspect/verify), which speeds up
+      idempotency checks considerably. C(step-cli) is used as a fallback if the library is missing.
+  - >
+      After a certificate has been issued or checked, a small stamp file (C(.<crt_file name>.stamp)) is written next to
+      it, recording the certificate digest and a hash of I(name, san, kty, curve, size, provisioner, verify_roots).
+      As long as neither has changed and less than two thirds of the certificates lifetime have passed,
+      later runs skip inspecting and verifying the certificate entirely.
 options:
   acme:
     description: >
@@ -82,6 +91,23 @@ options:
     description: File to write the private key (PEM format).
     type: path
     required: yes
+  keypool:
+    description: >
+      Take the private key from a key pool managed by M(maxhoesel.smallstep.step_crypto_keypool) instead of
+      letting step-cli generate it while issuing the certificate. The certificate is then requested with a CSR
+      through C(step ca sign), and a replacement key is generated in the background for the next run.
+      If generating the replacement fails, a warning is shown the next time the pool is used.
+      If the pool has no key of the requested I(kty, curve, size), or if I(kms), I(attestation_uri),
+      I(attestation_ca_url), I(attestation_ca_root) or I(tpm_storage_directory) are set,
+      the certificate is issued as usual.
+      Requires the python C(cryptography) library on the target host.
+    type: bool
+    default: false
+    version_added: '0.25.0'
+  keypool_dir:
+    description: The key pool directory. Defaults to C($STEPPATH/keypool)
+    type: path
+    version_added: '0.25.0'
   kms:
     description: The uri to configure a Cloud KMS or an HSM.
     type: str
@@ -93,6 +119,17 @@ options:
       - EC
       - OKP
       - RSA
+  local_key:
+    description: >
+      Generate the private key on the host with the python C(cryptography) library and request the certificate
+      with a CSR through C(step ca sign), instead of having step-cli generate the key.
+      The key and certificate files are only replaced once the CA has signed the certificate.
+      If I(kms), I(attestation_uri), I(attestation_ca_url), I(attestation_ca_root) or I(tpm_storage_directory)
+      are set, or if C(cryptography) is not installed, the certificate is issued as usual.
+      If I(keypool) is also set, a key from the pool is preferred and a key is only generated if the pool is empty.
+    type: bool
+    default: false
+    version_added: '0.25.0'
   name:
     aliases:
       - subject
@@ -268,172 +305,21 @@ EXAMPLES = r"""
     state: absent
     revoke_on_delete: true
 """
-from pathlib import Path
 from typing import cast, Dict, Any
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.common.validation import check_required_if, check_mutually_exclusive
 
 from ..module_utils.params.ca_connection import CaConnectionParams
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
-from ..module_utils import helpers
+from ..module_utils.cli_wrapper import StepCliExecutable
+from ..module_utils.certificate import (
+    CERTIFICATE_ARGUMENT_SPEC, check_certificate_params, manage_certificate, refill_keypools)
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
-
-# maps the kty cli parameter to inspect outputs subject_key_info.key_algorithm.name
-CERTINFO_KEY_TYPES = {
-    "RSA": "RSA",
-    "EC": "ECDSA",
-    "OKP": "Ed25519"
-}
-CERTINFO_KEYINFO_KEY = {
-    "RSA": "rsa_public_key",
-    "ECDSA": "ecdsa_public_key"
-}
-
-
-def create_certificate(executable: StepCliExecutable, module: AnsibleModule, force: bool = False) -> Dict[str, Any]:
-    module_params = cast(Dict, module.params)
-    # step ca certificate arguments
-    cert_cliargs = ["acme", "attestation_ca_url", "attestation_ca_root", "console", "contact", "curve",
-                    "http_listen", "k8ssa_token_path", "kms", "kty", "nebula_cert", "nebula_key", "not_after",
-                    "not_before", "provisioner", "provisioner_password_file", "san", "set", "set_file", "size",
-                    "standalone", "token", "tpm_storage_directory", "webroot", "x5c_cert", "x5c_key"]
-    # All parameters can be converted to a mapping by just appending -- and replacing the underscores
-    cert_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in cert_cliargs}
-
-    args = ["ca", "certificate", module_params["name"], module_params["crt_file"], module_params["key_file"]]
-    if force:
-        args.append("--force")
-
-    create_args = CaConnectionParams.cli_args().join(CliCommandArgs(
-        args, cert_cliarg_map, {"provisioner_password": "--provisioner-password-file"}))
-    create_cmd = CliCommand(executable, create_args)
-    create_cmd.run(module)
-    return {"changed": True}
-
-
-def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule) -> str:
-    """Check whether a certificate needs to be recreated based on its validity and module parameters
-
-    Returns:
-        str: Reason for certificate recreation, or empty string if no recreation is needed
-    """
-    module_params = cast(Dict, module.params)
-
-    cert_info = helpers.get_certificate_info(
-        executable, module, module_params["crt_file"], roots=module_params["verify_roots"])
-
-    # certificate is invalid
-    if not cert_info.valid:
-        return cert_info.invalid_reason
-
-    key_info = cert_info.data["subject_key_info"]
-    current_kty = key_info["key_algorithm"]["name"]
-
-    # ensure SANs match
-    if module_params["san"]:
-        desired_sans = sorted(list(set([module_params["name"]] + module_params["san"])))
-        current_sans = sorted(cert_info.data["names"])
-        if current_sans != desired_sans:
-            return f"Certificate names have changed from {cert_info.data['names']} to {desired_sans}"
-
-    # Ensure key type matches
-    if module_params["kty"]:
-        if current_kty != CERTINFO_KEY_TYPES[module_params["kty"]]:
-            return f"Key type has changed from {current_kty} to {CERTINFO_KEY_TYPES[module_params['kty']]}"
-        if module_params["curve"] and current_kty == "ECDSA":
-            current_curve = key_info["ecdsa_public_key"]["curve"]
-            if current_curve != module_params["curve"]:
-                return f"ECDSA key curve has changed from {current_curve} to {module_params['curve']}"
-
-    # key type matches or is not specified, we can assume the current type is correct
-    if module_params["size"] and current_kty in ["RSA", "ECDSA"]:
-        current_length = key_info[CERTINFO_KEYINFO_KEY[current_kty]]["length"]
-        if current_length != module_params["size"]:
-            return f"Key size has changed from {current_length} to {module_params['size']}"
-    return ""
-
-
-def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule) -> Dict[str, Any]:  # pylint: disable=unused-argument
-    revoke_cliarg_map = {
-        "crt_file": "--cert",
-        "key_file": "--key",
-        "revoke_reason": "--reason",
-        "revoke_reason_code": "--reasonCode",
-        "token": "--token"
-    }
-    revoke_args = CaConnectionParams.cli_args().join(CliCommandArgs(["ca", "revoke"], revoke_cliarg_map))
-    revoke_cmd = CliCommand(executable, revoke_args, fail_on_error=False)
-    res = revoke_cmd.run(module)
-
-    if res.rc != 0 and "is already revoked" in res.stderr:
-        return {}
-    elif res.rc != 0:
-        module.fail_json(f"Error revoking certificate: {res.stderr}")
-        return {"changed": True}  # only here to satisfy the type checker, fail_json never returns
-    else:
-        # ran successfully => revoked
-        return {"changed": True}
-
-
-def delete_certificate(executable: StepCliExecutable, module: AnsibleModule, revoke: bool) -> Dict[str, Any]:
-    module_params = cast(Dict, module.params)
-    result = {}
-    if revoke:
-        result = revoke_certificate(executable, module)
-
-    for file in [Path(module_params["crt_file"]), Path(module_params["key_file"])]:
-        if file.exists():
-            try:
-                file.unlink()
-            except FileNotFoundError:
-                pass
-            except OSError as e:
-                module.fail_json(f"Could not delete file: {e}")
-            result["changed"] = True
-    return result
+from ..module_utils.timings import add_timings
 
 
 def run_module():
     argument_spec = dict(
-        acme=dict(type="str"),
-        attestation_ca_url=dict(type="str"),
-        attestation_ca_root=dict(type="path"),
-        attestation_uri=dict(type="str"),
-        console=dict(type="bool"),
-        contact=dict(type="list", elements="str"),
-        crt_file=dict(type="path", required=True),
-        curve=dict(type="str", choices=[
-                   "P-256", "P-384", "P-521", "Ed25519"], aliases=["crv"]),
-        force=dict(type="bool"),
-        http_listen=dict(type="str"),
-        k8ssa_token_path=dict(type="path"),
-        key_file=dict(type="path", required=True),
-        kms=dict(type="str"),
-        kty=dict(type="str", choices=["EC", "OKP", "RSA"]),
-        name=dict(type="str", aliases=["subject"]),
-        nebula_cert=dict(type="path"),
-        nebula_key=dict(type="path"),
-        not_after=dict(type="str"),
-        not_before=dict(type="str"),
-        provisioner=dict(type="str", aliases=["issuer"]),
-        provisioner_password=dict(type="str", no_log=True),
-        provisioner_password_file=dict(type="path", no_log=False),
-        revoke_on_delete=dict(type="bool", default=True),
-        revoke_reason=dict(type="str"),
-        revoke_reason_code=dict(type="str"),
-        san=dict(type="list", elements="str"),
-        set=dict(type="list", elements="str"),
-        set_file=dict(type="path"),
-        size=dict(type="int"),
-        standalone=dict(type="bool"),
-        state=dict(type="str", choices=["present", "revoked", "absent"], default="present"),
-        token=dict(type="str", no_log=True),
-        tpm_storage_directory=dict(type="path"),
-        verify_roots=dict(type="str"),
-        webroot=dict(type="path"),
-        x5c_cert=dict(type="str"),
-        x5c_key=dict(type="path"),
+        **CERTIFICATE_ARGUMENT_SPEC,
         step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
     )
     result: Dict[str, Any] = dict(changed=False)
@@ -445,35 +331,15 @@ def run_module():
 
     try:
         CaConnectionParams(module).check()
-        check_required_if([
-            ["state", "present", ["name", "provisioner"], True],
-        ], module_params)
-        check_mutually_exclusive(["provisioner_password", "provisioner_password_file"], module_params)
+        check_certificate_params(module_params)
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
     executable = StepCliExecutable(module, module_params["step_cli_executable"])
 
-    crt_exists = Path(module_params["crt_file"]).exists()
-    if module_params["state"] == "present":
-        if not crt_exists:
-            result.update(create_certificate(executable, module))
-        else:
-            if module_params["force"]:
-                recreate_reason = "force parameter enabled"
-            else:
-                recreate_reason = cert_needs_recreation(executable, module)
-            if recreate_reason:
-                result["recreate_reason"] = recreate_reason
-                result.update(create_certificate(executable, module, force=True))
-    elif module_params["state"] == "revoked":
-        if crt_exists:
-            result.update(revoke_certificate(executable, module))
-        else:
-            module.fail_json("Cannot revoke certificate as it does not exist")
-    elif module_params["state"] == "absent" and crt_exists:
-        result.update(delete_certificate(executable, module, module_params["revoke_on_delete"]))
-
+    result.update(manage_certificate(executable, module))
+    refill_keypools([(module_params, result)])
+    add_timings(module, result)
     module.exit_json(**result)
 
 
@@ -0,0 +1,381 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+module: step_ca_certificates
+author: Max Hösel (@maxhoesel)
+short_description: Manage multiple step-ca-signed certificates on the target system
+version_added: '0.25.0'
+description: >
+    Creates, updates, revokes or deletes a list of CA-issued certificates on the target system in a single module run.
+    Each certificate accepts the same options as M(maxhoesel.smallstep.step_ca_certificate) and is handled the same way.
+    Certificates are checked and issued concurrently, which is much faster than looping over
+    M(maxhoesel.smallstep.step_ca_certificate) if a host needs many certificates.
+notes:
+  - Check mode is supported.
+  - >
+      Failures are reported per certificate in I(results). The module fails if any certificate failed,
+      after all other certificates have been processed.
+  - >
+      After a certificate has been issued or checked, a small stamp file (C(.<crt_file name>.stamp)) is written next to
+      it, recording the certificate digest and a hash of I(name, san, kty, curve, size, provisioner, verify_roots).
+      As long as neither has changed and less than two thirds of the certificates lifetime have passed,
+      later runs skip inspecting and verifying the certificate entirely.
+  - >
+      Keys of certificates with I(local_key=true) that need to be issued are generated in parallel
+      on a pool of worker processes, one per CPU core. Requires the python C(cryptography) library on the target host.
+options:
+  certificates:
+    description: >
+      List of certificates to manage. Each entry accepts the same options as M(maxhoesel.smallstep.step_ca_certificate).
+      The connection options (I(ca_url), I(root), I(ca_config), I(offline)) are shared by all certificates.
+    type: list
+    elements: dict
+    required: yes
+    suboptions:
+        acme:
+          description: >
+            ACME directory url to be used for requesting certificates via the ACME protocol.
+            Use this parameter to define an ACME server other than the Step CA.
+            If this flag is absent and an ACME provisioner has been selected then the I(ca_url) parameter must be defined.
+          type: str
+        attestation_ca_root:
+          description: The path to the PEM file with trusted roots when connecting to the Attestation CA.
+          type: path
+        attestation_ca_url:
+          description: The base url of the Attestation CA to use.
+          type: str
+        attestation_uri:
+          description: The KMS uri used for attestation.
+          type: str
+        console:
+          description: Complete the flow while remaining inside the terminal
+          type: bool
+        contact:
+          description: >
+            The email-address used for contact as part of the ACME protocol.
+            These contacts may be used to warn of certificate expiration or other certificate lifetime events.
+            Must be a list
+          type: list
+          elements: str
+        crt_file:
+          description: File to write the certificate (PEM format).
+          type: path
+          required: yes
+        curve:
+          aliases:
+            - crv
+          description: >
+            The elliptic curve to use for EC and OKP key types. Corresponds to the "crv" JWK parameter.
+            Valid curves are defined in JWA RFC7518. If unset, default is P-256 for EC keys and Ed25519 for OKP keys.
+          type: str
+          choices:
+            - P-256
+            - P-384
+            - P-521
+            - Ed25519
+        force:
+          description: >
+              If I(true) and I(state=present), a new certificate will be generated each time this module is executed,
+              regardless of existing certificates.
+          type: bool
+        http_listen:
+          description: >
+            Use a non-standard http address, behind a reverse proxy or load balancer, for serving ACME challenges.
+            The default address is :80, which requires super user (sudo) privileges.
+            This flag must be used in conjunction with the I(standalone) param.
+          type: str
+        k8ssa_token_path:
+          description: Configure the file from which to read the kubernetes service account token.
+          type: path
+        key_file:
+          description: File to write the private key (PEM format).
+          type: path
+          required: yes
+        keypool:
+          description: >
+            Take the private key from a key pool managed by M(maxhoesel.smallstep.step_crypto_keypool) instead of
+            generating it while issuing the certificate. See M(maxhoesel.smallstep.step_ca_certificate) for details.
+          type: bool
+          default: false
+          version_added: '0.25.0'
+        keypool_dir:
+          description: The key pool directory. Defaults to C($STEPPATH/keypool)
+          type: path
+          version_added: '0.25.0'
+        kms:
+          description: The uri to configure a Cloud KMS or an HSM.
+          type: str
+        kty:
+          description: >
+            The kty to build the certificate upon. If unset, default is EC. I(kty) is a case-sensitive string.
+          type: str
+          choices:
+            - EC
+            - OKP
+            - RSA
+        local_key:
+          description: >
+            Generate the private key on the host and request the certificate with a CSR through C(step ca sign),
+            instead of having step-cli generate the key. See M(maxhoesel.smallstep.step_ca_certificate) for details.
+          type: bool
+          default: false
+          version_added: '0.25.0'
+        name:
+          aliases:
+            - subject
+          description: >
+            The Common Name, DNS Name, or IP address that will be set as the Subject Common Name for the certificate.
+            If no Subject Alternative Names (SANs) are configured (via the san parameter) then the subject will be set as the only SAN.
+            Required if I(state=present).
+          type: str
+        nebula_cert:
+          description: Certificate file in PEM format to store in the 'nebula' header of a JWT.
+          type: path
+        nebula_key:
+          description: >
+            Private key file, used to sign a JWT,
+            corresponding to the certificate that will be stored in the 'nebula' header.
+          type: path
+        not_after:
+          description: >
+            The time/duration when the certificate validity period ends. If a time is used it is expected to be in RFC 3339 format.
+            If a duration is used, it is a sequence of decimal numbers, each with optional fraction and a unit suffix,
+            such as "300ms", "-1.5h" or "2h45m". Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+          type: str
+        not_before:
+          description: >
+            The time/duration when the certificate validity period starts. If a time is used it is expected to be in RFC 3339 format.
+            If a duration is used, it is a sequence of decimal numbers, each with optional fraction and a unit suffix,
+            such as "300ms", "-1.5h" or "2h45m". Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+          type: str
+        provisioner:
+          aliases:
+            - issuer
+          description: The provisioner name to use. Required if I(state=present).
+          type: str
+        provisioner_password:
+          description: >
+            The password to decrypt the one-time token generating key.
+            Will be passed to step-cli through a temporary file.
+            Mutually exclusive with I(provisioner_password_file)
+          type: str
+        provisioner_password_file:
+          description: >
+              The path to the file containing the password to decrypt the one-time token generating key.
+              Mutually exclusive with I(provisioner_password)
+          type: path
+        revoke_on_delete:
+          description: If I(state=absent), attempt to revoke the certificate before deleting it
+          type: bool
+          default: true
+        revoke_reason:
+          description: >
+              The string representing the reason for which the cert is being revoked.
+              Only has an effect if I(state=revoked) or I(state=absent) and I(revoke_on_delete=True)
+          type: str
+        revoke_reason_code:
+          description: >
+              The reasonCode specifies the reason for revocation - chose from a list of common revocation reasons.
+              If unset, the default is Unspecified.
+              See U(https://smallstep.com/docs/step-cli/reference/ca/revoke) for a list of codes
+          type: str
+        san:
+          description: >
+            Add dns/ip/email/uri Subject Alternative Name(s) (SANs) that should be authorized.
+            The I(san) parameter and the I(token) parameter are mutually exclusive. Must be a list.
+          type: list
+          elements: str
+        set:
+          description: The key=value pair with template data variables to send to the CA. Must be a list.
+          type: list
+          elements: str
+        set_file:
+          description: The path of a JSON file with the template data to send to the CA.
+          type: path
+        size:
+          description: >
+            The size (in bits) of the key for RSA and oct key types. RSA keys require a minimum key size of 2048 bits.
+            If unset, default is 2048 bits for RSA keys and 128 bits for oct keys.
+          type: int
+        standalone:
+          description: >
+            Get a certificate using the ACME protocol and standalone mode for validation.
+            Standalone is a mode in which the step process will run a server that will will respond to ACME challenge validation requests.
+            Standalone is the default mode for serving challenge validation requests.
+          type: bool
+        state:
+          description: >
+              State that the certificate should be in.
+              If I(state=present), the certificate will be (re-)issued if it doesn't exist, is invalid/expired or if its SAN/private key parameters change.
+              If I(state=revoked), the certificate will be revoked with the CA
+              If I(state=absent), the certificate will be removed from the host (and optionally revoked with the CA beforehand, see I(revoke_on_delete).
+          type: str
+          choices:
+            - present
+            - revoked
+            - absent
+          default: present
+        token:
+          description: The one-time token used to authenticate with the CA in order to create the certificate.
+          type: str
+        tpm_storage_directory:
+          description: The directory where TPM keys and certificates will be stored
+          type: path
+        verify_roots:
+          description: >
+              Root certificates to use when checking an existing certificates validity.
+              Only required if your CA root is not in the system truststore.
+              Case-sensitive string, may be one of:
+              Relative or full path to a file - All certificates in the file will be used for path validation.
+              Comma-separated list of relative or full file paths - Every PEM encoded certificate from each file will be used for path validation.
+              Relative or full path to a directory - Every PEM encoded certificate from each file in the directory will be used for path validation.
+          type: str
+        webroot:
+          description: >
+            Specify a path to use as a 'web root' for validation in the ACME protocol.
+            Webroot is a mode in which the step process will write a challenge file to a location being
+            served by an existing fileserver in order to respond to ACME challenge validation requests.
+          type: path
+        x5c_cert:
+          description: Certificate (chain) in PEM format to store in the 'x5c' header of a JWT.
+          type: str
+        x5c_key:
+          description: Private key path, used to sign a JWT, corresponding to the certificate that will be stored in the 'x5c' header.
+          type: path
+  workers:
+    description: Maximum number of certificates to check or issue concurrently.
+    type: int
+    default: 4
+
+extends_documentation_fragment:
+  - maxhoesel.smallstep.cli_executable
+  - maxhoesel.smallstep.ca_connection
+"""
+
+EXAMPLES = r"""
+- name: Ensure that all service certificates are valid
+  maxhoesel.smallstep.step_ca_certificates:
+    certificates:
+      - name: "web.{{ ansible_fqdn }}"
+        crt_file: /etc/ssl/web.crt
+        key_file: /etc/ssl/web.key
+        provisioner: jwk
+        provisioner_password_file: /path/to/password_file
+      - name: "db.{{ ansible_fqdn }}"
+        crt_file: /etc/ssl/db.crt
+        key_file: /etc/ssl/db.key
+        provisioner: jwk
+        provisioner_password_file: /path/to/password_file
+        kty: RSA
+        size: 4096
+      - crt_file: /etc/ssl/old.crt
+        key_file: /etc/ssl/old.key
+        state: absent
+    workers: 8
+"""
+
+RETURN = r"""
+results:
+  description: The result for each certificate, in the same order as I(certificates)
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    crt_file:
+      description: The certificate file
+      type: str
+    changed:
+      description: Whether the certificate was changed
+      type: bool
+    recreate_reason:
+      description: Why an existing certificate was reissued
+      type: str
+      returned: When an existing certificate was reissued
+    key_source:
+      description: Where the private key of the issued certificate came from, either C(keypool) or C(local)
+      type: str
+      returned: When a certificate was issued for a key from the pool (I(keypool)) or a local key (I(local_key))
+      version_added: '0.25.0'
+    failed:
+      description: Whether this certificate could not be processed
+      type: bool
+      returned: On failure
+    msg:
+      description: Error message
+      type: str
+      returned: On failure
+"""
+import os
+from typing import cast, Dict, Any
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.params.ca_connection import CaConnectionParams
+from ..module_utils.cli_wrapper import StepCliExecutable
+from ..module_utils.certificate import (
+    CERTIFICATE_ARGUMENT_SPEC, check_certificate_params, manage_certificate, needs_local_key, refill_keypools)
+from ..module_utils.bulk import ItemModule, run_items
+from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.keypool import KeyGenerator
+from ..module_utils.timings import add_timings
+
+
+def run_module():
+    argument_spec = dict(
+        certificates=dict(type="list", elements="dict", required=True, options=CERTIFICATE_ARGUMENT_SPEC),
+        workers=dict(type="int", default=4),
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+    )
+    result: Dict[str, Any] = dict(changed=False)
+    module = AnsibleModule(argument_spec={
+        **CaConnectionParams.argument_spec,
+        **argument_spec,
+    }, supports_check_mode=True)
+    module_params = cast(Dict, module.params)
+
+    try:
+        CaConnectionParams(module).check()
+        for cert in module_params["certificates"]:
+            check_certificate_params(cert)
+    except TypeError as e:
+        module.fail_json(f"Parameter validation failed: {e}")
+
+    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+
+    # Key generation is CPU-bound, so spread it across processes instead of the threads that handle the certificates.
+    # The generator has to be started before run_items() starts any threads.
+    key_generator = None
+    local_keys = 0 if module.check_mode else sum(needs_local_key(cert) for cert in module_params["certificates"])
+    key_workers = min(local_keys, os.cpu_count() or 1)
+    if key_workers > 1:
+        key_generator = KeyGenerator(key_workers)
+
+    def process(item: ItemModule) -> Dict[str, Any]:
+        return manage_certificate(executable, item, key_generator=key_generator)  # type: ignore
+
+    try:
+        result["results"] = run_items(module, module_params["certificates"], CERTIFICATE_ARGUMENT_SPEC, process,
+                                      module_params["workers"], result_keys=["crt_file"])
+    finally:
+        if key_generator:
+            key_generator.shutdown()
+    # Forks as well, so only once all threads have finished
+    refill_keypools(list(zip(module_params["certificates"], result["results"])))
+    result["changed"] = any(r["changed"] for r in result["results"])
+    failed = [r["crt_file"] for r in result["results"] if r.get("failed")]
+    if failed:
+        module.fail_json(f"Failed to manage certificates: {', '.join(failed)}", **result)
+    add_timings(module, result)
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,12 @@ notes:
     See the L(documentation,https://smallstep.com/docs/step-cli/reference/ca/provisioner) for more information.
   - Any files used to create the provisioner (e.g. root certificate chains) must already be present on the remote host.
   - Check mode is supported.
+  - Diff mode is supported.
+  - >
+      With I(admin_cert) and I(admin_key), provisioners are managed through the step-ca admin API directly,
+      using a single connection for the whole module run.
+      This requires the python cryptography library on the remote host. step-cli is used instead if the library
+      is missing, if the CA rejects the admin token or for options that require step-cli (e.g. I(jwk_create)).
 options:
   allow_renewal_after_expiry:
     description: Allow renewals for expired certificates generated by this provisioner.
@@ -292,8 +298,9 @@ options:
     description: >
         Whether the provisioner should be present or absent.
         Note that C(present) does not update existing provisioners.
-        C(updated) will attempt to update the provisioner regardless of whether it has changed or not.
-        Note that this will always report the task as changed.
+        C(updated) compares the existing provisioner with the given options and only updates it if they differ.
+        Options that can't be compared (I(password), I(password_file), I(jwk_create) and I(jwk_private_key))
+        always cause an update.
     choices:
       - 'present'
       - 'updated'
@@ -443,7 +450,7 @@ EXAMPLES = r"""
       - f50926c7-abbf-4c28-87dc-9adc7eaf3ba7
 """
 
-import json
+import contextlib
 import os
 from typing import cast, Dict, Any
 
@@ -451,166 +458,28 @@ from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.validation import check_mutually_exclusive
 
 from ..module_utils.params.ca_admin import AdminParams
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from ..module_utils.ca_config import CaConfigError
+from ..module_utils.cli_wrapper import StepCliExecutable
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
-
-# We cannot use the default connection module util, as that one includes the --offline flag,
-# which is not valid for the provisioner API call
-CONNECTION_CLIARG_MAP = {
-    "ca_config": "--ca-config",
-    "ca_url": "--ca-url",
-    "root": "--root"
-}
-
-CREATE_UPDATE_CLIARGS = {
-    "allow_renewal_after_expiry": "--allow-renewal-after-expiry",
-    "aws_accounts": "--aws-account",
-    "azure_audience": "--azure-audience",
-    "azure_object_ids": "--azure-object-id",
-    "azure_resource_groups": "--azure-resource-group",
-    "azure_subscription_ids": "--azure-subscription-id",
-    "azure_tenant": "--azure-tenant",
-    "disable_custom_sans": "--disable-custom-sans",
-    "disable_renewal": "--disable-renewal",
-    "disable_trust_on_first_use": "--disable-trust-on-first-use",
-    "force_cn": "--force-cn",
-    "gcp_projects": "--gcp-project",
-    "gcp_service_accounts": "--gcp-service-account",
-    "instance_age": "--instance-age",
-    "jwk_create": "--create",
-    "jwk_private_key": "--private-key",
-    "nebula_root": "--nebula-root",
-    "oidc_admins": "--admin",
-    "oidc_client_id": "--client-id",
-    "oidc_client_secret": "--client-secret",
-    "oidc_configuration_endpoint": "--configuration-endpoint",
-    "oidc_groups": "--group",
-    "oidc_listen_address": "--listen-address",
-    "oidc_tenant_id": "--tenant-id",
-    "password_file": "--password-file",
-    "public_key": "--public-key",
-    "require_eab": "--require-eab",
-    "scep_capabilities": "--capabilities",
-    "scep_challenge": "--challenge",
-    "scep_encryption_algorithm_identifier": "--encryption-algorithm-identifier",
-    "scep_include_root": "--include-root",
-    "scep_min_public_key_length": "--min-public-key-length",
-    "ssh": "--ssh",
-    "ssh_host_min_dur": "--ssh-host-min-dur",
-    "ssh_host_max_dur": "--ssh-host-max-dur",
-    "ssh_host_default_dur": "--ssh-host-default-dur",
-    "ssh_user_min_dur": "--ssh-user-min-dur",
-    "ssh_user_max_dur": "--ssh-user-max-dur",
-    "ssh_user_default_dur": "--ssh-user-default-dur",
-    "ssh_template": "--ssh-template",
-    "ssh_template_data": "--ssh-template-data",
-    "x509_template": "--x509-template",
-    "x509_template_data": "--x509-template-data",
-    "x509_min_dur": "--x509-min-dur",
-    "x509_max_dur": "--x509-max-dur",
-    "x509_default_dur": "--x509-default-dur",
-    "x5c_root": "--x5c-root",
-}
-CREATE_UPDATE_TMPFILE_ARGS = {
-    "password": "--password-file"
-}
-
-
-def add_provisioner(name: str, provisioner_type: str, executable: StepCliExecutable, module: AnsibleModule):
-    args = AdminParams.cli_args().join(CliCommandArgs(
-        ["ca", "provisioner", "add", name, "--type", provisioner_type],
-        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
-        CREATE_UPDATE_TMPFILE_ARGS
-    ))
-    cmd = CliCommand(executable, args)
-    cmd.run(module)
-    return
-
-
-def update_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule):
-    args = AdminParams.cli_args().join(CliCommandArgs(
-        ["ca", "provisioner", "update", name],
-        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
-        CREATE_UPDATE_TMPFILE_ARGS
-    ))
-    cmd = CliCommand(executable, args)
-    cmd.run(module)
-    return
-
-
-def remove_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule):
-    args = AdminParams.cli_args().join(CliCommandArgs(
-        ["ca", "provisioner", "remove", name],
-        CONNECTION_CLIARG_MAP
-    ))
-    cmd = CliCommand(executable, args)
-    cmd.run(module)
-    return
+from ..module_utils.provisioner import (
+    PROVISIONER_ARGUMENT_SPEC, admin_client, apply_admin_action, apply_provisioner_action, fetch_provisioners,
+    load_local_config, plan_provisioner, provisioner_diff
+)
+from ..module_utils.timings import add_timings
 
 
 def run_module():
     argument_spec = dict(
-        allow_renewal_after_expiry=dict(type="bool"),
-        aws_accounts=dict(type="list", elements="str", aliases=["aws_account"]),
-        azure_audience=dict(type="str"),
-        azure_object_ids=dict(type="list", elements="str", aliases=["azure_object_id"]),
-        azure_resource_groups=dict(type="list", elements="str", aliases=["azure_resource_group"]),
-        azure_subscription_ids=dict(type="list", elements="str", aliases=["azure_subscription_id"]),
-        azure_tenant=dict(type="str"),
         ca_config=dict(
             type="path", default=f"{os.environ.get('STEPPATH', os.environ['HOME'] + '/.step')}/config/ca.json"),
         ca_url=dict(type="str"),
-        disable_custom_sans=dict(type="bool"),
-        disable_renewal=dict(type="bool"),
-        disable_trust_on_first_use=dict(type="bool"),
-        force_cn=dict(type="bool"),
-        gcp_projects=dict(type="list", elements="str", aliases=["gcp_project"]),
-        gcp_service_accounts=dict(type="list", elements="str", aliases=["gcp_service_account"]),
-        instance_age=dict(type="str"),
-        jwk_create=dict(type="bool", aliases=["create"]),
-        jwk_private_key=dict(type="path", aliases=["private_key"]),
-        name=dict(type="str", required=True),
-        nebula_root=dict(type="path"),
-        oidc_admins=dict(type="list", elements="str", aliases=["oidc_admin", "admin", "oidc_admin_email"]),
-        oidc_client_id=dict(type="str", aliases=["client_id"]),
-        oidc_client_secret=dict(type="str", no_log=True, aliases=["client_secret"]),
-        oidc_configuration_endpoint=dict(type="str", aliases=["configuration_endpoint"]),
-        oidc_groups=dict(type="list", elements="str", aliases=["group", "oidc_group"]),
-        oidc_listen_address=dict(type="str", aliases=["listen_address", "oidc_client_address"]),
-        oidc_tenant_id=dict(type="str", aliases=["tenant_id"]),
-        password=dict(type="str", no_log=True),
-        password_file=dict(type="path", no_log=False),
-        public_key=dict(type="path", aliases=["jwk_public_key", "k8ssa_public_key", "k8s_pem_keys_file"]),
-        require_eab=dict(type="bool"),
         root=dict(type="path"),
-        scep_capabilities=dict(type="str", aliases=["capabilities"]),
-        scep_challenge=dict(type="str", no_log=True, aliases=["challenge"]),
-        scep_encryption_algorithm_identifier=dict(type="int", aliases=["encryption_algorithm_identifier"]),
-        scep_include_root=dict(type="bool", aliases=["include_root"]),
-        scep_min_public_key_length=dict(type="str", aliases=["min_public_key_length"]),
-        ssh=dict(type="bool", default=True),
-        ssh_host_min_dur=dict(type="str"),
-        ssh_host_max_dur=dict(type="str"),
-        ssh_host_default_dur=dict(type="str"),
-        ssh_user_min_dur=dict(type="str"),
-        ssh_user_max_dur=dict(type="str"),
-        ssh_user_default_dur=dict(type="str"),
-        ssh_template=dict(type="path"),
-        ssh_template_data=dict(type="path"),
-        state=dict(type="str", default="present", choices=["present", "updated", "absent"]),
-        type=dict(type="str", choices=[
-            "JWK", "OIDC", "AWS", "GCP", "Azure", "ACME", "X5C", "K8SSA", "SSHPOP", "SCEP", "Nebula"]),
-        x509_template=dict(type="path"),
-        x509_template_data=dict(type="path"),
-        x509_min_dur=dict(type="str"),
-        x509_max_dur=dict(type="str"),
-        x509_default_dur=dict(type="str"),
-        x5c_root=dict(type="path", aliases=["x5c_root_file"]),
         step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
     )
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **AdminParams.argument_spec,
+        **PROVISIONER_ARGUMENT_SPEC,
         **argument_spec
     }, supports_check_mode=True)
     module_params = cast(Dict, module.params)
@@ -622,60 +491,44 @@ def run_module():
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
-
     state = cast(str, module_params["state"])
     p_type = cast(str, module_params["type"])
 
     if state == "present" and not p_type:
         module.fail_json("Provisioner type is required when state == present")
 
-    ca_online_check_args = CliCommandArgs(["ca", "provisioner", "list"], CONNECTION_CLIARG_MAP)
-    ca_online_check = CliCommand(executable, ca_online_check_args, run_in_check_mode=True, fail_on_error=False)
-    ca_online_res = ca_online_check.run(module)
-    # Offline provisioner management is possible even if the CA is down.
-    # ca provisioner list does depend on the CA being available however, so we need some backup strategies.
-    if ca_online_res.rc == 0:
+    # Without remote administration, we can edit ca.json directly instead of calling step-cli.
+    # With it, we use the admin API if possible.
+    # ca.json stays locked until the change was applied, so that concurrent runs don't overwrite each other's changes
+    config = load_local_config(module)
+    with config or contextlib.nullcontext():
+        client = admin_client(module) if config is None else None
+        provisioners, executable = fetch_provisioners(module, config, client, [module_params["name"]])
+        current = provisioners.get(module_params["name"])
         try:
-            provisioners = json.loads(ca_online_res.stdout)
-        except (json.JSONDecodeError, OSError) as e:
-            module.fail_json(f"Error reading provisioner config: {e}")
-            return  # makes pylint happy
-    elif admin_params.is_defined():
-        # Admin credentials means that the provisioners are managed remotely and are stored in the DB.
-        # Combined with a connection failure, this means that we are unable to continue
-        module.fail_json(
-            "Could not contact CA to retrieve provisioners and cannot fallback to direct manipulation "
-            "as remote admin parameters are set. Aborting"
-        )
-        return  # makes pylint happy
-    else:
-        # Without admin, provisioners are always managed locally, so we can just read them as a fallback
-        with open(module_params["ca_config"], "rb") as f:
+            action = plan_provisioner(current, module_params)
+        except ValueError as e:
+            module.fail_json(str(e))
+        if action and module._diff:  # pylint: disable=protected-access
+            result["diff"] = provisioner_diff(action, current, module_params)
+        if action and config is not None and config.supports(action, module_params):
             try:
-                provisioners = json.load(f).get("authority", {}).get("provisioners", [])
-            except (json.JSONDecodeError, OSError) as e:
-                module.fail_json(f"Error reading provisioner config: {e}")
-                return  # makes pylint and pylance happy
-
-    for p in provisioners:
-        if p["name"] == module_params["name"]:
-            if state == "present" and p["type"] == p_type:
-                result["msg"] = "Provisioner found in CA config - not modified"
-            elif state == "updated":
-                update_provisioner(module_params["name"], executable, module)
-                result["changed"] = True
-            elif state == "absent":
-                remove_provisioner(module_params["name"], executable, module)
-                result["changed"] = True
-            module.exit_json(**result)
-
-    # No matching provisioner found
-    if state == "present":
-        add_provisioner(module_params["name"], module_params["type"], executable, module)
-        result["changed"] = True
-    elif state == "updated":
-        module.fail_json(f"Provisioner {module_params['name']} not found but state is 'updated'")
+                config.apply(action, module_params)
+                if not module.check_mode:
+                    config.save()
+            except CaConfigError as e:
+                module.fail_json(str(e))
+            result["changed"] = True
+        elif action and client is not None and apply_admin_action(client, action, module):
+            result["changed"] = True
+        elif action:
+            if executable is None:
+                executable = StepCliExecutable(module, module_params["step_cli_executable"])
+            apply_provisioner_action(action, executable, module)
+            result["changed"] = True
+        elif current is not None and state == "present" and current["type"] == p_type:
+            result["msg"] = "Provisioner found in CA config - not modified"
+    add_timings(module, result)
     module.exit_json(**result)
 
 
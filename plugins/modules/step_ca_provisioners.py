@@ -0,0 +1,526 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+module: step_ca_provisioners
+author: Max Hösel (@maxhoesel)
+short_description: Manage multiple provisioners on a C(step-ca) server
+version_added: '0.25.0'
+description: >
+    Manages a set of provisioners on a Smallstep CA server in a single module run.
+    Each provisioner accepts the same options as M(maxhoesel.smallstep.step_ca_provisioner) and is handled the same way,
+    but the list of existing provisioners is only retrieved once.
+    With I(exclusive), provisioners that are not part of I(provisioners) are removed.
+notes:
+  - Most of the options correspond to the command-line parameters for the C(step ca provisioner) command.
+    See the L(documentation,https://smallstep.com/docs/step-cli/reference/ca/provisioner) for more information.
+  - Any files used to create the provisioners (e.g. root certificate chains) must already be present on the remote host.
+  - Check mode is supported.
+  - Diff mode is supported.
+  - >
+      With I(admin_cert) and I(admin_key), provisioners are managed through the step-ca admin API directly,
+      using a single connection for the whole module run.
+      This requires the python cryptography library on the remote host. step-cli is used instead if the library
+      is missing, if the CA rejects the admin token or for options that require step-cli (e.g. I(jwk_create)).
+  - >
+      When managing provisioners locally (without remote administration), all changes are written to I(ca_config)
+      at once, so the CA only needs to be reloaded a single time.
+      Changes that require key generation or templates (e.g. I(jwk_create) or I(x509_template))
+      are still performed using step-cli.
+  - >
+      Failures are reported per provisioner in I(results). The module fails if any provisioner failed,
+      after all other provisioners have been processed.
+options:
+  ca_config:
+    description: The path to the certificate authority configuration file on the host if managing provisioners locally.
+    type: path
+    default: CI($STEPPATH)/config/ca.json
+  ca_url:
+    description: URI of the targeted Step Certificate Authority
+    type: str
+  exclusive:
+    description: >
+      Remove all provisioners from the CA that are not listed in I(provisioners).
+      Make sure to include any provisioners that you still need, such as the one used for remote administration!
+    type: bool
+    default: no
+  provisioners:
+    description: >
+      List of provisioners to manage. Each entry accepts the same options as M(maxhoesel.smallstep.step_ca_provisioner).
+      Provisioner names must be unique.
+    type: list
+    elements: dict
+    required: yes
+    suboptions:
+      allow_renewal_after_expiry:
+        description: Allow renewals for expired certificates generated by this provisioner.
+        type: bool
+      aws_accounts:
+        description: The AWS account ids used to validate the identity documents. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - aws_account
+      azure_audience:
+        description: The Microsoft Azure audience name used to validate the identity tokens.
+        type: str
+      azure_object_ids:
+        description: The Microsoft Azure AD object ids used to validate the identity tokens. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - azure_object_id
+      azure_resource_groups:
+        description: The Microsoft Azure resource group names used to validate the identity tokens. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - azure_resource_group
+      azure_subscription_ids:
+        description: The Microsoft Azure subscription ids used to validate the identity tokens. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - azure_subscription_id
+      azure_tenant:
+        description: The Microsoft Azure tenant id used to validate the identity tokens.
+        type: str
+      disable_custom_sans:
+        description: >
+          On cloud provisioners, if enabled only the internal DNS and IP will be added as a SAN.
+          By default it will accept any SAN in the CSR.
+        type: bool
+      disable_renewal:
+        description: Disable renewal for all certificates generated by this provisioner.
+        type: bool
+      disable_trust_on_first_use:
+        description: >
+          On cloud provisioners, if enabled multiple sign request for this provisioner with the same instance will be accepted.
+          By default only the first request will be accepted.
+        type: bool
+      force_cn:
+        description: Always set the common name in provisioned certificates.
+        type: bool
+      gcp_projects:
+        description: The Google project ids used to validate the identity tokens. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - gcp_project
+      gcp_service_accounts:
+        description: The Google service account emails or ids used to validate the identity tokens. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - gcp_service_account
+      instance_age:
+        description: >
+            The maximum duration to grant a certificate in AWS and GCP provisioners.
+            A duration is sequence of decimal numbers, each with optional fraction and a unit suffix,
+            such as "300ms", "-1.5h" or "2h45m".
+            Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      jwk_create:
+        description: Create the JWK key pair for the provisioner.
+        type: bool
+        aliases:
+          - create
+      jwk_private_key:
+        description: The file containing the JWK private key.
+        type: path
+        aliases:
+          - private_key
+      name:
+        description: The name of the provisioner to add/remove.
+        required: yes
+        type: str
+      nebula_root:
+        description: Root certificate (chain) file used to validate the signature on Nebula provisioning tokens.
+        type: path
+      oidc_admins:
+        description: >
+            The emails of admin users in an OpenID Connect provisioner,
+            these users will not have restrictions in the certificates to sign.
+            Must be a list
+        type: list
+        elements: str
+        aliases:
+          - admin
+          - oidc_admin
+          - oidc_admin_email
+      oidc_client_id:
+        description: The id used to validate the audience in an OpenID Connect token.
+        type: str
+        aliases:
+          - client_id
+      oidc_client_secret:
+        description: The secret used to obtain the OpenID Connect tokens.
+        type: str
+        aliases:
+          - client_secret
+      oidc_configuration_endpoint:
+        description: OpenID Connect configuration url.
+        type: str
+        aliases:
+          - configuration_endpoint
+      oidc_groups:
+        description: The group list used to validate the groups extenstion in an OpenID Connect token. Must be a list
+        type: list
+        elements: str
+        aliases:
+          - oidc_group
+          - group
+      oidc_listen_address:
+        description: The callback address used in the OpenID Connect flow (e.g. ":10000").
+        type: str
+        aliases:
+          - listen_address
+          - oidc_client_address
+      oidc_tenant_id:
+        description: The tenant-id used to replace the templatized {tenantid} in the OpenID Configuration.
+        type: str
+        aliases:
+          - tenant_id
+      password:
+        description: >
+            The password to encrypt or decrypt the private key.
+            Will be passed to step-cli through a temporary file.
+            Mutually exclusive with I(password_file)
+        type: str
+      password_file:
+        description: >
+            The path to the file containing the password to encrypt or decrypt the private key.
+            Mutually exclusive with I(password)
+        type: path
+      public_key:
+        description: >
+            The file containing the JWK public key.
+            Or, a file containing one or more PEM formatted keys, if used with the K8SSA provisioner.
+        type: path
+        aliases:
+          - jwk_public_key
+          - k8ssa_public_key
+          - k8s_pem_keys_file
+      require_eab:
+        description: >
+            Require (and enable) External Account Binding (EAB) for Account creation.
+            If this flag is set to false, then disable EAB.
+        type: bool
+      scep_capabilities:
+        description: The SCEP capabilities to advertise
+        type: str
+        aliases:
+          - capabilities
+      scep_challenge:
+        description: The SCEP challenge to use as a shared secret between a client and the CA
+        type: str
+        aliases:
+          - challenge
+      scep_encryption_algorithm_identifier:
+        description: >
+            The id for the SCEP encryption algorithm to use.
+            Valid values are 0 - 4, inclusive. The values correspond to:
+            0: DES-CBC, 1: AES-128-CBC, 2: AES-256-CBC, 3: AES-128-GCM, 4: AES-256-GCM.
+            Defaults to DES-CBC (0) for legacy clients.
+        type: int
+        aliases:
+          - encryption_algorithm_identifier
+      scep_include_root:
+        description: Include the CA root certificate in the SCEP CA certificate chain.
+        type: bool
+        aliases:
+          - include_root
+      scep_min_public_key_length:
+        description: The minimum public key length of the SCEP RSA encryption key
+        type: str
+        aliases:
+          - min_public_key_length
+      ssh:
+        description: Enable provisioning of ssh certificates. The default value is true. To disable ssh use '--ssh=false'.
+        type: bool
+        default: true
+      ssh_host_min_dur:
+        description: >
+          The minimum duration for an ssh host certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      ssh_host_max_dur:
+        description: >
+          The maximum duration for an ssh host certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      ssh_host_default_dur:
+        description: >
+          The default duration for an ssh host certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      ssh_user_min_dur:
+        description: >
+          The minimum duration for an ssh user certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      ssh_user_max_dur:
+        description: >
+          The maximum duration for an ssh user certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      ssh_user_default_dur:
+        description: >
+          The default duration for an ssh user certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      ssh_template:
+        description: The ssh certificate template file, a JSON representation of the certificate to create.
+        type: path
+      ssh_template_data:
+        description: The ssh certificate template data file, a JSON map of data that can be used by the certificate template.
+        type: path
+      state:
+        description: >
+            Whether the provisioner should be present or absent.
+            Note that C(present) does not update existing provisioners.
+            C(updated) compares the existing provisioner with the given options and only updates it if they differ.
+            Options that can't be compared (I(password), I(password_file), I(jwk_create) and I(jwk_private_key))
+            always cause an update.
+        choices:
+          - 'present'
+          - 'updated'
+          - 'absent'
+        default: 'present'
+        type: str
+      type:
+        description: >
+            The type of provisioner to create (case-sensitive).
+            Ignored when state == absent or updated.
+            Required if state == present
+        choices:
+          - 'JWK'
+          - 'OIDC'
+          - 'AWS'
+          - 'GCP'
+          - 'Azure'
+          - 'ACME'
+          - 'X5C'
+          - 'K8SSA'
+          - 'SSHPOP'
+          - 'SCEP'
+          - 'Nebula'
+        type: str
+      x509_template:
+        description: The x509 certificate template file, a JSON representation of the certificate to create.
+        type: path
+      x509_template_data:
+        description:  The x509 certificate template data file, a JSON map of data that can be used by the certificate template.
+        type: path
+      x509_min_dur:
+        description: >
+          The minimum duration for an x509 certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      x509_max_dur:
+        description: >
+          The maximum duration for an x509 certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      x509_default_dur:
+        description: >
+          The default duration for an x509 certificate generated by this provisioner.
+          Value must be a sequence of decimal numbers, each with optional fraction,
+          and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
+          Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+        type: str
+      x5c_root:
+        description: Root certificate (chain) file used to validate the signature on X5C provisioning tokens.
+        type: path
+        aliases:
+          - x5c_root_file
+  root:
+    description:  The path to the PEM file used as the root certificate authority.
+    type: path
+
+extends_documentation_fragment:
+  - maxhoesel.smallstep.cli_executable
+  - maxhoesel.smallstep.ca_admin
+"""
+
+EXAMPLES = r"""
+- name: Ensure that exactly these provisioners exist on the CA
+  maxhoesel.smallstep.step_ca_provisioners:
+    exclusive: yes
+    provisioners:
+      - name: admin
+        type: JWK
+      - name: acme
+        type: ACME
+      - name: cicd
+        type: JWK
+        jwk_create: yes
+        password_file: /etc/step-ca/cicd-password.txt
+  become: yes
+  become_user: step-ca
+
+- name: Remove some provisioners
+  maxhoesel.smallstep.step_ca_provisioners:
+    provisioners:
+      - name: tenant-a
+        state: absent
+      - name: tenant-b
+        state: absent
+  become: yes
+  become_user: step-ca
+"""
+
+RETURN = r"""
+results:
+  description: >
+    The result for each provisioner, in the same order as I(provisioners).
+    With I(exclusive), provisioners that were removed because they are not listed are appended at the end.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    name:
+      description: The name of the provisioner
+      type: str
+    action:
+      description: The action taken to reach the desired state. One of C(add), C(update) or C(remove)
+      type: str
+      returned: If the provisioner was changed
+    changed:
+      description: Whether the provisioner was changed
+      type: bool
+    failed:
+      description: Whether this provisioner could not be processed
+      type: bool
+      returned: On failure
+    msg:
+      description: Error message
+      type: str
+      returned: On failure
+config_changes:
+  description: >
+    The changes that were written directly to I(ca_config), in order.
+    Provisioners that had to be changed using step-cli are not included.
+  type: list
+  elements: dict
+  returned: When managing provisioners locally (without remote administration)
+  contains:
+    action:
+      description: One of C(add), C(update) or C(remove)
+      type: str
+    name:
+      description: The name of the provisioner
+      type: str
+    fields:
+      description: The provisioner fields that were set, as dotted paths in the ca.json provisioner object
+      type: dict
+      returned: For C(add) and C(update)
+"""
+import contextlib
+import os
+from typing import cast, Dict, Any, List
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.bulk import run_items
+from ..module_utils.params.ca_admin import AdminParams
+from ..module_utils.ca_config import CaConfigError
+from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.provisioner import (
+    PROVISIONER_ARGUMENT_SPEC, ProvisionerChanges, admin_client, check_provisioners_params, fetch_provisioners,
+    load_local_config, provisioner_items
+)
+from ..module_utils.timings import add_timings
+
+
+def run_module():
+    argument_spec = dict(
+        ca_config=dict(
+            type="path", default=f"{os.environ.get('STEPPATH', os.environ['HOME'] + '/.step')}/config/ca.json"),
+        ca_url=dict(type="str"),
+        exclusive=dict(type="bool", default=False),
+        provisioners=dict(type="list", elements="dict", required=True, options=PROVISIONER_ARGUMENT_SPEC),
+        root=dict(type="path"),
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+    )
+    result: Dict[str, Any] = dict(changed=False)
+    module = AnsibleModule(argument_spec={
+        **AdminParams.argument_spec,
+        **argument_spec
+    }, supports_check_mode=True)
+    module_params = cast(Dict, module.params)
+    desired = cast(List[Dict[str, Any]], module_params["provisioners"])
+
+    try:
+        AdminParams(module).check()
+        check_provisioners_params(desired)
+    except TypeError as e:
+        module.fail_json(f"Parameter validation failed: {e}")
+
+    # Without remote administration, we can edit ca.json directly and write all changes at once.
+    # With it, we use the admin API if possible.
+    # ca.json stays locked until all changes were applied, so that concurrent runs don't overwrite each other's changes
+    config = load_local_config(module)
+    with config or contextlib.nullcontext():
+        client = admin_client(module) if config is None else None
+        # Retrieve the current provisioners only once and index them by name.
+        # Undeclared provisioners are only needed (by name) if they are to be removed
+        current, executable = fetch_provisioners(
+            module, config, client, [p["name"] for p in desired], complete=module_params["exclusive"])
+
+        items = provisioner_items(desired, current, module_params["exclusive"])
+        changes = ProvisionerChanges(module, current, config, client, executable)
+
+        # Changes are applied one at a time, as local changes all modify the same in-memory ca.json.
+        # CaConfig is not thread-safe, so this has to stay single-threaded
+        result["results"] = run_items(module, items, PROVISIONER_ARGUMENT_SPEC, changes.process_config, 1,
+                                      result_keys=["name"])
+        if config is not None:
+            result["config_changes"] = config.changes
+            if not module.check_mode:
+                try:
+                    config.save()
+                except CaConfigError as e:
+                    module.fail_json(str(e), **result)
+        # Anything the config editor can't handle is passed on to the admin API or step-cli,
+        # after the config was written
+        if changes.deferred:
+            for index, res in zip(changes.deferred, run_items(
+                    module, [items[i] for i in changes.deferred], PROVISIONER_ARGUMENT_SPEC, changes.process_cli, 1,
+                    result_keys=["name"])):
+                result["results"][index] = res
+    result["changed"] = any(r["changed"] for r in result["results"])
+    if changes.diffs:
+        result["diff"] = changes.diffs
+    failed = [r["name"] for r in result["results"] if r.get("failed")]
+    if failed:
+        module.fail_json(f"Failed to manage provisioners: {', '.join(failed)}", **result)
+    add_timings(module, result)
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ version_added: '0.3.0'
 description: Renew a valid certificate
 notes:
   - Check mode is supported.
+  - If I(expires_in) is set, the expiry date of I(crt_file) is checked locally before contacting the CA.
+    If the certificate is not due for renewal yet, step-cli is not run at all.
+  - If I(renewal_window) is set, the random jitter is replaced with a fixed offset within the window.
+    Certificates that are issued at the same time are therefore renewed at different, but predictable times,
+    spread evenly across the window. The offsets match those of the C(maxhoesel.smallstep.renewal_plan) filter.
 options:
   crt_file:
     description: The certificate in PEM format that we want to renew.
@@ -22,6 +27,7 @@ options:
       The amount of time remaining before certificate expiration, at which point a renewal should be attempted.
       The certificate renewal will not be performed if the time to expiration is greater than the I(expires_in) value.
       A random jitter (duration/20) will be added to avoid multiple services hitting the renew endpoint at the same time.
+      If not set, the certificate is always renewed.
       The duration is a sequence of decimal numbers, each with optional fraction and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
       Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
     type: str
@@ -64,6 +70,21 @@ options:
       The signal number to send to the selected PID, so it can reload the configuration and load the new certificate.
       Default value is SIGHUP (1).
     type: int
+  renewal_window:
+    description: >
+      Spread renewals across this window, by renewing the certificate once its time to expiration is less than
+      I(expires_in) plus a fixed offset within the window. The offset is derived from a hash of I(renewal_seed).
+      Uses the same duration format as I(expires_in). Requires I(expires_in).
+    type: str
+    version_added: '0.25.0'
+  renewal_seed:
+    description: >
+      The value that the renewal window offset is derived from. Must be unique for each certificate in your fleet.
+      Defaults to the hostname of the host and I(crt_file), separated by a colon.
+      Set this to C({{ inventory_hostname }}:<crt_file>) to get the same offset as the
+      C(maxhoesel.smallstep.renewal_plan) filter.
+    type: str
+    version_added: '0.25.0'
 
 extends_documentation_fragment:
   - maxhoesel.smallstep.cli_executable
@@ -79,16 +100,29 @@ EXAMPLES = r"""
     key_file: internal.key
     ca_url: https://ca.smallstep.com:9000
     force: yes
+
+- name: Renew a certificate between 8 and 9 hours before it expires, depending on the host
+  maxhoesel.smallstep.step_ca_renew:
+    crt_file: /etc/ssl/internal.crt
+    key_file: /etc/ssl/internal.key
+    expires_in: 8h
+    renewal_window: 1h
+    renewal_seed: "{{ inventory_hostname }}:/etc/ssl/internal.crt"
+    force: yes
 """
 
+import platform
 from typing import Dict, cast, Any
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.validation import check_mutually_exclusive
 
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from ..module_utils.cli_wrapper import StepCliExecutable
+from ..module_utils.renew import check_renewal_due, renew_certificate
 from ..module_utils.params.ca_connection import CaConnectionParams
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.renewal_window import plan_renewal, renewal_seed
+from ..module_utils.timings import add_timings
 
 
 def run_module():
@@ -104,6 +138,8 @@ def run_module():
         pid=dict(type="int"),
         pid_file=dict(type="path"),
         signal=dict(type="int"),
+        renewal_window=dict(type="str"),
+        renewal_seed=dict(type="str"),
         step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
     )
     result: Dict[str, Any] = dict(changed=False)
@@ -119,22 +155,37 @@ def run_module():
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    jitter = None
+    if module_params["renewal_window"]:
+        if not module_params["expires_in"]:
+            module.fail_json("Parameter validation failed: renewal_window requires expires_in")
+        seed = module_params["renewal_seed"] or renewal_seed(platform.node(), module_params["crt_file"])
+        try:
+            plan = plan_renewal(seed, module_params["expires_in"], module_params["renewal_window"])
+        except ValueError as e:
+            module.fail_json(f"Parameter validation failed: {e}")
+        # The planned threshold is also passed to step-cli, should it have to check the certificate itself
+        module_params["expires_in"] = plan["expires_in"]
+        jitter = 0.0
+        result["renewal_plan"] = plan
+
+    # Check whether the certificate needs to be renewed before spawning step-cli or contacting the CA
+    try:
+        due = check_renewal_due(module, jitter)
+    except ValueError as e:
+        module.fail_json(f"Parameter validation failed: {e}")
+    if due is False:
+        add_timings(module, result)
+        module.exit_json(**result)
+    if module.check_mode:
+        # If we couldn't check the certificate ourselves, step-cli would have to decide
+        result["changed"] = bool(due)
 
-    # Regular args
-    renew_cliargs = ["expires_in", "force", "exec", "output_file", "password_file", "pid", "pid_file", "signal"]
-    # All parameters can be converted to a mapping by just appending -- and replacing the underscores
-    renew_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in renew_cliargs}
-
-    renew_args = CaConnectionParams.cli_args().join(CliCommandArgs(
-        ["ca", "renew", module_params["crt_file"], module_params["key_file"]],
-        renew_cliarg_map,
-        {"password": "--password-file"}
-    ))
-    renew_cmd = CliCommand(executable, renew_args)
-    renew_res = renew_cmd.run(module)
-    if "Your certificate has been saved in" in renew_res.stderr:
+    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    renew_cliargs = ["force", "exec", "output_file", "password_file", "pid", "pid_file", "signal"]
+    if renew_certificate(executable, module, renew_cliargs, due):
         result["changed"] = True
+    add_timings(module, result)
     module.exit_json(**result)
 
 
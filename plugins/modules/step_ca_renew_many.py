@@ -0,0 +1,286 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+module: step_ca_renew_many
+author: Max Hösel (@maxhoesel)
+short_description: Renew multiple certificates
+version_added: '0.25.0'
+description: >
+    Renews a list of certificates in a single module run. Each certificate is handled like in
+    M(maxhoesel.smallstep.step_ca_renew), but only certificates that are due for renewal are renewed,
+    and renewals are performed concurrently.
+    Reload hooks (I(exec) and I(pid_file)) are deduplicated, so that each service is only reloaded once,
+    after all certificates have been renewed.
+notes:
+  - Check mode is supported.
+  - >
+      Failures are reported per certificate in I(results). The module fails if any certificate failed,
+      after all other certificates have been processed.
+options:
+  certificates:
+    description: List of certificates to renew
+    type: list
+    elements: dict
+    required: yes
+    suboptions:
+      crt_file:
+        description: The certificate in PEM format that we want to renew.
+        required: yes
+        type: path
+      key_file:
+        description: They key file of the certificate.
+        required: yes
+        type: path
+      expires_in:
+        description: Overrides the global I(expires_in) value for this certificate.
+        type: str
+      output_file:
+        description: The new certificate file path. Defaults to overwriting I(crt_file).
+        type: path
+      exec:
+        description: >
+          The command to run after the certificate has been renewed.
+          Each distinct command is run only once per module run, no matter how many certificates it is set for.
+        type: str
+      pid_file:
+        description: >
+          The path from which to read the process id that will be signaled after the certificate has been renewed.
+          Each distinct file is only signaled once per module run, no matter how many certificates it is set for.
+        type: path
+  expires_in:
+    description: >
+      The amount of time remaining before certificate expiration, at which point a renewal should be attempted.
+      Can be overridden for each certificate.
+      See M(maxhoesel.smallstep.step_ca_renew) for details.
+      If not set, all certificates are renewed.
+    type: str
+  force:
+    description: Force the overwrite of files without asking.
+    type: bool
+  jitter:
+    description: >
+      Wait for a random amount of time between 0 and this duration before renewing each certificate,
+      to avoid many hosts hitting the CA at the same time.
+      The format is the same as for I(expires_in), e.g. "30s" or "2m".
+      Certificates that are not due for renewal are never delayed.
+    type: str
+  password:
+    description: >
+        The password to encrypt or decrypt the private keys.
+        Will be passed to step-cli through a temporary file.
+        Mutually exclusive with I(password_file)
+    type: str
+  password_file:
+    description: >
+        The path to the file containing the password to encrypt or decrypt the private keys.
+        Mutually exclusive with I(password)
+    type: path
+  signal:
+    description: >
+      The signal number to send to the processes in I(pid_file), so they can reload the new certificates.
+      Default value is SIGHUP (1).
+    type: int
+  workers:
+    description: Maximum number of certificates to renew at the same time.
+    type: int
+    default: 4
+
+extends_documentation_fragment:
+  - maxhoesel.smallstep.cli_executable
+  - maxhoesel.smallstep.ca_connection
+"""
+
+EXAMPLES = r"""
+- name: Renew all certificates that expire within the next 8 hours
+  maxhoesel.smallstep.step_ca_renew_many:
+    expires_in: 8h
+    jitter: 1m
+    force: yes
+    certificates:
+      - crt_file: /etc/nginx/site-a.crt
+        key_file: /etc/nginx/site-a.key
+        pid_file: /run/nginx.pid
+      - crt_file: /etc/nginx/site-b.crt
+        key_file: /etc/nginx/site-b.key
+        pid_file: /run/nginx.pid
+      - crt_file: /etc/postfix/smtp.crt
+        key_file: /etc/postfix/smtp.key
+        exec: systemctl reload postfix
+"""
+
+RETURN = r"""
+results:
+  description: The result for each certificate, in the same order as I(certificates)
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    crt_file:
+      description: The certificate file
+      type: str
+    changed:
+      description: Whether the certificate was renewed
+      type: bool
+    failed:
+      description: Whether this certificate could not be processed
+      type: bool
+      returned: On failure
+    msg:
+      description: Error message
+      type: str
+      returned: On failure
+reloads:
+  description: >
+    The reload hooks that were run after renewing the certificates.
+    In check mode, this contains the hooks that would have been run.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    exec:
+      description: The command that was run
+      type: str
+      returned: For I(exec) hooks
+    pid_file:
+      description: The pid file of the process that was signaled
+      type: str
+      returned: For I(pid_file) hooks
+    failed:
+      description: Whether the hook failed
+      type: bool
+    msg:
+      description: Error message
+      type: str
+      returned: On failure
+"""
+import os
+import random
+from signal import SIGHUP
+import time
+from typing import cast, Dict, Any, List
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.validation import check_mutually_exclusive
+
+from ..module_utils.params.ca_connection import CaConnectionParams
+from ..module_utils.cli_wrapper import StepCliExecutable
+from ..module_utils.bulk import ItemModule, run_items
+from ..module_utils.helpers import parse_duration
+from ..module_utils.renew import check_renewal_due, renew_certificate
+from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.timings import add_timings
+
+RENEW_ITEM_ARGUMENT_SPEC = dict(
+    crt_file=dict(type="path", required=True),
+    key_file=dict(type="path", required=True),
+    expires_in=dict(type="str"),
+    output_file=dict(type="path"),
+    exec=dict(type="str"),
+    pid_file=dict(type="path"),
+)
+
+
+def run_reload_hooks(module: AnsibleModule, certificates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    module_params = cast(Dict, module.params)
+    # dict.fromkeys() deduplicates while keeping the order of the certificates
+    commands = dict.fromkeys(cert["exec"] for cert in certificates if cert["exec"])
+    pid_files = dict.fromkeys(cert["pid_file"] for cert in certificates if cert["pid_file"])
+
+    reloads: List[Dict[str, Any]] = []
+    for command in commands:
+        reload: Dict[str, Any] = {"exec": command, "failed": False}
+        if not module.check_mode:
+            rc, _, stderr = module.run_command(command)
+            if rc != 0:
+                reload.update({"failed": True, "msg": f"Command exited with rc {rc}: {stderr}"})
+        reloads.append(reload)
+    for pid_file in pid_files:
+        reload = {"pid_file": pid_file, "failed": False}
+        if not module.check_mode:
+            try:
+                with open(pid_file, "r", encoding="utf-8") as f:
+                    pid = int(f.read().strip())
+                os.kill(pid, module_params["signal"] or SIGHUP)
+            except (OSError, ValueError) as e:
+                reload.update({"failed": True, "msg": f"Could not signal process: {e}"})
+        reloads.append(reload)
+    return reloads
+
+
+def run_module():
+    argument_spec = dict(
+        certificates=dict(type="list", elements="dict", required=True, options=RENEW_ITEM_ARGUMENT_SPEC),
+        expires_in=dict(type="str"),
+        force=dict(type="bool"),
+        jitter=dict(type="str"),
+        password=dict(type="str", no_log=True),
+        password_file=dict(type="path", no_log=False),
+        signal=dict(type="int"),
+        workers=dict(type="int", default=4),
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+    )
+    result: Dict[str, Any] = dict(changed=False)
+    module = AnsibleModule(argument_spec={
+        **CaConnectionParams.argument_spec,
+        **argument_spec
+    }, supports_check_mode=True)
+    module_params = cast(Dict, module.params)
+
+    try:
+        CaConnectionParams(module).check()
+        check_mutually_exclusive(["password", "password_file"], module_params)
+        jitter = parse_duration(module_params["jitter"]) if module_params["jitter"] else 0.0
+    except (TypeError, ValueError) as e:
+        module.fail_json(f"Parameter validation failed: {e}")
+
+    # Renewal checks only read the certificates, so we can skip probing step-cli if nothing is due
+    certificates = module_params["certificates"]
+    dues: List[Any] = []
+    for cert in certificates:
+        try:
+            dues.append(check_renewal_due(ItemModule(module, cert, RENEW_ITEM_ARGUMENT_SPEC)))  # type: ignore
+        except ValueError as e:
+            dues.append(e)
+    executable = None
+    if not module.check_mode and any(due is not False and not isinstance(due, ValueError) for due in dues):
+        executable = StepCliExecutable(module, module_params["step_cli_executable"])
+
+    def process(item: ItemModule) -> Dict[str, Any]:
+        due = dues[item.index]
+        if isinstance(due, ValueError):
+            item.fail_json(f"Parameter validation failed: {due}")
+        if due is False or module.check_mode:
+            return {"changed": due is True}
+
+        if jitter > 0:
+            time.sleep(random.uniform(0, jitter))
+        changed = renew_certificate(cast(StepCliExecutable, executable), item,  # type: ignore
+                                    ["force", "output_file", "password_file"], due)
+        return {"changed": changed}
+
+    result["results"] = run_items(module, certificates, RENEW_ITEM_ARGUMENT_SPEC, process,
+                                  module_params["workers"], result_keys=["crt_file"])
+    result["changed"] = any(r["changed"] for r in result["results"])
+    result["reloads"] = run_reload_hooks(
+        module, [cert for cert, res in zip(certificates, result["results"]) if res["changed"]])
+
+    failed = [r["crt_file"] for r in result["results"] if r.get("failed")]
+    if failed:
+        module.fail_json(f"Failed to renew certificates: {', '.join(failed)}", **result)
+    failed_reloads = [r.get("exec") or r.get("pid_file") for r in result["reloads"] if r["failed"]]
+    if failed_reloads:
+        module.fail_json(f"Failed to run reload hooks: {', '.join(failed_reloads)}", **result)
+    add_timings(module, result)
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
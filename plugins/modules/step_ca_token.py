@@ -151,6 +151,7 @@ from ansible.module_utils.basic import AnsibleModule
 from ..module_utils.cli_wrapper import CliCommandArgs, StepCliExecutable, CliCommand
 from ..module_utils.params.ca_connection import CaConnectionParams
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.timings import add_timings
 
 
 def run_module():
@@ -218,6 +219,7 @@ def run_module():
     result["changed"] = True
     if module_params["return_token"]:
         result["token"] = token_res.stdout
+    add_timings(module, result)
     module.exit_json(**result)
 
 
@@ -18,6 +18,10 @@ description: >
     as determined by C(step certificate verify)
 notes:
   - Check mode is supported.
+  - >
+      If the python C(cryptography) library is installed on the target host, certificate verification
+      is performed in-process without calling C(step certificate verify).
+      C(step-cli) is still used if I(server_name) is set or the certificate cannot be handled in-process.
 options:
   path:
     description: Path to a certificate or certificate signing request (CSR) to inspect
@@ -104,6 +108,7 @@ from ansible.module_utils.basic import AnsibleModule
 from ..module_utils.cli_wrapper import CliCommandArgs, StepCliExecutable, CliCommand
 from ..module_utils import helpers
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.timings import add_timings
 
 FORMAT_CLIARGS = {
     "pem": ["--format", "pem"],
@@ -167,7 +172,8 @@ def main():
                                              bundle=module_params["bundle"],
                                              insecure=module_params["insecure"],
                                              server_name=module_params["server_name"],
-                                             roots=module_params["roots"])
+                                             roots=module_params["roots"],
+                                             native_inspect=False)
     data = cert_info.data if module_params["format"] == "json" else inspect_non_json(executable, module)
     result.update({
         "valid": cert_info.valid,
@@ -175,6 +181,7 @@ def main():
         RESULT_FORMAT_KEYNAME[module_params["format"]]: data
     })
 
+    add_timings(module, result)
     module.exit_json(**result)
 
 
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+module: step_certificate_trust
+author: Max Hösel (@maxhoesel)
+short_description: Ensure that a root certificate is installed in the system trust stores
+version_added: '0.25.0'
+description: >
+    Checks whether a root certificate is present in the trust stores managed by C(step certificate install)
+    and only installs it into the stores that are missing it.
+    Installing a certificate regenerates the system trust bundles, so skipping this step when the certificate
+    is already trusted avoids unneccessary work on every run.
+notes:
+  - Check mode is supported.
+  - >
+      The trust stores are checked in-process by comparing the DER encoding of the certificate.
+      The system store is read from the CA bundle generated by C(update-ca-certificates) (Debian)
+      or C(update-ca-trust) (RedHat). The NSS store consists of the same NSS databases that
+      C(step certificate install --firefox) uses, and is only available if C(certutil) is installed.
+      The Java store is the C(cacerts) keystore in C($JAVA_HOME), just like with C(step certificate install --java).
+  - Stores that are not available on the host are skipped.
+  - Make sure that the user has the required privileges to modify the trust stores.
+options:
+  path:
+    description: Path to the root certificate to trust
+    type: path
+    required: true
+  stores:
+    description: The trust stores that should contain the root certificate
+    type: list
+    elements: str
+    choices:
+      - system
+      - nss
+      - java
+    default:
+      - system
+      - nss
+      - java
+
+extends_documentation_fragment:
+  - maxhoesel.smallstep.cli_executable
+"""
+
+EXAMPLES = r"""
+- name: Trust the CA root in all stores
+  maxhoesel.smallstep.step_certificate_trust:
+    path: /root/.step/certs/root_ca.crt
+  become: yes
+
+- name: Only trust the CA root in the system store
+  maxhoesel.smallstep.step_certificate_trust:
+    path: /root/.step/certs/root_ca.crt
+    stores:
+      - system
+  become: yes
+"""
+
+RETURN = r"""
+stores:
+  description: The state of each requested trust store, before any changes were made
+  type: dict
+  returned: always
+  sample:
+    system:
+      available: true
+      trusted: true
+    nss:
+      available: false
+      trusted: false
+changed_stores:
+  description: The trust stores that the root certificate was installed into
+  type: list
+  elements: str
+  returned: always
+"""
+from typing import cast, Dict, Any
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.cli_wrapper import CliCommandArgs, StepCliExecutable, CliCommand
+from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils import truststore
+from ..module_utils.timings import add_timings
+
+
+def run_module():
+    module_args = dict(
+        path=dict(type="path", required=True),
+        stores=dict(type="list", elements="str", choices=truststore.STORES, default=truststore.STORES),
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+    )
+    result: Dict[str, Any] = dict(changed=False)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module_params = cast(Dict, module.params)
+
+    try:
+        with open(module_params["path"], "rb") as f:
+            stores = truststore.check_stores(f.read(), module_params["stores"])
+    except (OSError, ValueError) as e:
+        module.fail_json(f"Could not read root certificate {module_params['path']}: {e}")
+
+    missing = [store for store, state in stores.items() if state["available"] and not state["trusted"]]
+    result["stores"] = stores
+    result["changed_stores"] = missing
+    result["changed"] = bool(missing)
+    if not missing:
+        add_timings(module, result)
+        module.exit_json(**result)
+
+    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    install_args = CliCommandArgs(
+        ["certificate", "install", module_params["path"]] + truststore.install_flags(missing), {})
+    CliCommand(executable, install_args).run(module)
+    add_timings(module, result)
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
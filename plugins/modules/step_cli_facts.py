@@ -0,0 +1,210 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+module: step_cli_facts
+author: Max Hösel (@maxhoesel)
+short_description: Gather facts about the C(step-cli) and C(step-ca) installation of a host
+version_added: '0.25.0'
+description: >
+    Returns the location, version and file capabilities of C(step-cli), the C(step-cli) configuration
+    of the current user and the version of C(step-ca) in a single call.
+notes:
+  - Check mode is supported.
+  - >
+      The executable versions are cached on the host, so that C(step-cli version) and C(step-ca version)
+      only need to be run again once the executables change.
+  - File capabilities are read directly from the C(security.capability) extended attribute, without running C(getcap).
+options:
+  step_ca_executable:
+    description: >
+      Name or path of the C(step-ca) executable.
+      The C(step-ca) facts report it as not installed if it cannot be found.
+    type: path
+    default: step-ca
+
+extends_documentation_fragment:
+  - maxhoesel.smallstep.cli_executable
+"""
+
+EXAMPLES = r"""
+- name: Gather step-cli facts
+  maxhoesel.smallstep.step_cli_facts:
+
+- name: Install step-cli if it is missing
+  ansible.builtin.include_role:
+    name: maxhoesel.smallstep.step_cli
+  when: not ansible_facts.step_cli.installed
+"""
+
+RETURN = r"""
+ansible_facts:
+  description: Facts about the C(step-cli) and C(step-ca) installation
+  returned: always
+  type: dict
+  contains:
+    step_cli:
+      description: Facts about C(step-cli)
+      returned: always
+      type: dict
+      contains:
+        installed:
+          description: Whether the C(step-cli) executable was found
+          type: bool
+          returned: always
+        executable:
+          description: The absolute path of the C(step-cli) executable
+          type: str
+          returned: When I(installed=true)
+        version:
+          description: The version of C(step-cli)
+          type: str
+          returned: When I(installed=true)
+          sample: 0.28.2
+        capabilities:
+          description: >
+            The file capabilities of the executable, in the same flag format as C(getcap).
+            Empty if the executable has none or they can't be read.
+          type: dict
+          returned: always
+          sample:
+            cap_net_bind_service: ep
+        steppath:
+          description: The C($STEPPATH) of the current user
+          type: str
+          returned: always
+        ca_url:
+          description: The URL of the CA that the current user is bootstrapped to
+          type: str
+          returned: When the user is bootstrapped
+        fingerprint:
+          description: The root fingerprint of the CA that the current user is bootstrapped to
+          type: str
+          returned: When the user is bootstrapped
+        root:
+          description: The path of the root certificate that the current user is bootstrapped to
+          type: str
+          returned: When the user is bootstrapped
+    step_ca:
+      description: Facts about C(step-ca)
+      returned: always
+      type: dict
+      contains:
+        installed:
+          description: Whether the C(step-ca) executable was found
+          type: bool
+          returned: always
+        executable:
+          description: The absolute path of the C(step-ca) executable
+          type: str
+          returned: When I(installed=true)
+        version:
+          description: The version of C(step-ca)
+          type: str
+          returned: When I(installed=true)
+"""
+import json
+import os
+import struct
+from typing import cast, Dict, Any
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.cli_wrapper import CliError, probe_version
+from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.steppath import get_steppath
+
+# Linux capability names, indexed by their bit number (see capability.h)
+CAPABILITY_NAMES = [
+    "cap_chown", "cap_dac_override", "cap_dac_read_search", "cap_fowner", "cap_fsetid", "cap_kill", "cap_setgid",
+    "cap_setuid", "cap_setpcap", "cap_linux_immutable", "cap_net_bind_service", "cap_net_broadcast",
+    "cap_net_admin", "cap_net_raw", "cap_ipc_lock", "cap_ipc_owner", "cap_sys_module", "cap_sys_rawio",
+    "cap_sys_chroot", "cap_sys_ptrace", "cap_sys_pacct", "cap_sys_admin", "cap_sys_boot", "cap_sys_nice",
+    "cap_sys_resource", "cap_sys_time", "cap_sys_tty_config", "cap_mknod", "cap_lease", "cap_audit_write",
+    "cap_audit_control", "cap_setfcap", "cap_mac_override", "cap_mac_admin", "cap_syslog", "cap_wake_alarm",
+    "cap_block_suspend", "cap_audit_read", "cap_perfmon", "cap_bpf", "cap_checkpoint_restore",
+]
+VFS_CAP_FLAGS_EFFECTIVE = 0x000001
+
+
+def file_capabilities(path: str) -> Dict[str, str]:
+    """Return the file capabilities of an executable, mapped to their flags ("e", "i", "p") like getcap"""
+    try:
+        data = os.getxattr(path, "security.capability")
+    except (AttributeError, OSError):
+        # not supported on this platform, or the file has no capabilities
+        return {}
+    if len(data) < 12:
+        return {}
+    magic_etc, permitted, inheritable = struct.unpack_from("<III", data)
+    if len(data) >= 20:
+        permitted_hi, inheritable_hi = struct.unpack_from("<II", data, 12)
+        permitted |= permitted_hi << 32
+        inheritable |= inheritable_hi << 32
+    effective = bool(magic_etc & VFS_CAP_FLAGS_EFFECTIVE)
+
+    capabilities = {}
+    for bit, name in enumerate(CAPABILITY_NAMES):
+        flags = ""
+        if effective and permitted & (1 << bit):
+            flags += "e"
+        if inheritable & (1 << bit):
+            flags += "i"
+        if permitted & (1 << bit):
+            flags += "p"
+        if flags:
+            capabilities[name] = flags
+    return capabilities
+
+
+def executable_facts(module: AnsibleModule, executable: str) -> Dict[str, Any]:
+    path = module.get_bin_path(executable)
+    if not path:
+        return dict(installed=False)
+    try:
+        version, _ = probe_version(module, path)
+    except CliError as e:
+        module.fail_json(f"Could not get version of {path}: {e}")
+    return dict(installed=True, executable=path, version=version)
+
+
+def bootstrap_facts() -> Dict[str, Any]:
+    steppath = get_steppath()
+    facts: Dict[str, Any] = dict(steppath=steppath.as_posix())
+    try:
+        with open(steppath / "config" / "defaults.json", "rb") as f:
+            defaults = json.load(f)
+    except (OSError, ValueError):
+        return facts
+    if isinstance(defaults, dict):
+        for fact, key in (("ca_url", "ca-url"), ("fingerprint", "fingerprint"), ("root", "root")):
+            if defaults.get(key):
+                facts[fact] = defaults[key]
+    return facts
+
+
+def run_module():
+    module_args = dict(
+        step_ca_executable=dict(type="path", default="step-ca"),
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+    )
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module_params = cast(Dict, module.params)
+
+    step_cli = executable_facts(module, module_params["step_cli_executable"])
+    step_cli["capabilities"] = file_capabilities(step_cli["executable"]) if step_cli["installed"] else {}
+    step_cli.update(bootstrap_facts())
+    step_ca = executable_facts(module, module_params["step_ca_executable"])
+
+    module.exit_json(changed=False, ansible_facts=dict(step_cli=step_cli, step_ca=step_ca))
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
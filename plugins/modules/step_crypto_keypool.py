@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+---
+module: step_crypto_keypool
+author: Max Hösel (@maxhoesel)
+short_description: Manage a pool of pre-generated private keys for fast certificate issuance
+version_added: '0.25.0'
+description: >
+    Keeps a number of ready-made private keys of one type in a key pool directory on the host.
+    M(maxhoesel.smallstep.step_ca_certificate) and M(maxhoesel.smallstep.step_ca_certificates) can take keys from
+    this pool with their I(keypool) option, so that issuing a certificate doesn't have to wait for key generation.
+    This mostly matters for large RSA keys, which can take several seconds to generate on small hosts.
+notes:
+  - Check mode is supported.
+  - Requires the python C(cryptography) library on the target host.
+  - >
+      The keys are stored unencrypted in a subdirectory per key type (such as C(RSA-4096)),
+      which only the user running this module can access.
+  - Keys are generated in parallel on up to I(workers) cores.
+options:
+  count:
+    description: The number of keys that the pool should contain if I(state=present)
+    type: int
+    default: 4
+  curve:
+    aliases:
+      - crv
+    description: The elliptic curve of the keys for EC and OKP key types. Defaults to P-256 for EC and Ed25519 for OKP.
+    type: str
+    choices:
+      - P-256
+      - P-384
+      - P-521
+      - Ed25519
+  kty:
+    description: The key type of the keys
+    type: str
+    choices:
+      - EC
+      - OKP
+      - RSA
+    default: EC
+  path:
+    description: >
+      The key pool directory. Defaults to C($STEPPATH/keypool).
+      The directory is created with mode C(0700) if it doesn't exist, existing directories are left as they are.
+    type: path
+  size:
+    description: The size of RSA keys in bits. Defaults to 2048.
+    type: int
+  state:
+    description: >
+      If I(state=present), keys are generated until the pool contains I(count) keys of this type.
+      If I(state=absent), all keys of this type are removed from the pool.
+    type: str
+    choices:
+      - present
+      - absent
+    default: present
+  workers:
+    description: The maximum number of keys to generate in parallel. Defaults to the number of CPU cores.
+    type: int
+"""
+
+EXAMPLES = r"""
+- name: Keep 8 RSA-4096 keys ready for the web server certificates
+  maxhoesel.smallstep.step_crypto_keypool:
+    kty: RSA
+    size: 4096
+    count: 8
+
+- name: Issue a certificate with a key from the pool
+  maxhoesel.smallstep.step_ca_certificate:
+    name: www.example.com
+    crt_file: /etc/ssl/www.crt
+    key_file: /etc/ssl/www.key
+    provisioner: jwk
+    provisioner_password_file: /path/to/password_file
+    kty: RSA
+    size: 4096
+    keypool: true
+
+- name: Empty the pool
+  maxhoesel.smallstep.step_crypto_keypool:
+    kty: RSA
+    size: 4096
+    state: absent
+"""
+
+RETURN = r"""
+available:
+  description: The number of keys of this type in the pool after the module ran
+  type: int
+  returned: always
+generated:
+  description: The number of keys that were added to the pool
+  type: int
+  returned: always
+removed:
+  description: The number of keys that were removed from the pool
+  type: int
+  returned: always
+"""
+import os
+from typing import cast, Dict, Any
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.keypool import KEY_TYPES, KeyPool, KeySpec, default_pool_dir, generate_keys
+from ..module_utils.x509 import UnsupportedError
+
+
+def run_module():
+    module_args = dict(
+        count=dict(type="int", default=4),
+        curve=dict(type="str", choices=["P-256", "P-384", "P-521", "Ed25519"], aliases=["crv"]),
+        kty=dict(type="str", choices=KEY_TYPES, default="EC"),
+        path=dict(type="path"),
+        size=dict(type="int"),
+        state=dict(type="str", choices=["present", "absent"], default="present"),
+        workers=dict(type="int"),
+    )
+    result: Dict[str, Any] = dict(changed=False, generated=0, removed=0)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module_params = cast(Dict, module.params)
+
+    try:
+        spec = KeySpec.from_params(module_params["kty"], module_params["size"], module_params["curve"])
+    except ValueError as e:
+        module.fail_json(f"Parameter validation failed: {e}")
+    if module_params["count"] < 0:
+        module.fail_json("Parameter validation failed: count must not be negative")
+    pool = KeyPool(module_params["path"] or default_pool_dir())
+    available = pool.available(spec)
+    error = pool.refill_error(spec)
+    if error:
+        module.warn(f"The last background refill of the key pool failed: {error}")
+
+    if module_params["state"] == "absent":
+        result["changed"] = available > 0
+        if not module.check_mode:
+            result["removed"] = pool.clear(spec)
+        result["available"] = 0
+        module.exit_json(**result)
+
+    missing = max(0, module_params["count"] - available)
+    result["changed"] = missing > 0
+    if missing and not module.check_mode:
+        try:
+            keys = generate_keys([spec] * missing, module_params["workers"] or os.cpu_count() or 1)
+        except UnsupportedError as e:
+            module.fail_json(f"Could not generate keys: {e}")
+        try:
+            pool.add(spec, keys)
+        except OSError as e:
+            module.fail_json(f"Could not add keys to the pool: {e}")
+        result["generated"] = missing
+    result["available"] = available + missing
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+# Copyright: (c) 2026, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Renewal scheduler for step_acme_cert.
+#
+# Renews all certificates registered in a manifest directory from a single process, instead of running one
+# "step-cli ca renew --daemon" process per certificate. Every *.json file in the manifest directory describes
+# one certificate:
+#
+#   {
+#     "crt": "/etc/ssl/step.crt",           # required
+#     "key": "/etc/ssl/step.key",           # required
+#     "user": "root",                       # user to run step-cli as, default: root
+#     "steppath": "/root/.step",            # STEPPATH of that user, default: the step-cli default
+#     "expires_in": "8h",                   # renew once the certificate expires within this duration,
+#                                           # default: after 2/3 of its lifetime, like "step-cli ca renew --daemon"
+#     "reload": ["nginx"],                  # systemd units to reload after a renewal, default: none
+#     "step_cli": "/usr/bin/step-cli"       # step-cli executable for this certificate, default: --step-cli
+#   }
+#
+# The next renewal time of each certificate is kept in a min-heap, so the scheduler only wakes up when a certificate
+# is due or the manifest changes (SIGHUP or a modified manifest directory). Due certificates are renewed with
+# bounded parallelism, and the units of all certificates renewed in the same round are reloaded with a single
+# systemctl call. Only uses the python standard library.
+
+import argparse
+import base64
+import heapq
+import json
+import logging
+import os
+import pwd
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+LOG = logging.getLogger("step-renew-scheduler")
+
+DURATION_PART_RE = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h)")
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1.0, "m": 60.0, "h": 3600.0}
+PEM_CERT_RE = re.compile(rb"-----BEGIN CERTIFICATE-----\s+(.+?)\s+-----END CERTIFICATE-----", re.DOTALL)
+
+# How often the manifest directory is checked for changes, in seconds
+MANIFEST_POLL_INTERVAL = 60
+# Retry delays for failed renewals, in seconds
+RETRY_MIN = 30
+RETRY_MAX = 3600
+
+
+def parse_duration(value: str) -> float:
+    """Parse a Go-style duration (e.g. "1h30m") into seconds"""
+    parts = DURATION_PART_RE.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        raise ValueError(f"Invalid duration: {value}")
+    return sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+
+
+def _der_element(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """Return the tag, content offset and content end of the DER element at offset"""
+    tag = data[offset]
+    length = data[offset + 1]
+    start = offset + 2
+    if length & 0x80:
+        num = length & 0x7F
+        length = int.from_bytes(data[start:start + num], "big")
+        start += num
+    return tag, start, start + length
+
+
+def _der_time(data: bytes, offset: int) -> Tuple[datetime, int]:
+    tag, start, end = _der_element(data, offset)
+    value = data[start:end].decode("ascii")
+    fmt = "%y%m%d%H%M%SZ" if tag == 0x17 else "%Y%m%d%H%M%SZ"
+    return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc), end
+
+
+def certificate_validity(path: str) -> Tuple[float, float]:
+    """Return the notBefore and notAfter timestamps of the first certificate in a PEM or DER file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    match = PEM_CERT_RE.search(data)
+    der = base64.b64decode(b"".join(match.group(1).split())) if match else data
+    # Certificate SEQUENCE -> tbsCertificate SEQUENCE
+    _, cert_start, _ = _der_element(der, 0)
+    _, offset, _ = _der_element(der, cert_start)
+    if der[offset] == 0xA0:  # explicit version
+        offset = _der_element(der, offset)[2]
+    for _ in range(3):  # serialNumber, signature, issuer
+        offset = _der_element(der, offset)[2]
+    _, validity_start, _ = _der_element(der, offset)
+    not_before, offset = _der_time(der, validity_start)
+    not_after, _ = _der_time(der, offset)
+    return not_before.timestamp(), not_after.timestamp()
+
+
+class Entry:
+    """A certificate registered in the manifest"""
+
+    def __init__(self, name: str, data: Dict[str, Any]) -> None:
+        self.name = name
+        self.crt = str(data["crt"])
+        self.key = str(data["key"])
+        self.user = str(data.get("user") or "root")
+        self.steppath = data.get("steppath") or None
+        self.expires_in = parse_duration(data["expires_in"]) if data.get("expires_in") else None
+        self.reload = [str(unit) for unit in data.get("reload") or []]
+        self.step_cli = data.get("step_cli") or None
+        self.failures = 0
+
+    def identity(self) -> Tuple[Any, ...]:
+        return (self.crt, self.key, self.user, self.steppath, self.expires_in, tuple(self.reload), self.step_cli)
+
+    def due(self) -> float:
+        """Return the time at which the certificate should be renewed next"""
+        not_before, not_after = certificate_validity(self.crt)
+        if self.expires_in is not None:
+            return not_after - self.expires_in
+        return not_before + (not_after - not_before) * 2 / 3
+
+
+def load_manifest(directory: Path) -> Dict[str, Entry]:
+    entries = {}
+    for path in sorted(directory.glob("*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries[path.stem] = Entry(path.stem, json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            LOG.error("Ignoring invalid manifest entry %s: %s", path, e)
+    return entries
+
+
+def manifest_signature(directory: Path) -> Tuple[Any, ...]:
+    """Identify the current state of the manifest directory, to detect changes without reading every entry"""
+    try:
+        return tuple(sorted((p.name, p.stat().st_mtime_ns, p.stat().st_size) for p in directory.glob("*.json")))
+    except OSError:
+        return ()
+
+
+class Scheduler:
+    def __init__(self, manifest_dir: Path, step_cli: str, systemctl: str, parallelism: int) -> None:
+        self.manifest_dir = manifest_dir
+        self.step_cli = step_cli
+        self.systemctl = systemctl
+        self.parallelism = parallelism
+        self.entries: Dict[str, Entry] = {}
+        self.heap: List[Tuple[float, str]] = []
+        self.signature: Tuple[Any, ...] = ()
+        self.wakeup = threading.Event()
+        self.reload_requested = True
+        self.stopped = False
+
+    def reload_manifest(self) -> None:
+        self.signature = manifest_signature(self.manifest_dir)
+        entries = load_manifest(self.manifest_dir)
+        scheduled = {name: due for due, name in self.heap}
+        self.heap = []
+        for name, entry in entries.items():
+            previous = self.entries.get(name)
+            # Unchanged entries that are waiting for a retry keep their backoff
+            if previous and previous.failures and previous.identity() == entry.identity() and name in scheduled:
+                entry.failures = previous.failures
+                heapq.heappush(self.heap, (scheduled[name], name))
+            else:
+                self.schedule(entry)
+        self.entries = entries
+        LOG.info("Loaded %d certificates from %s", len(entries), self.manifest_dir)
+
+    def schedule(self, entry: Entry, retry: bool = False, renewed: bool = False) -> None:
+        due = time.time()
+        if not retry:
+            try:
+                due = entry.due()
+            except (OSError, ValueError, IndexError) as e:
+                # The certificate is missing or unreadable, try to obtain a new one right away
+                LOG.warning("Could not read %s: %s", entry.crt, e)
+            if renewed and due <= time.time():
+                # expires_in exceeds the lifetime of the renewed certificate, don't renew it in a loop
+                LOG.warning("%s is still due after its renewal, check its expires_in", entry.crt)
+                retry = True
+        if retry:
+            due = time.time() + min(RETRY_MAX, RETRY_MIN * 2 ** entry.failures)
+            entry.failures += 1
+        heapq.heappush(self.heap, (due, entry.name))
+
+    def renew(self, entry: Entry) -> bool:
+        cmd = [entry.step_cli or self.step_cli, "ca", "renew", entry.crt, entry.key, "--force"]
+        env = dict(os.environ)
+        if entry.steppath:
+            env["STEPPATH"] = entry.steppath
+        kwargs: Dict[str, Any] = {}
+        try:
+            if entry.user != "root" and os.geteuid() == 0:
+                pw = pwd.getpwnam(entry.user)
+                env["HOME"] = pw.pw_dir
+                kwargs.update(user=pw.pw_uid, group=pw.pw_gid, extra_groups=[])
+            res = subprocess.run(cmd, env=env, capture_output=True, text=True, check=False, **kwargs)
+        except (OSError, KeyError) as e:
+            LOG.error("Could not renew %s: %s", entry.crt, e)
+            return False
+        if res.returncode != 0:
+            LOG.error("Could not renew %s: %s", entry.crt, res.stderr.strip())
+            return False
+        LOG.info("Renewed %s", entry.crt)
+        return True
+
+    def reload_units(self, units: Set[str]) -> None:
+        if not units:
+            return
+        cmd = [self.systemctl, "try-reload-or-restart"] + sorted(units)
+        res = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        if res.returncode != 0:
+            LOG.error("Could not reload %s: %s", " ".join(sorted(units)), res.stderr.strip())
+        else:
+            LOG.info("Reloaded %s", " ".join(sorted(units)))
+
+    def pop_due(self, now: float) -> List[Entry]:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, name = heapq.heappop(self.heap)
+            if name in self.entries:
+                due.append(self.entries[name])
+        return due
+
+    def run_due(self, pool: ThreadPoolExecutor) -> None:
+        """Renew all certificates that are due, then reload the units of all renewed certificates at once"""
+        due = self.pop_due(time.time())
+        if not due:
+            return
+        results = list(pool.map(self.renew, due))
+        units: Set[str] = set()
+        for entry, renewed in zip(due, results):
+            if renewed:
+                entry.failures = 0
+                units.update(entry.reload)
+            self.schedule(entry, retry=not renewed, renewed=renewed)
+        self.reload_units(units)
+
+    def run(self, once: bool = False) -> None:
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            while not self.stopped:
+                if self.reload_requested or manifest_signature(self.manifest_dir) != self.signature:
+                    self.reload_requested = False
+                    self.reload_manifest()
+                self.run_due(pool)
+                if once:
+                    return
+                timeout = MANIFEST_POLL_INTERVAL
+                if self.heap:
+                    timeout = min(timeout, max(0.0, self.heap[0][0] - time.time()))
+                self.wakeup.wait(timeout)
+                self.wakeup.clear()
+
+    def request_reload(self, *_: Any) -> None:
+        self.reload_requested = True
+        self.wakeup.set()
+
+    def stop(self, *_: Any) -> None:
+        self.stopped = True
+        self.wakeup.set()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Renew all certificates in a manifest directory")
+    parser.add_argument("--manifest-dir", type=Path, default=Path("/etc/step-renew.d"))
+    parser.add_argument("--step-cli", default="step-cli", help="step-cli executable")
+    parser.add_argument("--systemctl", default="systemctl", help="systemctl executable")
+    parser.add_argument("--parallelism", type=int, default=4, help="maximum number of concurrent renewals")
+    parser.add_argument("--once", action="store_true", help="renew all due certificates once, then exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s", stream=sys.stdout)
+    scheduler = Scheduler(args.manifest_dir, args.step_cli, args.systemctl, max(1, args.parallelism))
+    signal.signal(signal.SIGHUP, scheduler.request_reload)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run(once=args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import importlib.metadata
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+WARMUP_ROUNDS = 2
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmarks" in item.nodeid.split("/"):
+            item.add_marker(skip)
+
+
+class BenchmarkRecorder:
+    """Measures callables and collects the results of all benchmarks in a session"""
+
+    def __init__(self, rounds: int) -> None:
+        self.rounds = rounds
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def measure(self, name: str, func: Callable[[], Any], rounds: int = 0) -> Dict[str, Any]:
+        rounds = rounds or self.rounds
+        for _ in range(WARMUP_ROUNDS):
+            func()
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        result = {
+            "rounds": rounds,
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.mean(samples),
+            "max": max(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        }
+        self.results[name] = result
+        return result
+
+    def write(self, path: Path) -> None:
+        try:
+            commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        data = {
+            "meta": {
+                "commit": commit,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "ansible_core": importlib.metadata.version("ansible-core"),
+                "platform": platform.platform(),
+            },
+            "benchmarks": dict(sorted(self.results.items())),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+@pytest.fixture(scope="session")
+def benchmark(request) -> Generator[BenchmarkRecorder, None, None]:
+    recorder = BenchmarkRecorder(request.config.getoption("--benchmark-rounds"))
+    yield recorder
+    if recorder.results:
+        recorder.write(Path(request.config.getoption("--benchmark-output")))
@@ -0,0 +1,226 @@
+# pylint: disable=redefined-outer-name
+# Offline benchmarks for the module hot paths. Run with: uv run pytest tests/benchmarks --benchmark
+# Results are written to benchmark-results.json, compare two runs with scripts/compare-benchmarks
+# Behavior is tested in tests/unit, the benchmarks only take measurements.
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import json
+import os
+import pwd
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+MODULE_ARGSPEC = dict(
+    name=dict(type="str", required=True),
+    provisioner=dict(type="str"),
+    provisioner_password=dict(type="str", no_log=True),
+    san=dict(type="list", elements="str"),
+    force=dict(type="bool"),
+    step_cli_executable=dict(type="path", default="step-cli"),
+)
+
+
+@pytest.fixture()
+def module_factory():
+    # pylint: disable=import-outside-toplevel
+    from ansible.module_utils.basic import AnsibleModule
+    from ansible.module_utils.testing import patch_module_args
+
+    def factory(args, argument_spec=None):
+        with patch_module_args(args):
+            return AnsibleModule(argument_spec=argument_spec or MODULE_ARGSPEC, supports_check_mode=True)
+    return factory
+
+
+@pytest.mark.usefixtures("step_env")
+def test_phase_argspec(benchmark, module_factory):
+    args = {"name": "bench", "provisioner_password": "secret", "san": ["a", "b", "c"]}
+    benchmark.measure("phase.argspec", lambda: module_factory(args))
+
+
+@pytest.mark.usefixtures("step_env")
+def test_phase_arg_build(benchmark, module_factory, utils):
+    cli_wrapper = utils("cli_wrapper")
+    secret_files = utils("secret_files")
+    module = module_factory({"name": "bench", "provisioner": "admin", "provisioner_password": "secret",
+                             "san": ["a", "b", "c"], "force": True})
+    args = cli_wrapper.CliCommandArgs(
+        ["ca", "token"], {"name": "--name", "provisioner": "--provisioner", "san": "--san", "force": "--force"},
+        {"provisioner_password": "--provisioner-password-file"}
+    )
+
+    def build():
+        with secret_files.SecretFiles() as secrets:
+            args.build(module, secrets)
+    benchmark.measure("phase.arg_build", build)
+
+
+@pytest.mark.usefixtures("step_env")
+def test_phase_secret_files(benchmark, utils):
+    secret_files = utils("secret_files")
+
+    def write_secret():
+        with secret_files.SecretFiles() as secrets:
+            secrets.add("password", "secret")
+    benchmark.measure("phase.secret_files", write_secret)
+
+
+@pytest.mark.usefixtures("step_env")
+def test_phase_probe(benchmark, module_factory, utils, fake_step_cli, monkeypatch):
+    cli_wrapper = utils("cli_wrapper")
+    module = module_factory({"name": "bench"})
+    benchmark.measure("phase.probe.cached", lambda: cli_wrapper.StepCliExecutable(module, fake_step_cli))
+    monkeypatch.setenv("SMALLSTEP_ANSIBLE_CACHE_DIR", "")
+    benchmark.measure("phase.probe.uncached", lambda: cli_wrapper.StepCliExecutable(module, fake_step_cli))
+
+
+@pytest.mark.usefixtures("step_env")
+def test_phase_subprocess(benchmark, module_factory, utils, fake_step_cli, monkeypatch):
+    cli_wrapper = utils("cli_wrapper")
+    module = module_factory({"name": "bench"})
+    executable = cli_wrapper.StepCliExecutable(module, fake_step_cli)
+    command = cli_wrapper.CliCommand(executable, cli_wrapper.CliCommandArgs(["ca", "token"]))
+    benchmark.measure("phase.subprocess.single", lambda: command.run(module))
+    batch = cli_wrapper.CliCommandBatch([command] * 4)
+    benchmark.measure("phase.subprocess.batch4", lambda: batch.run(module))
+    # with latency (e.g. a remote CA), batched commands overlap even on a single CPU
+    monkeypatch.setenv("FAKE_STEP_CLI_LATENCY", "0.05")
+    benchmark.measure("phase.subprocess.single.latency50ms", lambda: command.run(module), rounds=5)
+    benchmark.measure("phase.subprocess.batch4.latency50ms", lambda: batch.run(module), rounds=5)
+
+
+@pytest.mark.usefixtures("step_env")
+def test_phase_json_parse(benchmark, module_factory, utils):
+    cli_wrapper = utils("cli_wrapper")
+    helpers = utils("helpers")
+    module = module_factory({"name": "bench"})
+    bundle = [{"names": [f"host{i}.example.com" for i in range(50)], "serial_number": str(i),
+               "validity": {"start": "2020-01-01T00:00:00Z", "end": "2099-01-01T00:00:00Z"}} for i in range(10)]
+    res = cli_wrapper.CliCommandResult(0, json.dumps(bundle), "")
+    # pylint: disable=protected-access
+    benchmark.measure("phase.json_parse", lambda: helpers._parse_inspect_result(module, res))
+
+
+@pytest.mark.usefixtures("step_env")
+def test_module_step_ca_token(benchmark, run_module, fake_step_cli):
+    args = {"name": "bench", "provisioner_password": "secret", "step_cli_executable": fake_step_cli}
+    benchmark.measure("module.step_ca_token", lambda: run_module("step_ca_token", args))
+
+
+def test_module_step_certificate_info(benchmark, run_module, fake_step_cli, certificate, monkeypatch):
+    args = {"path": certificate.as_posix(), "step_cli_executable": fake_step_cli}
+    benchmark.measure("module.step_certificate_info.cached", lambda: run_module("step_certificate_info", args))
+    monkeypatch.setenv("SMALLSTEP_ANSIBLE_CACHE_DIR", "")
+    benchmark.measure("module.step_certificate_info.uncached", lambda: run_module("step_certificate_info", args))
+    monkeypatch.setenv("FAKE_STEP_CLI_LATENCY", "0.05")
+    benchmark.measure("module.step_certificate_info.uncached.latency50ms",
+                      lambda: run_module("step_certificate_info", args), rounds=5)
+
+
+def test_module_step_ca_certificate(benchmark, run_module, fake_step_cli, certificate, monkeypatch):
+    args = {"name": "bench.example.com", "crt_file": certificate.as_posix(),
+            "key_file": certificate.with_suffix(".key").as_posix(), "step_cli_executable": fake_step_cli}
+    stamp = certificate.with_name(f".{certificate.name}.stamp")
+    benchmark.measure("module.step_ca_certificate.unchanged.stamped",
+                      lambda: run_module("step_ca_certificate", args))
+
+    def run_unstamped():
+        stamp.unlink(missing_ok=True)
+        return run_module("step_ca_certificate", args)
+    benchmark.measure("module.step_ca_certificate.unchanged.cached", run_unstamped)
+    monkeypatch.setenv("SMALLSTEP_ANSIBLE_CACHE_DIR", "")
+    benchmark.measure("module.step_ca_certificate.unchanged.uncached", run_unstamped)
+
+
+def test_phase_keypool(benchmark, utils, tmp_path):
+    keypool = utils("keypool")
+    spec = keypool.KeySpec.from_params("RSA", 4096, None)
+    pool = keypool.KeyPool(tmp_path / "keypool")
+    pool.add(spec, [keypool.generate_key(spec)])
+    benchmark.measure("phase.keypool.take", lambda: pool.add(spec, [pool.take(spec)]))
+    benchmark.measure("phase.keypool.generate_rsa4096", lambda: keypool.generate_key(spec), rounds=3)
+
+
+def test_phase_local_key(benchmark, utils):
+    keypool = utils("keypool")
+    specs = [keypool.KeySpec.from_params("RSA", 2048, None)] * 4
+    benchmark.measure("phase.local_key.sequential", lambda: [keypool.generate_key(spec) for spec in specs], rounds=3)
+    with keypool.KeyGenerator(len(specs)) as generator, ThreadPoolExecutor(len(specs)) as threads:
+        benchmark.measure("phase.local_key.key_generator",
+                          lambda: list(threads.map(generator.generate, specs)), rounds=3)
+
+
+def test_phase_ca_api(benchmark, utils, fake_admin_api):
+    ca_api = utils("ca_api")
+    provisioner = utils("provisioner")
+    client = ca_api.CaClient(fake_admin_api.url, fake_admin_api.root.as_posix())
+    for i in range(1000):
+        name = f"bench-{i:04}"
+        fake_admin_api.provisioners[name] = {
+            "type": "ACME", "name": name, "details": {"ACME": {}}, "claims": {"x509": {"enabled": True}}}
+    benchmark.measure("phase.ca_api.find.first_page", lambda: client.find_provisioner("bench-0042"))
+    benchmark.measure("phase.ca_api.find.last_page", lambda: client.find_provisioner("bench-0999"), rounds=5)
+    benchmark.measure("phase.ca_api.index", lambda: provisioner.index_provisioners(
+        client.iter_provisioners(), ["bench-0500"], complete=True), rounds=5)
+    client.close()
+
+
+def test_phase_verify_root(benchmark, utils, fake_admin_api):
+    ca_api = utils("ca_api")
+    root = fake_admin_api.root.read_bytes()
+    benchmark.measure("phase.ca_api.verify_root", lambda: ca_api.verify_root(root, fake_admin_api.root_fingerprint))
+
+
+def test_phase_verify_chain(benchmark, utils, fake_admin_api):
+    engine = utils("x509")
+    chain, roots = fake_admin_api.admin_cert.as_posix(), fake_admin_api.root.as_posix()
+    benchmark.measure("phase.x509.verify_chain", lambda: engine.verify(chain, roots))
+
+
+@pytest.mark.usefixtures("step_env")
+def test_module_step_ca_provisioners_admin_api(benchmark, run_module, fake_step_cli, fake_admin_api):
+    args = {
+        "admin_cert": fake_admin_api.admin_cert.as_posix(), "admin_key": fake_admin_api.admin_key.as_posix(),
+        "ca_url": fake_admin_api.url, "root": fake_admin_api.root.as_posix(), "step_cli_executable": fake_step_cli,
+        "provisioners": [{"name": f"bench-{i}", "type": "ACME", "force_cn": True} for i in range(10)],
+    }
+    run_module("step_ca_provisioners", args)
+    benchmark.measure("module.step_ca_provisioners.admin_api.unchanged",
+                      lambda: run_module("step_ca_provisioners", args))
+
+
+def test_module_step_ca_bootstrap_users(benchmark, run_module, fake_step_cli, fake_admin_api, step_env):
+    user = pwd.getpwuid(os.getuid()).pw_name
+    args = {
+        "ca_url": fake_admin_api.url, "fingerprint": fake_admin_api.root_fingerprint,
+        "step_cli_executable": fake_step_cli,
+        "users": [{"user": user, "steppath": (step_env / f"user-{i}").as_posix()} for i in range(5)],
+    }
+    run_module("step_ca_bootstrap", args)
+    benchmark.measure("module.step_ca_bootstrap.users.unchanged", lambda: run_module("step_ca_bootstrap", args))
+
+
+def test_phase_renewal_window(benchmark, utils):
+    renewal_window = utils("renewal_window")
+    seeds = [renewal_window.renewal_seed(f"host-{i}.example.com", "/etc/ssl/step.crt") for i in range(1000)]
+    benchmark.measure("phase.renewal_window.plan_1000", lambda: [
+        renewal_window.plan_renewal(seed, "8h", "1h") for seed in seeds])
+
+
+def test_renewal_scheduler(benchmark, fake_step_cli, certificate, step_env):
+    path = REPO_ROOT / "roles" / "step_acme_cert" / "files" / "step-renew-scheduler.py"
+    spec = importlib.util.spec_from_file_location("step_renew_scheduler", path)
+    scheduler_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(scheduler_module)
+
+    manifest = step_env / "step-renew.d"
+    manifest.mkdir()
+    user = pwd.getpwuid(os.getuid()).pw_name
+    for i in range(100):
+        entry = {"crt": certificate.as_posix(), "key": certificate.with_suffix(".key").as_posix(), "user": user,
+                 "expires_in": None, "reload": ["nginx"]}
+        (manifest / f"cert-{i}.json").write_text(json.dumps(entry))
+    scheduler = scheduler_module.Scheduler(manifest, fake_step_cli, fake_step_cli, 4)
+    benchmark.measure("scheduler.manifest.load", scheduler.reload_manifest)
@@ -1,9 +1,15 @@
+import contextlib
+import datetime
 import importlib
 import importlib.metadata
+import io
+import json
 import os
 import subprocess
+import sys
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, Generator
 
 import pytest
 import yaml
@@ -13,8 +19,12 @@ NODE_PYTHON_DEFAULT_VERSION = "3.9"
 STEP_CLI_DEFAULT_VERSION = "latest"
 STEP_CA_DEFAULT_VERSION = "latest"
 
-with open("galaxy.yml", encoding="utf-8") as f:
+REPO_ROOT = Path(__file__).parent.parent.resolve()
+FAKE_STEP_CLI = Path(__file__).parent / "unit" / "fake_step_cli.py"
+
+with open(REPO_ROOT / "galaxy.yml", encoding="utf-8") as f:
     GALAXY_YML = yaml.safe_load(f)
+COLLECTION_PACKAGE = f"ansible_collections.{GALAXY_YML['namespace']}.{GALAXY_YML['name']}"
 
 
 @dataclass
@@ -105,6 +115,103 @@ def test_options(request) -> TestOptions:
     )
 
 
+# Offline fixtures, used by the unit tests and benchmarks. They run modules in-process against
+# the fakes in tests/unit and need neither Docker nor network access.
+@pytest.fixture(scope="session")
+def collection(tmp_path_factory) -> str:
+    """Make the collection importable as ansible_collections.<namespace>.<name> and return the package name"""
+    root = tmp_path_factory.mktemp("collections")
+    namespace_dir = root / "ansible_collections" / GALAXY_YML["namespace"]
+    namespace_dir.mkdir(parents=True)
+    (namespace_dir / GALAXY_YML["name"]).symlink_to(REPO_ROOT, target_is_directory=True)
+    sys.path.insert(0, root.as_posix())
+    return COLLECTION_PACKAGE
+
+
+@pytest.fixture()
+# pylint: disable=redefined-outer-name
+def utils(collection) -> Callable[[str], Any]:
+    """Import a module_utils module of the collection by name"""
+    return lambda name: importlib.import_module(f"{collection}.plugins.module_utils.{name}")
+
+
+@pytest.fixture()
+def step_env(tmp_path, monkeypatch) -> Path:
+    """Isolated STEPPATH and cache directory, with the fake step-cli configured to respond instantly"""
+    monkeypatch.setenv("STEPPATH", (tmp_path / "step").as_posix())
+    monkeypatch.setenv("SMALLSTEP_ANSIBLE_CACHE_DIR", (tmp_path / "cache").as_posix())
+    monkeypatch.setenv("FAKE_STEP_CLI_LATENCY", "0")
+    monkeypatch.delenv("FAKE_STEP_CLI_RESPONSES", raising=False)
+    monkeypatch.delenv("SMALLSTEP_ANSIBLE_TIMINGS", raising=False)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def fake_step_cli() -> str:
+    return FAKE_STEP_CLI.as_posix()
+
+
+@pytest.fixture()
+def fake_admin_api(tmp_path) -> Generator[Any, None, None]:
+    """A running stand-in for the step-ca admin API, see unit/fake_admin_api.py"""
+    pytest.importorskip("cryptography")
+    from .unit.fake_admin_api import FakeAdminApi  # pylint: disable=import-outside-toplevel
+    with FakeAdminApi(tmp_path) as api:
+        yield api
+
+
+@pytest.fixture()
+# pylint: disable=redefined-outer-name
+def certificate(step_env) -> Path:
+    """A self-signed certificate that is also installed as the STEPPATH root"""
+    pytest.importorskip("cryptography")
+    # pylint: disable=import-outside-toplevel
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "bench.example.com")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(1).not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=365))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("bench.example.com")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    pem = cert.public_bytes(serialization.Encoding.PEM)
+    crt_file = step_env / "bench.crt"
+    key_file = step_env / "bench.key"
+    crt_file.write_bytes(pem)
+    key_file.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    (step_env / "step" / "certs").mkdir(parents=True)
+    (step_env / "step" / "certs" / "root_ca.crt").write_bytes(pem)
+    return crt_file
+
+
+@pytest.fixture(scope="session")
+# pylint: disable=redefined-outer-name
+def run_module(collection) -> Callable[[str, Dict[str, Any]], Dict[str, Any]]:
+    """Run a module in-process and return its result"""
+    # pylint: disable=import-outside-toplevel
+    from ansible.module_utils.testing import patch_module_args
+
+    def run(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        module = importlib.import_module(f"{collection}.plugins.modules.{name}")
+        stdout = io.StringIO()
+        with patch_module_args(args), contextlib.redirect_stdout(stdout):
+            try:
+                module.main()
+            except SystemExit:
+                pass
+        result = json.loads(stdout.getvalue())
+        assert not result.get("failed"), result.get("msg")
+        return result
+    return run
+
+
 def get_ansible_version():
     base_version = version.parse(importlib.metadata.version("ansible-core"))
     return f"{base_version.major}.{base_version.minor}"
@@ -130,3 +237,9 @@ def pytest_addoption(parser):
     parser.addoption("--step-ca-version", action="store", default=STEP_CA_DEFAULT_VERSION,
                      help="Version of step-ca to use for tests, "
                      f"either '{STEP_CA_DEFAULT_VERSION}' (default) or a version ('0.24.0')")
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="Run the offline benchmark suite in tests/benchmarks (skipped by default)")
+    parser.addoption("--benchmark-output", action="store", default="benchmark-results.json",
+                     help="File to write the benchmark results to. Default: 'benchmark-results.json'")
+    parser.addoption("--benchmark-rounds", action="store", type=int, default=20,
+                     help="Number of measured rounds per benchmark. Default: 20")
@@ -0,0 +1,252 @@
+# Stand-in for the step-ca admin API, for the offline unit tests and benchmarks of the CA and admin API clients.
+# Serves the root certificate and the paginated public provisioner list as well as the admin provisioner
+# endpoints over HTTPS with keep-alive, and verifies admin tokens like step-ca:
+# the x5c certificate must be issued by the root, the token signature must match, the audience
+# must be the requested endpoint and every token ID (jti) is only accepted once. Provisioners are stored in memory.
+import base64
+import datetime
+import hashlib
+import json
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+ADMIN_PROVISIONER = "admin"
+ADMIN_SUBJECT = "step"
+STEP_PROVISIONER_OID = x509.ObjectIdentifier("1.3.6.1.4.1.37476.9000.64.1")
+# linkedca details keys that differ from the provisioner type in ca.json
+CA_JSON_TYPES = {"K8sSA": "K8SSA"}
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _der_octet_string(data: bytes) -> bytes:
+    return bytes([0x04, len(data)]) + data
+
+
+def _provisioner_extension(name: str) -> x509.UnrecognizedExtension:
+    # SEQUENCE { type INTEGER (1 = JWK), name OCTET STRING, credentialID OCTET STRING }
+    content = bytes([0x02, 0x01, 0x01]) + _der_octet_string(name.encode()) + _der_octet_string(b"")
+    return x509.UnrecognizedExtension(STEP_PROVISIONER_OID, bytes([0x30, len(content)]) + content)
+
+
+def _certificate(subject: str, key, issuer_name: Optional[x509.Name] = None, issuer_key=None,
+                 ca: bool = False, extensions: Optional[List[Any]] = None) -> x509.Certificate:
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, subject)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(issuer_name or name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number()).not_valid_before(now - datetime.timedelta(hours=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+    )
+    for ext in extensions or []:
+        builder = builder.add_extension(ext, critical=False)
+    return builder.sign(issuer_key or key, hashes.SHA256())
+
+
+def _pem(cert: x509.Certificate) -> bytes:
+    return cert.public_bytes(serialization.Encoding.PEM)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeAdminApi:
+    """A running admin API stand-in, with the files needed to connect to it as an admin"""
+
+    def __init__(self, directory: Path, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.provisioners: Dict[str, Dict[str, Any]] = {}
+        self.connections = 0
+        self.tokens: List[str] = []
+        self.requests: List[str] = []
+        self._used_token_ids: Set[str] = set()
+        self._lock = threading.Lock()
+
+        root_key = ec.generate_private_key(ec.SECP256R1())
+        self._root = _certificate("Fake Root CA", root_key, ca=True)
+        server_key = ec.generate_private_key(ec.SECP256R1())
+        server_cert = _certificate("localhost", server_key, self._root.subject, root_key, extensions=[
+            x509.SubjectAlternativeName([x509.DNSName("localhost")])])
+        admin_key = ec.generate_private_key(ec.SECP256R1())
+        admin_cert = _certificate(ADMIN_SUBJECT, admin_key, self._root.subject, root_key,
+                                  extensions=[_provisioner_extension(ADMIN_PROVISIONER)])
+
+        self.root = directory / "root_ca.crt"
+        self.root.write_bytes(_pem(self._root))
+        self.root_fingerprint = hashlib.sha256(self._root.public_bytes(serialization.Encoding.DER)).hexdigest()
+        self.admin_cert = directory / "admin.crt"
+        self.admin_cert.write_bytes(_pem(admin_cert))
+        self.admin_key = directory / "admin.key"
+        self.admin_key.write_bytes(admin_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        server_pem = directory / "server.pem"
+        server_pem.write_bytes(_pem(server_cert) + server_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(server_pem)
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self.url = f"https://localhost:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeAdminApi":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.connections = 0
+            self.tokens.clear()
+            self.requests.clear()
+
+    def verify_token(self, token: str, audience: str) -> Optional[str]:
+        """Return an error message if the token is not valid for the audience"""
+        try:
+            header_b64, claims_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64url_decode(header_b64))
+            claims = json.loads(_b64url_decode(claims_b64))
+            leaf = x509.load_der_x509_certificate(base64.b64decode(header["x5c"][0]))
+            self._root.public_key().verify(leaf.signature, leaf.tbs_certificate_bytes,
+                                           ec.ECDSA(leaf.signature_hash_algorithm))
+            signature = _b64url_decode(signature_b64)
+            r, s = int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big")
+            leaf.public_key().verify(encode_dss_signature(r, s), f"{header_b64}.{claims_b64}".encode(),
+                                     ec.ECDSA(hashes.SHA256()))
+        except (ValueError, KeyError, IndexError, InvalidSignature) as e:
+            return f"invalid token: {e!r}"
+        if claims.get("aud") != audience:
+            return f"invalid audience {claims.get('aud')}, expected {audience}"
+        if claims.get("iss") != ADMIN_PROVISIONER or claims.get("sub") != ADMIN_SUBJECT:
+            return "invalid issuer or subject"
+        if not claims.get("nbf", 0) - 60 <= time.time() <= claims.get("exp", 0) + 60:
+            return "token expired"
+        with self._lock:
+            if not claims.get("jti") or claims["jti"] in self._used_token_ids:
+                return "token already used"
+            self._used_token_ids.add(claims["jti"])
+        return None
+
+    def _list(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        names = sorted(self.provisioners)
+        start = int(query.get("cursor", ["0"])[0] or 0)
+        limit = int(query.get("limit", ["20"])[0] or 20)
+        page = []
+        for name in names[start:start + limit]:
+            p = self.provisioners[name]
+            details_key = next(iter(p.get("details") or {}), "")
+            entry = {"type": CA_JSON_TYPES.get(details_key, details_key), "name": name}
+            if p.get("claims"):
+                entry["claims"] = p["claims"]
+            page.append(entry)
+        next_cursor = str(start + limit) if start + limit < len(names) else ""
+        return {"provisioners": page, "nextCursor": next_cursor}
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                with api._lock:  # pylint: disable=protected-access
+                    api.connections += 1
+
+            def log_message(self, *args: Any) -> None:  # pylint: disable=arguments-differ
+                pass
+
+            def _send(self, status: int, body: Any) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                url = urlsplit(self.path)
+                with api._lock:  # pylint: disable=protected-access
+                    api.requests.append(f"{method} {url.path}")
+                if api.latency:
+                    time.sleep(api.latency)
+                # the public endpoints need no authentication
+                if method == "GET" and url.path == "/provisioners":
+                    self._send(200, api._list(parse_qs(url.query)))  # pylint: disable=protected-access
+                    return
+                if method == "GET" and url.path.startswith("/root/"):
+                    if url.path == f"/root/{api.root_fingerprint}":
+                        self._send(200, {"ca": _pem(api._root).decode()})  # pylint: disable=protected-access
+                    else:
+                        self._send(404, {"message": "root not found"})
+                    return
+
+                token = self.headers.get("Authorization", "")
+                error = api.verify_token(token, f"{api.url}{url.path}")
+                with api._lock:  # pylint: disable=protected-access
+                    api.tokens.append(token)
+                if error:
+                    self._send(401, {"message": error})
+                    return
+
+                parts = url.path.strip("/").split("/")
+                if parts[:2] != ["admin", "provisioners"] or len(parts) > 3:
+                    self._send(404, {"message": "not found"})
+                    return
+                name = unquote(parts[2]) if len(parts) == 3 else None
+                if method == "GET" and name is None:
+                    self._send(200, api._list(parse_qs(url.query)))  # pylint: disable=protected-access
+                elif method == "POST" and name is None:
+                    if body["name"] in api.provisioners:
+                        self._send(409, {"message": f"provisioner {body['name']} already exists"})
+                    else:
+                        api.provisioners[body["name"]] = body
+                        self._send(201, body)
+                elif name not in api.provisioners:
+                    self._send(404, {"message": f"provisioner {name} not found"})
+                elif method == "GET":
+                    self._send(200, api.provisioners[name])
+                elif method == "PUT":
+                    api.provisioners[name] = body
+                    self._send(200, body)
+                elif method == "DELETE":
+                    del api.provisioners[name]
+                    self._send(200, {"status": "ok"})
+                else:
+                    self._send(405, {"message": "method not allowed"})
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                self._handle("GET")
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                self._handle("POST")
+
+            def do_PUT(self) -> None:  # pylint: disable=invalid-name
+                self._handle("PUT")
+
+            def do_DELETE(self) -> None:  # pylint: disable=invalid-name
+                self._handle("DELETE")
+
+        return Handler
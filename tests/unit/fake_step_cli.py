@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Deterministic stand-in for step-cli, used by the unit tests and benchmarks.
+#
+# Behavior is controlled through environment variables:
+# - FAKE_STEP_CLI_LATENCY: seconds to sleep before every response (default: 0)
+# - FAKE_STEP_CLI_RESPONSES: path to a JSON file mapping subcommands (e.g. "certificate inspect") to
+#   {"rc": int, "stdout": str, "stderr": str}. Entries override the defaults below,
+#   the longest matching subcommand wins.
+# - FAKE_STEP_CLI_LOG: if set, every invocation is appended to this file (one line per call)
+# - FAKE_STEP_CLI_CERT: if set, "ca sign" writes a copy of this certificate to its output path
+
+import json
+import os
+import sys
+import time
+
+VERSION = "Smallstep CLI/0.28.2 (linux/amd64)\nRelease Date: 2025-01-01 00:00 UTC"
+
+DEFAULT_RESPONSES = {
+    "version": {"stdout": VERSION},
+    "certificate inspect": {"stdout": json.dumps({
+        "version": 3,
+        "serial_number": "1",
+        "names": ["bench.example.com"],
+        "validity": {"start": "2020-01-01T00:00:00Z", "end": "2099-01-01T00:00:00Z"},
+        "subject_key_info": {"key_algorithm": {"name": "ECDSA"}, "ecdsa_public_key": {"curve": "P-256"}},
+    })},
+    "certificate verify": {},
+    "ca token": {"stdout": "eyJhbGciOiJFUzI1NiJ9.e30.c2lnbmF0dXJl"},
+    "ca provisioner list": {"stdout": "[]"},
+}
+
+
+def subcommands(argv):
+    words = []
+    for arg in argv:
+        if arg.startswith("-"):
+            break
+        words.append(arg)
+    return [" ".join(words[:i]) for i in range(len(words), 0, -1)]
+
+
+def main():
+    argv = sys.argv[1:]
+    log = os.environ.get("FAKE_STEP_CLI_LOG")
+    if log:
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(" ".join(argv) + "\n")
+
+    responses = dict(DEFAULT_RESPONSES)
+    responses_file = os.environ.get("FAKE_STEP_CLI_RESPONSES")
+    if responses_file:
+        with open(responses_file, encoding="utf-8") as f:
+            responses.update(json.load(f))
+
+    latency = float(os.environ.get("FAKE_STEP_CLI_LATENCY", "0"))
+    if latency:
+        time.sleep(latency)
+
+    cert = os.environ.get("FAKE_STEP_CLI_CERT")
+    if cert and argv[:2] == ["ca", "sign"] and len(argv) > 3:
+        with open(cert, "rb") as src, open(argv[3], "wb") as dest:
+            dest.write(src.read())
+
+    response = next((responses[cmd] for cmd in subcommands(argv) if cmd in responses), {})
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    sys.exit(response.get("rc", 0))
+
+
+if __name__ == "__main__":
+    main()
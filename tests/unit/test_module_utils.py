@@ -0,0 +1,165 @@
+# Offline unit tests for module_utils, run as part of the default test suite
+import datetime
+import json
+import stat
+import threading
+import time
+
+import pytest
+
+
+def test_ca_api_pagination(utils, fake_admin_api):
+    ca_api = utils("ca_api")
+    provisioner = utils("provisioner")
+    client = ca_api.CaClient(fake_admin_api.url, fake_admin_api.root.as_posix())
+    for i in range(100):
+        name = f"test-{i:03}"
+        fake_admin_api.provisioners[name] = {
+            "type": "ACME", "name": name, "details": {"ACME": {}}, "claims": {"x509": {"enabled": True}}}
+    fake_admin_api.reset_stats()
+    assert client.find_provisioner("test-004")["name"] == "test-004"
+    # only the first page is retrieved if the provisioner is on it
+    assert fake_admin_api.requests == ["GET /provisioners"]
+    assert client.find_provisioner("test-099")["name"] == "test-099"
+    assert client.find_provisioner("missing") is None
+    index = provisioner.index_provisioners(client.iter_provisioners(), ["test-050"], complete=True)
+    assert len(index) == 100 and "claims" in index["test-050"] and "claims" not in index["test-051"]
+    # every request reuses the same connection
+    assert fake_admin_api.connections == 1
+    client.close()
+
+
+def test_ca_api_verify_root(utils, fake_admin_api):
+    ca_api = utils("ca_api")
+    root = fake_admin_api.root.read_bytes()
+    fingerprint = fake_admin_api.root_fingerprint
+    assert ca_api.verify_root(b"junk\n" + root + b"trailing junk", fingerprint) == root
+    # an extra certificate next to the genuine root must not end up in the trusted root file
+    for pem in (root + fake_admin_api.admin_cert.read_bytes(), fake_admin_api.admin_cert.read_bytes() + root):
+        with pytest.raises(ca_api.CaApiError, match="single root certificate"):
+            ca_api.verify_root(pem, fingerprint)
+    with pytest.raises(ca_api.CaApiError, match="does not match"):
+        ca_api.verify_root(fake_admin_api.admin_cert.read_bytes(), fingerprint)
+
+
+def test_x509_verify_chain_constraints(utils, tmp_path):
+    pytest.importorskip("cryptography")
+    # pylint: disable=import-outside-toplevel
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    engine = utils("x509")
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    def issue(subject, issuer=None, ca=False, path_length=None, key_usage=None):
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, subject)])
+        builder = (
+            x509.CertificateBuilder().subject_name(name).issuer_name(issuer[0].subject if issuer else name)
+            .public_key(key.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(hours=1)).not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.BasicConstraints(ca=ca, path_length=path_length), critical=True)
+        )
+        if key_usage:
+            builder = builder.add_extension(key_usage, critical=True)
+        return builder.sign(issuer[1] if issuer else key, hashes.SHA256()), key
+
+    def write(name, *certs):
+        path = tmp_path / name
+        path.write_bytes(b"".join(c[0].public_bytes(serialization.Encoding.PEM) for c in certs))
+        return path.as_posix()
+
+    root = issue("root", ca=True)
+    roots = write("root.crt", root)
+    intermediate = issue("intermediate", root, ca=True, path_length=0)
+    leaf = issue("leaf", intermediate)
+    assert engine.verify(write("chain.crt", leaf, intermediate), roots) == (True, "")
+    # a certificate signed by another leaf certificate is not valid
+    rogue = issue("rogue", leaf)
+    assert engine.verify(write("rogue.crt", rogue, leaf, intermediate), roots) == (
+        False, "x509: certificate is not authorized to sign other certificates")
+    # path length constraints limit the number of intermediates below an issuer
+    sub = issue("sub", intermediate, ca=True)
+    assert engine.verify(write("long.crt", issue("leaf", sub), sub, intermediate), roots) == (
+        False, "x509: too many intermediates for path length constraint")
+    # issuers that may not sign certificates are left to step-cli
+    no_sign = issue("no-sign", root, ca=True, key_usage=x509.KeyUsage(
+        digital_signature=True, content_commitment=False, key_encipherment=False, data_encipherment=False,
+        key_agreement=False, key_cert_sign=False, crl_sign=False, encipher_only=False, decipher_only=False))
+    with pytest.raises(engine.UnsupportedError):
+        engine.verify(write("no-sign.crt", issue("leaf", no_sign), no_sign), roots)
+
+
+def test_renewal_window(utils):
+    renewal_window = utils("renewal_window")
+    seeds = [renewal_window.renewal_seed(f"host-{i}.example.com", "/etc/ssl/step.crt") for i in range(1000)]
+    plans = [renewal_window.plan_renewal(seed, "8h", "1h") for seed in seeds]
+    assert plans == [renewal_window.plan_renewal(seed, "8h", "1h") for seed in seeds]
+    assert all(8 * 3600 <= p["expires_in_seconds"] < 9 * 3600 for p in plans)
+    # the renewals are spread evenly across the window instead of all happening at once
+    histogram = renewal_window.renewal_histogram(plans, "10m")
+    assert len(histogram) == 6 and all(100 < bucket["count"] < 250 for bucket in histogram)
+    assert histogram[0]["expires_in"] == "8h50m0s"
+
+
+def test_keypool(utils, tmp_path):
+    keypool = utils("keypool")
+    spec = keypool.KeySpec.from_params("EC", None, "P-384")
+    pool = keypool.KeyPool(tmp_path / "keypool")
+    pool.add(spec, keypool.generate_keys([spec] * 2, 2))
+    assert pool.available(spec) == 2
+    assert stat.S_IMODE(pool.path.stat().st_mode) == 0o700
+    assert stat.S_IMODE(pool.directory(spec).stat().st_mode) == 0o700
+    assert all(stat.S_IMODE(key.stat().st_mode) == 0o600 for key in pool.keys(spec))
+    # an existing pool directory keeps its permissions, only the key type directory is private
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o755)
+    keypool.KeyPool(shared).add(spec, [])
+    assert stat.S_IMODE(shared.stat().st_mode) == 0o755
+    assert stat.S_IMODE((shared / spec.name).stat().st_mode) == 0o700
+
+    keys = {key.read_bytes() for key in pool.keys(spec)}
+    assert {pool.take(spec), pool.take(spec)} == keys
+    assert pool.take(spec) is None
+    # keys are refilled by a detached process
+    pool.refill_in_background(spec, 1)
+    for _ in range(100):
+        if pool.available(spec) == 1:
+            break
+        time.sleep(0.1)
+    assert pool.available(spec) == 1 and pool.refill_error(spec) is None
+    # failed refills are recorded instead of disappearing with the detached process
+    broken = keypool.KeySpec("EC", curve="P-999")
+    pool.add(broken, [])
+    pool.refill_in_background(broken, 1)
+    for _ in range(100):
+        if pool.refill_error(broken):
+            break
+        time.sleep(0.1)
+    assert "P-999" in pool.refill_error(broken)
+    # the error is cleared once keys are added again
+    pool.add(broken, [])
+    assert pool.refill_error(broken) is None
+
+
+def test_ca_config_lock(utils, tmp_path):
+    ca_config = utils("ca_config")
+    path = tmp_path / "ca.json"
+    path.write_text(json.dumps({"authority": {"provisioners": []}}))
+    config = ca_config.CaConfig(path.as_posix())
+    loaded = []
+    # a concurrent run has to wait until the first one has saved its changes
+    thread = threading.Thread(target=lambda: loaded.append(ca_config.CaConfig(path.as_posix())))
+    thread.start()
+    thread.join(0.5)
+    assert thread.is_alive()
+    config.apply("add", {"name": "acme", "type": "ACME", "force_cn": True})
+    config.save()
+    config.close()
+    thread.join(5)
+    assert [p["name"] for p in loaded[0].provisioners] == ["acme"]
+    loaded[0].close()
+    with pytest.raises(ca_config.CaConfigError, match="closed before saving"):
+        config.save()
@@ -0,0 +1,130 @@
+# pylint: disable=redefined-outer-name
+# Offline unit tests for the step_release lookup, using a file:// mirror of the GitHub releases
+import hashlib
+import importlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import GALAXY_YML, REPO_ROOT
+
+
+class Mirror:
+    """A local copy of the GitHub release and API files of step-cli"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.url = path.as_uri()
+
+    def set_latest(self, version: str) -> None:
+        latest = self.path / "cli" / "releases" / "latest"
+        latest.parent.mkdir(parents=True, exist_ok=True)
+        latest.write_text(json.dumps({"tag_name": f"v{version}"}))
+
+    def add_release(self, version: str, data: bytes, checksum_data: bytes = b"") -> Path:
+        release = self.path / "cli" / "releases" / "download" / f"v{version}"
+        release.mkdir(parents=True, exist_ok=True)
+        name = f"step_linux_{version}_amd64.tar.gz"
+        (release / name).write_bytes(data)
+        checksum = hashlib.sha256(checksum_data or data).hexdigest()
+        (release / "checksums.txt").write_text(f"{checksum}  {name}\n0000  step_linux_{version}_arm64.tar.gz\n")
+        return release / name
+
+
+@pytest.fixture()
+def step_release(collection):
+    return importlib.import_module(f"{collection}.plugins.lookup.step_release")
+
+
+@pytest.fixture()
+def mirror(tmp_path) -> Mirror:
+    mirror = Mirror(tmp_path / "mirror")
+    mirror.set_latest("0.28.2")
+    mirror.add_release("0.28.2", b"step 0.28.2")
+    return mirror
+
+
+def test_step_release_download(step_release, mirror, tmp_path):
+    cache = step_release.ReleaseCache("cli", (tmp_path / "cache").as_posix(), mirror.url, mirror.url, False)
+    release = cache.get("latest", "amd64", 3600)
+    assert release["version"] == "0.28.2"
+    assert Path(release["archive"]).read_bytes() == b"step 0.28.2"
+    assert release["checksum"] == hashlib.sha256(b"step 0.28.2").hexdigest()
+    # the archive is served from the cache afterwards, without contacting the mirror
+    os.rename(mirror.path, tmp_path / "unavailable")
+    assert cache.get("latest", "amd64", 3600) == release
+    assert cache.get("0.28.2", "amd64", 3600) == release
+    with pytest.raises(step_release.AnsibleLookupError, match="Could not download"):
+        cache.get("0.28.3", "amd64", 3600)
+
+
+def test_step_release_latest_ttl(step_release, mirror, tmp_path):
+    cache = step_release.ReleaseCache("cli", (tmp_path / "cache").as_posix(), mirror.url, mirror.url, False)
+    assert cache.get("latest", "amd64", 3600)["version"] == "0.28.2"
+    mirror.set_latest("0.29.0")
+    mirror.add_release("0.29.0", b"step 0.29.0")
+    # the cached latest version is used until it expires
+    assert cache.get("latest", "amd64", 3600)["version"] == "0.28.2"
+    assert cache.get("latest", "amd64", 0)["version"] == "0.29.0"
+
+
+def test_step_release_checksum(step_release, mirror, tmp_path):
+    cache = step_release.ReleaseCache("cli", (tmp_path / "cache").as_posix(), mirror.url, mirror.url, False)
+    # archives that don't match the checksums file are deleted again
+    mirror.add_release("0.29.0", b"tampered", checksum_data=b"step 0.29.0")
+    with pytest.raises(step_release.AnsibleLookupError, match="Checksum mismatch"):
+        cache.get("0.29.0", "amd64", 3600)
+    assert not (cache.path / "0.29.0" / "step_linux_0.29.0_amd64.tar.gz").exists()
+    # a corrupted archive in the cache is downloaded again
+    archive = Path(cache.get("0.28.2", "amd64", 3600)["archive"])
+    archive.write_bytes(b"corrupted")
+    cache.get("0.28.2", "amd64", 3600)
+    assert archive.read_bytes() == b"step 0.28.2"
+    with pytest.raises(step_release.AnsibleLookupError, match="No checksum found"):
+        cache.get("0.28.2", "s390x", 3600)
+
+
+def test_step_release_offline(step_release, mirror, tmp_path):
+    cache_dir = (tmp_path / "cache").as_posix()
+    offline = step_release.ReleaseCache("cli", cache_dir, mirror.url, mirror.url, True)
+    with pytest.raises(step_release.AnsibleLookupError, match="cache directory .* does not exist"):
+        offline.get("latest", "amd64", 3600)
+    assert not (tmp_path / "cache").exists()
+
+    release = step_release.ReleaseCache("cli", cache_dir, mirror.url, mirror.url, False).get("latest", "amd64", 0)
+    os.rename(mirror.path, tmp_path / "unavailable")
+    # offline mode uses the cached latest version, regardless of its age
+    assert offline.get("latest", "amd64", 0) == release
+    with pytest.raises(step_release.AnsibleLookupError, match="0.29.0 has not been cached"):
+        offline.get("0.29.0", "amd64", 3600)
+    with pytest.raises(step_release.AnsibleLookupError, match="step_linux_0.28.2_arm64.tar.gz has not been cached"):
+        offline.get("0.28.2", "arm64", 3600)
+    step_release.ReleaseCache("certificates", cache_dir, mirror.url, mirror.url, False).path.mkdir()
+    with pytest.raises(step_release.AnsibleLookupError, match="latest certificates version has not been cached"):
+        step_release.ReleaseCache("certificates", cache_dir, mirror.url, mirror.url, True).get("latest", "amd64", 0)
+
+
+def test_step_release_lookup(mirror, tmp_path):
+    collections = tmp_path / "collections"
+    namespace_dir = collections / "ansible_collections" / GALAXY_YML["namespace"]
+    namespace_dir.mkdir(parents=True)
+    (namespace_dir / GALAXY_YML["name"]).symlink_to(REPO_ROOT, target_is_directory=True)
+    lookup = (
+        f"lookup('{GALAXY_YML['namespace']}.{GALAXY_YML['name']}.step_release', 'cli', "
+        f"cache_dir='{tmp_path / 'cache'}', download_url='{mirror.url}', api_url='{mirror.url}')"
+    )
+    res = subprocess.run(
+        [sys.executable, "-m", "ansible", "adhoc", "localhost", "-o", "-m", "ansible.builtin.debug",
+         "-a", f"msg={{{{ {lookup} }}}}"],
+        env={**os.environ, "ANSIBLE_COLLECTIONS_PATH": collections.as_posix(), "ANSIBLE_NOCOLOR": "1"},
+        cwd=tmp_path, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(res.stdout.split("=>", 1)[1])
+    assert result["msg"] == {
+        "version": "0.28.2", "archive": f"{tmp_path}/cache/cli/0.28.2/step_linux_0.28.2_amd64.tar.gz",
+        "checksum": hashlib.sha256(b"step 0.28.2").hexdigest(),
+    }
@@ -0,0 +1,40 @@
+# Offline unit tests for the renewal scheduler of the step_acme_cert role
+import datetime
+import importlib.util
+import json
+import os
+import pwd
+
+from tests.conftest import REPO_ROOT
+
+SCHEDULER = REPO_ROOT / "roles" / "step_acme_cert" / "files" / "step-renew-scheduler.py"
+
+
+def load_scheduler():
+    spec = importlib.util.spec_from_file_location("step_renew_scheduler", SCHEDULER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_scheduler_renews_due_certificates(fake_step_cli, certificate, step_env, monkeypatch):
+    scheduler_module = load_scheduler()
+    log = step_env / "step-cli.log"
+    monkeypatch.setenv("FAKE_STEP_CLI_LOG", log.as_posix())
+    manifest = step_env / "step-renew.d"
+    manifest.mkdir()
+    user = pwd.getpwuid(os.getuid()).pw_name
+    for i in range(6):
+        # the certificate is valid for another year, so an expires_in of 400 days makes it due right away
+        entry = {"crt": certificate.as_posix(), "key": certificate.with_suffix(".key").as_posix(), "user": user,
+                 "expires_in": "9600h" if i < 5 else None, "reload": ["nginx"] if i % 2 else ["nginx", "app"]}
+        (manifest / f"cert-{i}.json").write_text(json.dumps(entry))
+
+    scheduler = scheduler_module.Scheduler(manifest, fake_step_cli, fake_step_cli, 4)
+    scheduler.run(once=True)
+    calls = log.read_text().splitlines()
+    # the five due certificates are renewed, followed by a single reload of all affected units
+    assert sorted(calls[:-1]) == [f"ca renew {certificate} {certificate.with_suffix('.key')} --force"] * 5
+    assert calls[-1] == "try-reload-or-restart app nginx"
+    # the fake renewal leaves the certificates untouched, so they are retried later instead of in a loop
+    assert scheduler.heap[0][0] > datetime.datetime.now().timestamp()